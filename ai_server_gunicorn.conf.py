@@ -0,0 +1,96 @@
+"""
+Pre-fork production launcher for local_ai_server.py.
+
+    gunicorn -c ai_server_gunicorn.conf.py local_ai_server:app
+
+The app (and with it the ViT weights) is imported once in the gunicorn
+master. The garbage collector is then frozen and the master forks the
+workers, which share the weight pages copy-on-write. Tensor data lives in
+its own large allocations, apart from the PyObject headers whose
+refcounts change. With the gc frozen, nothing writes to those pages after
+the fork, so they stay shared. Each worker pins its own torch thread count
+so the workers together don't oversubscribe the cores.
+
+Settings (environment variables):
+    AI_SERVER_BIND            address to listen on (default 0.0.0.0:5000)
+    AI_SERVER_WORKERS         worker processes (default: number of cores)
+    AI_SERVER_THREADS         request threads per worker, so concurrent
+                              requests can share micro-batches (default 4)
+    AI_SERVER_TORCH_THREADS   torch (and, with VIT_BACKEND=onnx, ONNX Runtime)
+                              intra-op threads per worker
+                              (default: cores // workers, at least 1)
+"""
+import gc
+import os
+
+_cores = os.cpu_count() or 1
+
+bind = os.getenv('AI_SERVER_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('AI_SERVER_WORKERS', str(_cores)))
+worker_class = 'gthread'
+threads = int(os.getenv('AI_SERVER_THREADS', '4'))
+preload_app = True
+# Model inference on large uploads can take a while on busy CPUs
+timeout = 120
+
+torch_threads = int(os.getenv('AI_SERVER_TORCH_THREADS', str(max(1, _cores // max(1, workers)))))
+
+
+def _memory_kb():
+    """Return (rss, private, shared) in kB from /proc, or None where unsupported."""
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as f:
+            fields = dict(
+                (line.split(':')[0], int(line.split()[1]))
+                for line in f if line.split()[-1] == 'kB'
+            )
+    except OSError:
+        return None
+    private = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    shared = fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    return fields.get('Rss', 0), private, shared
+
+
+def when_ready(server):
+    # Everything imported so far (model weights included) is moved to the
+    # permanent generation so gc passes in the workers never write to it.
+    gc.collect()
+    gc.freeze()
+    memory = _memory_kb()
+    if memory:
+        server.log.info(f"Master RSS after model load: {memory[0] // 1024} MB")
+
+
+def post_fork(server, worker):
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already initialised in the master; the intra-op setting is what matters
+        pass
+    server.log.info(f"Worker {worker.pid} using {torch_threads} torch threads")
+
+    # With VIT_BACKEND=onnx the session is created lazily, in this worker (warmup builds it);
+    # give it the same per-worker thread budget unless one was configured explicitly
+    import local_ai_server
+
+    if local_ai_server.onnx_model is not None and not os.getenv('VIT_ORT_INTRA_OP_THREADS'):
+        local_ai_server.onnx_model.set_threads(intra_op_threads=torch_threads, inter_op_threads=1)
+
+
+def post_worker_init(worker):
+    # Warm up in each worker rather than the master, so no torch thread pools
+    # exist at fork time; the worker only starts accepting once this returns.
+    import local_ai_server
+
+    local_ai_server.warmup()
+    local_ai_server.start_ipc()
+    memory = _memory_kb()
+    if memory:
+        rss, private, shared = memory
+        worker.log.info(
+            f"Worker {worker.pid} RSS {rss // 1024} MB "
+            f"(private {private // 1024} MB, shared {shared // 1024} MB)"
+        )
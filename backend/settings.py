@@ -203,4 +203,12 @@ HEALTH_CHECK = {
 # WhiteNoise settings
 WHITENOISE_USE_FINDERS = True
 WHITENOISE_MANIFEST_STRICT = False
-WHITENOISE_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+WHITENOISE_ALLOW_ALL_ORIGINS = True
+
+# AI inference endpoints
+AI_PREDICT_URL = os.getenv('AI_PREDICT_URL', 'https://us-central1-aurora-457407.cloudfunctions.net/predict')
+# Unix socket of a local_ai_server on the same host (VIT_IPC_SOCKET there); HTTP is the fallback
+AI_IPC_SOCKET = os.getenv('AI_IPC_SOCKET', '')
+# 'path' sends the upload's file path, 'shm' sends the decoded 224x224 image through shared memory
+AI_IPC_MODE = os.getenv('AI_IPC_MODE', 'path')
+AI_IPC_TIMEOUT = float(os.getenv('AI_IPC_TIMEOUT', '30'))
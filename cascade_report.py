@@ -0,0 +1,155 @@
+"""
+Compare cascade inference (student first, full ViT on escalation) with
+ViT-only predictions on a folder of images.
+
+local_ai_server.py is imported with VIT_CASCADE_STUDENT set, so the report
+uses the server's backend (VIT_BACKEND), preprocessing and escalation rule
+(CRITICAL_CONDITIONS). For every image it times decode + preprocess, the
+student and the full model at batch size 1, once each. It then evaluates each
+threshold in --thresholds on those measurements:
+
+    escalation rate     overall and by reason (low_confidence, critical)
+    agreement           cascade vs ViT-only, on the condition and on the
+                        top-1 label
+    latency             per-image end-to-end ms for the cascade (decode +
+                        student + the ViT when escalated) and for ViT-only,
+                        with the mean speedup
+
+A "student only" row shows what the student gets right on its own.
+
+Usage:
+    python cascade_report.py path/to/images [--student skincondition_detection-main/saved_student_model]
+        [--thresholds 0.5,0.7,0.8,0.9,0.95,0.99] [--output cascade.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AI_DIR = os.path.join(HERE, 'skincondition_detection-main')
+if AI_DIR not in sys.path:
+    sys.path.insert(0, AI_DIR)
+
+from load_test import latency_summary
+from preprocessing import list_images
+
+
+def measure(server, paths):
+    """Time each stage for every image and record the student's and the ViT's top-1."""
+    import torch
+
+    records = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            image_bytes = f.read()
+        started = time.perf_counter()
+        image = server.preprocessor.decode(image_bytes)
+        pixel_values = torch.from_numpy(server.preprocessor.to_pixel_values(image[None]))
+        decoded = time.perf_counter()
+        student_probs = torch.softmax(server.run_student_batch(pixel_values)[0], dim=0)
+        student_done = time.perf_counter()
+        vit_logits = server.run_model_batch([pixel_values])[0]
+        vit_done = time.perf_counter()
+
+        student_prob, student_index = (value.item() for value in torch.max(student_probs, dim=0))
+        vit_index = int(torch.argmax(vit_logits))
+        records.append({
+            "path": os.path.basename(path),
+            "decode_ms": (decoded - started) * 1000.0,
+            "student_ms": (student_done - decoded) * 1000.0,
+            "vit_ms": (vit_done - student_done) * 1000.0,
+            "student_index": int(student_index),
+            "student_confidence": float(student_prob),
+            "student_condition": server.get_category_from_index(int(student_index)),
+            "vit_index": vit_index,
+            "vit_condition": server.get_category_from_index(vit_index),
+        })
+    return records
+
+
+def evaluate(records, policy=None):
+    """Cascade metrics for one policy; without a policy, the student answers every image."""
+    counts = {"low_confidence": 0, "critical": 0}
+    condition_agree = label_agree = 0
+    cascade_ms = []
+    vit_ms = []
+    for record in records:
+        outcome = 'student'
+        if policy is not None:
+            outcome = policy.outcome(record["student_confidence"], record["student_index"])
+        latency = record["decode_ms"] + record["student_ms"]
+        if outcome == 'student':
+            condition_agree += record["student_condition"] == record["vit_condition"]
+            label_agree += record["student_index"] == record["vit_index"]
+        else:
+            counts[outcome] += 1
+            condition_agree += 1
+            label_agree += 1
+            latency += record["vit_ms"]
+        cascade_ms.append(latency)
+        vit_ms.append(record["decode_ms"] + record["vit_ms"])
+
+    total = len(records)
+    cascade = latency_summary(cascade_ms)
+    vit_only = latency_summary(vit_ms)
+    return {
+        "threshold": policy.threshold if policy is not None else None,
+        "escalation_rate": sum(counts.values()) / total,
+        "escalations": counts,
+        "condition_agreement": condition_agree / total,
+        "label_agreement": label_agree / total,
+        "cascade_ms": cascade,
+        "vit_only_ms": vit_only,
+        "speedup": vit_only["mean"] / cascade["mean"] if cascade["mean"] else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('images', help="Folder of images")
+    parser.add_argument('--student', default=os.path.join(HERE, 'skincondition_detection-main', 'saved_student_model'))
+    parser.add_argument('--thresholds', default='0.5,0.7,0.8,0.9,0.95,0.99')
+    parser.add_argument('--limit', type=int, default=None, help="Use at most this many images")
+    parser.add_argument('--output', default=None, help="Write the report as JSON to this path")
+    parser.add_argument('--per-image', action='store_true', help="Include per-image measurements in the JSON")
+    args = parser.parse_args()
+
+    paths = list_images(args.images)[:args.limit]
+    if not paths:
+        raise SystemExit(f"No images found in {args.images}")
+
+    os.environ['VIT_CASCADE_STUDENT'] = os.path.abspath(args.student)
+    # The report runs the models directly; don't take over the server's socket
+    os.environ.pop('VIT_IPC_SOCKET', None)
+    sys.path.insert(0, HERE)
+    import local_ai_server as server
+    from cascade import CascadePolicy
+
+    server.warmup()
+    records = measure(server, paths)
+    rows = [dict(evaluate(records), name="student only")]
+    for threshold in sorted(float(value) for value in args.thresholds.split(',') if value.strip()):
+        policy = CascadePolicy(threshold, server.cascade_policy.is_critical)
+        rows.append(dict(evaluate(records, policy), name=f"cascade @ {threshold:g}"))
+
+    print(f"{len(records)} images, backend {server.backend_name()}, student {args.student}")
+    print(f"{'':>18} {'escalated':>9} {'condition':>9} {'label':>7} {'p50 ms':>8} {'p90 ms':>8} {'speedup':>7}")
+    for row in rows:
+        print(f"{row['name']:>18} {row['escalation_rate']:>9.1%} {row['condition_agreement']:>9.1%} "
+              f"{row['label_agreement']:>7.1%} {row['cascade_ms']['p50']:>8.1f} {row['cascade_ms']['p90']:>8.1f} "
+              f"{row['speedup']:>6.2f}x")
+    vit_only = rows[0]['vit_only_ms']
+    print(f"{'ViT only':>18} {'':>9} {'':>9} {'':>7} {vit_only['p50']:>8.1f} {vit_only['p90']:>8.1f}")
+
+    if args.output:
+        report = {"images": len(records), "backend": server.backend_name(), "student": args.student, "rows": rows}
+        if args.per_image:
+            report["per_image"] = records
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,32 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from PIL import Image
-import numpy as np
 import torch
-from transformers import ViTForImageClassification, ViTFeatureExtractor
-import io
 import os
+import sys
+
+# Shared inference helpers live next to the model in skincondition_detection-main
+AI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'skincondition_detection-main')
+if AI_DIR not in sys.path:
+    sys.path.insert(0, AI_DIR)
+
+from onnx_backend import backend_name, load_onnx_backend
+from preprocessing import ViTPreprocessor
+from mmap_weights import load_vit_model
 
 app = Flask(__name__)
 CORS(app)
 
 # Load model and feature extractor
 model_path = 'skincondition_detection-main/saved_vit_model'
-model = ViTForImageClassification.from_pretrained(model_path)
-feature_extractor = ViTFeatureExtractor.from_pretrained(model_path)
-model.eval()  # Set model to evaluation mode
+preprocessor = ViTPreprocessor.from_pretrained(model_path)
+
+# VIT_BACKEND=onnx serves through ONNX Runtime; falls back to eager PyTorch if the artifact is missing
+onnx_model = load_onnx_backend(model_path) if backend_name() == 'onnx' else None
+model = None
+if onnx_model is None:
+    # Memory-maps model.safetensors when prepare_weights.py has been run
+    model = load_vit_model(model_path)
+    model.eval()  # Set model to evaluation mode
 
 # Define categories
 CATEGORIES = [
@@ -42,15 +54,17 @@ def predict():
 
         file = request.files['file']
         image_bytes = file.read()
-        image = Image.open(io.BytesIO(image_bytes)).convert('RGB').resize((224, 224))
         
-        # Prepare image for model
-        inputs = feature_extractor(images=[np.array(image)], return_tensors='pt')
+        # Decode, resize and normalize the image for the model
+        pixel_values = torch.from_numpy(preprocessor([image_bytes]))
         
         # Get predictions
         with torch.no_grad():
-            outputs = model(**inputs)
-            logits = outputs.logits
+            if onnx_model is not None:
+                logits = torch.from_numpy(onnx_model(pixel_values.numpy()))
+            else:
+                outputs = model(pixel_values=pixel_values)
+                logits = outputs.logits
             probs = torch.nn.functional.softmax(logits, dim=1)
         
         # Get top prediction
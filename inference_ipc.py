@@ -0,0 +1,364 @@
+"""
+Unix domain socket transport between the Django backend and a local inference server.
+
+When both run on the same host, the backend doesn't need to send the
+image over HTTP as a multipart upload. It sends the server either
+
+    * the path of the uploaded file (the server reads it from disk), or
+    * the name of a shared-memory segment holding the image already
+      decoded and resized to 224x224 RGB (the server skips decoding),
+
+and gets back a small binary result instead of JSON. The HTTP endpoint
+stays available and the backend falls back to it whenever this transport
+fails: the connection breaks or times out, a frame is malformed, or the
+server can't read the image it was pointed at. An image the server read
+but couldn't classify (e.g. a corrupt upload) is an error for the caller,
+not a reason to send it again over HTTP.
+
+Wire format (big-endian). Every frame is a header followed by a payload:
+
+    header    magic b'VIT1', kind/status (uint8), payload length (uint32)
+
+    request   kind 1 (PATH): UTF-8 file path
+              kind 2 (SHM):  height (uint16), width (uint16), channels (uint8),
+                             then the segment name in UTF-8
+    response  status 0 (OK): confidence (float32), recommendation type (uint8),
+                             condition and message (each a uint16 length + UTF-8),
+                             product count (uint8), then that many product names
+              status 1 (ERROR): UTF-8 error message; inference failed
+              status 2 (UNREADABLE): UTF-8 error message; the server couldn't
+                             read the file or segment, so send the image another way
+
+A connection carries any number of request/response pairs, one at a time.
+"""
+import atexit
+import os
+import queue
+import socket
+import struct
+import threading
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+
+MAGIC = b'VIT1'
+KIND_PATH = 1
+KIND_SHM = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+STATUS_UNREADABLE = 2
+IMAGE_SIZE = (224, 224)  # (height, width) of images sent through shared memory
+RECOMMENDATION_TYPES = ('products', 'refer', 'cautious_products')
+
+_HEADER = struct.Struct('!4sBI')
+_SHM_SHAPE = struct.Struct('!HHB')
+_RESULT = struct.Struct('!fB')
+_LENGTH = struct.Struct('!H')
+_MAX_PAYLOAD = 1 << 20
+
+
+class InferenceIPCError(Exception):
+    """The local transport failed; callers should fall back to HTTP."""
+
+
+class InferenceServerError(Exception):
+    """The server read the image but failed to classify it; retrying over HTTP won't help."""
+
+
+def _recv_exact(conn, size):
+    chunks = []
+    while size:
+        chunk = conn.recv(size)
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _read_frame(conn):
+    magic, code, length = _HEADER.unpack(_recv_exact(conn, _HEADER.size))
+    if magic != MAGIC or length > _MAX_PAYLOAD:
+        raise ValueError("Invalid frame")
+    return code, _recv_exact(conn, length)
+
+
+def _send_frame(conn, code, payload):
+    conn.sendall(_HEADER.pack(MAGIC, code, len(payload)) + payload)
+
+
+def _pack_string(value):
+    data = (value or '').encode('utf-8')[:0xFFFF]
+    return _LENGTH.pack(len(data)) + data
+
+
+def _unpack_string(payload, offset):
+    (length,) = _LENGTH.unpack_from(payload, offset)
+    offset += _LENGTH.size
+    return payload[offset:offset + length].decode('utf-8'), offset + length
+
+
+def encode_result(result):
+    """Pack a /predict-style result dict into a response payload."""
+    names = [
+        product.get('name') or product.get('Product') or ''
+        for product in result.get('recommendations', [])
+    ][:255]
+    parts = [
+        _RESULT.pack(result['confidence'], RECOMMENDATION_TYPES.index(result['recommendation_type'])),
+        _pack_string(result['condition']),
+        _pack_string(result.get('message', '')),
+        bytes([len(names)]),
+    ]
+    parts.extend(_pack_string(name) for name in names)
+    return b''.join(parts)
+
+
+def decode_result(payload):
+    """
+    Unpack a response payload into the dict shape the backend gets from the
+    HTTP endpoint; recommendations carry only the product names.
+    """
+    confidence, type_code = _RESULT.unpack_from(payload, 0)
+    condition, offset = _unpack_string(payload, _RESULT.size)
+    message, offset = _unpack_string(payload, offset)
+    count = payload[offset]
+    offset += 1
+    names = []
+    for _ in range(count):
+        name, offset = _unpack_string(payload, offset)
+        names.append(name)
+    result = {
+        'condition': condition,
+        # float32 on the wire; drop the digits it adds (0.95 -> 0.949999988)
+        'confidence': round(confidence, 6),
+        'recommendation_type': RECOMMENDATION_TYPES[type_code],
+        'recommendations': [{'Product': name} for name in names],
+    }
+    if message:
+        result['message'] = message
+    return result
+
+
+def _attach_shared_memory(name):
+    """Attach to an existing segment without letting this process's resource tracker unlink it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 has no track argument
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+
+class IPCRequest:
+    """
+    A decoded request: either the ``data`` of the file at ``path``, or RGB
+    ``pixels`` bytes of ``shape`` (H, W, C).
+    """
+
+    __slots__ = ('path', 'data', 'pixels', 'shape')
+
+    def __init__(self, path=None, data=None, pixels=None, shape=None):
+        self.path = path
+        self.data = data
+        self.pixels = pixels
+        self.shape = shape
+
+
+class InferenceIPCServer:
+    """
+    Serves ``handler(IPCRequest) -> result dict`` on a Unix socket.
+
+    The socket is bound in the constructor, so a pre-fork server can create
+    it in the master; ``start()`` then starts the accept thread in each
+    worker and the kernel spreads connections across them. Path requests
+    are only served for files under ``allowed_roots``.
+    """
+
+    def __init__(self, socket_path, handler, allowed_roots=()):
+        self.socket_path = socket_path
+        self.handler = handler
+        self.allowed_roots = [os.path.realpath(root) for root in allowed_roots]
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # stale socket from a previous run
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(socket_path)
+        os.chmod(socket_path, 0o660)
+        self._sock.listen(128)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._accept_loop, name='vit-ipc', daemon=True)
+                self._thread.start()
+
+    def close(self):
+        self._sock.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # socket closed
+            threading.Thread(target=self._serve, args=(conn,), name='vit-ipc-conn', daemon=True).start()
+
+    def _parse_request(self, kind, payload):
+        if kind == KIND_PATH:
+            path = os.path.realpath(payload.decode('utf-8'))
+            if not any(path.startswith(root + os.sep) for root in self.allowed_roots):
+                raise PermissionError("Path is outside the allowed directories")
+            # Read here, so a file this process can't open is reported as UNREADABLE
+            with open(path, 'rb') as f:
+                return IPCRequest(path=path, data=f.read())
+        if kind == KIND_SHM:
+            height, width, channels = _SHM_SHAPE.unpack_from(payload, 0)
+            name = payload[_SHM_SHAPE.size:].decode('utf-8')
+            size = height * width * channels
+            segment = _attach_shared_memory(name)
+            try:
+                if segment.size < size:
+                    raise ValueError("Shared memory segment is smaller than the image")
+                pixels = bytes(segment.buf[:size])
+            finally:
+                segment.close()
+            return IPCRequest(pixels=pixels, shape=(height, width, channels))
+        raise ValueError(f"Unknown request kind {kind}")
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    kind, payload = _read_frame(conn)
+                except (ConnectionError, ValueError, OSError):
+                    return
+                try:
+                    request = self._parse_request(kind, payload)
+                except Exception as e:
+                    status, response = STATUS_UNREADABLE, str(e).encode('utf-8')[:_MAX_PAYLOAD]
+                else:
+                    try:
+                        status, response = STATUS_OK, encode_result(self.handler(request))
+                    except Exception as e:
+                        status, response = STATUS_ERROR, str(e).encode('utf-8')[:_MAX_PAYLOAD]
+                try:
+                    _send_frame(conn, status, response)
+                except OSError:
+                    return
+
+
+class InferenceIPCClient:
+    """
+    Client side, safe to share between threads. Each thread keeps its own
+    connection; shared-memory segments come from a pool of at most
+    ``max_segments`` that are reused across requests and threads, so
+    short-lived request threads don't leave segments behind.
+    """
+
+    def __init__(self, socket_path, timeout=30.0, max_segments=4):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.max_segments = max(int(max_segments), 1)
+        self._init_state()
+        atexit.register(self._unlink_segments)
+
+    def _init_state(self):
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._segments = []
+        self._free_segments = queue.LifoQueue()
+        self._segments_lock = threading.Lock()
+
+    def _thread_state(self):
+        if self._pid != os.getpid():
+            # Forked: connections and segments belong to the parent
+            self._init_state()
+        return self._local
+
+    def _connection(self):
+        state = self._thread_state()
+        conn = getattr(state, 'conn', None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            state.conn = conn
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def _request(self, kind, payload):
+        try:
+            conn = self._connection()
+            _send_frame(conn, kind, payload)
+            status, response = _read_frame(conn)
+        except (OSError, ValueError, ConnectionError) as e:
+            self._drop_connection()
+            raise InferenceIPCError(f"Local inference transport failed: {e}")
+        if status == STATUS_ERROR:
+            raise InferenceServerError(response.decode('utf-8', 'replace'))
+        if status != STATUS_OK:
+            raise InferenceIPCError(response.decode('utf-8', 'replace'))
+        return decode_result(response)
+
+    def analyze_path(self, path):
+        """Have the server read and classify the image file at ``path``."""
+        return self._request(KIND_PATH, os.path.abspath(path).encode('utf-8'))
+
+    def _acquire_segment(self, size):
+        """Take a free pooled segment, creating one while under ``max_segments``."""
+        self._thread_state()
+        try:
+            return self._free_segments.get_nowait()
+        except queue.Empty:
+            pass
+        with self._segments_lock:
+            if len(self._segments) < self.max_segments:
+                segment = shared_memory.SharedMemory(name=f"vit-{os.getpid()}-{uuid.uuid4().hex[:12]}",
+                                                     create=True, size=size)
+                self._segments.append(segment)
+                return segment
+        try:
+            return self._free_segments.get(timeout=self.timeout)
+        except queue.Empty:
+            raise InferenceIPCError("Timed out waiting for a shared memory segment")
+
+    def _release_segment(self, segment):
+        if segment in self._segments:  # not from before a fork
+            self._free_segments.put(segment)
+
+    def analyze_image_file(self, path):
+        """Decode and resize the image here and pass the pixels through shared memory."""
+        from PIL import Image
+
+        height, width = IMAGE_SIZE
+        with Image.open(path) as image:
+            if image.format == 'JPEG':
+                # Same draft-mode decode the server would do
+                image.draft('RGB', (width, height))
+            pixels = image.convert('RGB').resize((width, height), Image.BICUBIC).tobytes()
+        segment = self._acquire_segment(len(pixels))
+        try:
+            segment.buf[:len(pixels)] = pixels
+            payload = _SHM_SHAPE.pack(height, width, 3) + segment.name.encode('utf-8')
+            # The server copies the pixels out before it replies, so the segment is free again after this
+            return self._request(KIND_SHM, payload)
+        finally:
+            self._release_segment(segment)
+
+    def _unlink_segments(self):
+        with self._segments_lock:
+            segments, self._segments = self._segments, []
+        for segment in segments:
+            try:
+                segment.close()
+                segment.unlink()
+            except (OSError, BufferError):
+                pass
@@ -0,0 +1,309 @@
+"""
+Load-test any /predict-compatible server (local_ai_server.py, fixed_ai_server.py,
+skincondition_detection-main/vit_api.py, mock_ai_server.py, the Cloud Function).
+
+Where test_ai_endpoint.py sends a single image, this replays a corpus: a
+folder of images, or a JSONL trace of captured requests with one object
+per line:
+
+    {"path": "images/a.jpg", "t": 0.0}
+    {"image_b64": "...", "filename": "b.png", "t": 0.42}
+
+"path" is relative to the trace file; "t" (seconds since the capture
+started) is optional and only used when an open-loop run replays the
+trace's own timing.
+
+Modes:
+    closed  --concurrency N clients, each sending its next request as soon
+            as the previous one returns (measures capacity).
+    open    requests arrive at --rate per second (constant or Poisson), or
+            at the trace's timestamps, whether or not earlier ones finished.
+            Latency is measured from the scheduled arrival time, so queueing
+            in the client is not hidden (no coordinated omission).
+
+The JSON report (--output) has p50/p90/p99/max latency, throughput, error
+rate and a per-second latency series, so runs can be diffed.
+
+Usage:
+    python load_test.py http://localhost:5000/predict images/ --mode closed --concurrency 8 --duration 60
+    python load_test.py http://localhost:8000/predict trace.jsonl --mode open --rate 20 --output run.json
+"""
+import argparse
+import base64
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# The image-folder listing is shared with the benchmarks in skincondition_detection-main
+AI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'skincondition_detection-main')
+if AI_DIR not in sys.path:
+    sys.path.insert(0, AI_DIR)
+
+from preprocessing import list_images
+
+
+def load_corpus(source):
+    """Return a list of ``{"filename", "data", "t"}`` from an image folder or a JSONL trace."""
+    corpus = []
+    if os.path.isdir(source):
+        for path in list_images(source):
+            with open(path, 'rb') as f:
+                corpus.append({"filename": os.path.basename(path), "data": f.read(), "t": None})
+    else:
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if 'image_b64' in entry:
+                    data = base64.b64decode(entry['image_b64'])
+                    filename = entry.get('filename', f"request-{line_number}.jpg")
+                elif 'path' in entry:
+                    path = os.path.join(base_dir, entry['path'])
+                    with open(path, 'rb') as image_file:
+                        data = image_file.read()
+                    filename = entry.get('filename', os.path.basename(path))
+                else:
+                    raise ValueError(f"{source}:{line_number}: needs 'path' or 'image_b64'")
+                corpus.append({"filename": filename, "data": data, "t": entry.get('t')})
+    if not corpus:
+        raise ValueError(f"No images found in {source}")
+    return corpus
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def latency_summary(latencies_ms):
+    values = sorted(latencies_ms)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": values[-1] if values else None,
+    }
+
+
+class Client:
+    """Sends one image per request; keeps a keep-alive session per thread."""
+
+    def __init__(self, url, field, timeout):
+        self.url = url
+        self.field = field
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def send(self, item, scheduled_at=None):
+        """Return one result record; latency counts from ``scheduled_at`` if given."""
+        started = time.perf_counter() if scheduled_at is None else scheduled_at
+        files = {self.field: (item['filename'], item['data'])}
+        try:
+            response = self._session().post(self.url, files=files, timeout=self.timeout)
+            status, error = response.status_code, None
+            if status >= 400:
+                error = f"HTTP {status}"
+        except requests.exceptions.RequestException as e:
+            status, error = None, type(e).__name__
+        finished = time.perf_counter()
+        return {"start": started, "end": finished, "status": status, "error": error}
+
+
+def run_closed_loop(client, corpus, concurrency, duration, total_requests):
+    """``concurrency`` clients back to back until ``duration`` s or ``total_requests`` are done."""
+    results = []
+    lock = threading.Lock()
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker():
+        while True:
+            n = next(counter)
+            if total_requests is not None and n >= total_requests:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            result = client.send(corpus[n % len(corpus)])
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def arrival_offsets(corpus, rate, arrival, duration, total_requests, speed):
+    """Seconds after start at which each request is sent, and the corpus item for it."""
+    if rate is None:
+        # Replay the trace's own timing
+        if any(item['t'] is None for item in corpus):
+            raise ValueError("Open loop without --rate needs a trace with a 't' on every entry")
+        first = min(item['t'] for item in corpus)
+        return [((item['t'] - first) / speed, item) for item in sorted(corpus, key=lambda item: item['t'])]
+
+    schedule, offset, n = [], 0.0, 0
+    while True:
+        if total_requests is not None and n >= total_requests:
+            break
+        if duration and offset >= duration:
+            break
+        schedule.append((offset, corpus[n % len(corpus)]))
+        n += 1
+        offset += random.expovariate(rate) if arrival == 'poisson' else 1.0 / rate
+    return schedule
+
+
+def run_open_loop(client, schedule, max_in_flight):
+    """Send each request at its scheduled offset regardless of outstanding ones."""
+    results = []
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        futures = []
+        start = time.perf_counter()
+        for offset, item in schedule:
+            scheduled_at = start + offset
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(client.send, item, scheduled_at))
+        for future in futures:
+            results.append(future.result())
+    return results
+
+
+def build_report(results, config, bucket_seconds=1.0):
+    results = sorted(results, key=lambda result: result['start'])
+    if not results:
+        return {"config": config, "requests": 0}
+    t0 = results[0]['start']
+    elapsed = max(result['end'] for result in results) - t0
+    ok = [result for result in results if result['error'] is None]
+    errors = {}
+    for result in results:
+        if result['error'] is not None:
+            errors[result['error']] = errors.get(result['error'], 0) + 1
+
+    series = {}
+    for result in results:
+        bucket = int((result['start'] - t0) // bucket_seconds)
+        series.setdefault(bucket, []).append(result)
+    timeline = []
+    for bucket in sorted(series):
+        bucket_results = series[bucket]
+        bucket_ok = [(r['end'] - r['start']) * 1000.0 for r in bucket_results if r['error'] is None]
+        summary = latency_summary(bucket_ok)
+        timeline.append({
+            "t": bucket * bucket_seconds,
+            "requests": len(bucket_results),
+            "errors": len(bucket_results) - len(bucket_ok),
+            "p50_ms": summary['p50'],
+            "p99_ms": summary['p99'],
+            "max_ms": summary['max'],
+        })
+
+    return {
+        "config": config,
+        "requests": len(results),
+        "succeeded": len(ok),
+        "errors": errors,
+        "error_rate": (len(results) - len(ok)) / len(results),
+        "duration_s": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed > 0 else None,
+        "latency_ms": latency_summary([(r['end'] - r['start']) * 1000.0 for r in ok]),
+        "timeline": timeline,
+    }
+
+
+def format_ms(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a /predict-compatible server")
+    parser.add_argument('url', help="Endpoint, e.g. http://localhost:5000/predict")
+    parser.add_argument('source', help="Folder of images or a JSONL trace")
+    parser.add_argument('--mode', choices=('closed', 'open'), default='closed')
+    parser.add_argument('--concurrency', type=int, default=4, help="Closed loop: concurrent clients")
+    parser.add_argument('--rate', type=float, default=None,
+                        help="Open loop: requests per second (default: replay the trace's timestamps)")
+    parser.add_argument('--arrival', choices=('constant', 'poisson'), default='poisson')
+    parser.add_argument('--speed', type=float, default=1.0, help="Open-loop trace replay speed-up factor")
+    parser.add_argument('--max-in-flight', type=int, default=256, help="Open loop: client thread cap")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds to run (0 = until --requests)")
+    parser.add_argument('--requests', type=int, default=None, help="Stop after this many requests")
+    parser.add_argument('--warmup', type=int, default=0, help="Unrecorded requests sent first")
+    parser.add_argument('--field', default='file', help="Multipart field name")
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    if not args.duration and args.requests is None:
+        parser.error("--duration 0 needs --requests")
+    random.seed(args.seed)
+    corpus = load_corpus(args.source)
+    client = Client(args.url, args.field, args.timeout)
+
+    for i in range(args.warmup):
+        client.send(corpus[i % len(corpus)])
+
+    config = {
+        "url": args.url,
+        "source": args.source,
+        "corpus_size": len(corpus),
+        "mode": args.mode,
+        "started_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+    print(f"Load testing {args.url} with {len(corpus)} images ({args.mode} loop)...")
+    if args.mode == 'closed':
+        config.update(concurrency=args.concurrency, duration_s=args.duration, max_requests=args.requests)
+        results = run_closed_loop(client, corpus, args.concurrency, args.duration, args.requests)
+    else:
+        schedule = arrival_offsets(corpus, args.rate, args.arrival, args.duration, args.requests, args.speed)
+        config.update(rate=args.rate, arrival=args.arrival if args.rate else 'trace', speed=args.speed,
+                      scheduled_requests=len(schedule))
+        results = run_open_loop(client, schedule, args.max_in_flight)
+
+    report = build_report(results, config)
+    if report['requests']:
+        latency = report['latency_ms']
+        print(f"Requests: {report['requests']}  errors: {report['error_rate']:.2%}  "
+              f"throughput: {report['throughput_rps'] or 0:.1f} req/s")
+        print(f"Latency ms  p50 {format_ms(latency['p50'])}  p90 {format_ms(latency['p90'])}  "
+              f"p99 {format_ms(latency['p99'])}  max {format_ms(latency['max'])}")
+        if report['errors']:
+            print("Errors: " + ", ".join(f"{error} x{count}" for error, count in report['errors'].items()))
+    else:
+        print("No requests were sent")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,39 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify, send_file, url_for
 from flask_cors import CORS
 from PIL import Image
 import numpy as np
 import torch
-from transformers import ViTForImageClassification, ViTFeatureExtractor
-import io
 import os
 import csv
 import random
 import logging
 import json
 import base64
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
 
+# Shared inference helpers live next to the model in skincondition_detection-main
+AI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'skincondition_detection-main')
+if AI_DIR not in sys.path:
+    sys.path.insert(0, AI_DIR)
+
+from batching import MicroBatcher
+from pipeline import DecodePipeline
+from buffer_pool import BatchBuffers, SlotPool
+from prediction_cache import PredictionCache, image_key, model_fingerprint
+from onnx_backend import backend_name, load_onnx_backend
+from quantization import quantize_dynamic_int8
+from preprocessing import ViTPreprocessor
+from mmap_weights import load_vit_model
+from readiness import Readiness, warmup_batch_sizes
+from product_catalog import ProductStore, SerializedCatalogCache
+from product_images import DEFAULT_VARIANT, ProductImageStore, is_data_url
+from cascade import OUTCOMES as CASCADE_OUTCOMES, CascadePolicy, load_student
+from metrics import BATCH_SIZE_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from inference_ipc import InferenceIPCServer
+
 app = Flask(__name__)
 # Configure CORS to allow all origins and methods
 CORS(app, resources={r"/*": {"origins": "*", "methods": ["GET", "POST", "OPTIONS"], "allow_headers": ["Content-Type"]}})
@@ -26,9 +47,208 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 
 # Load model and feature extractor
 model_path = 'skincondition_detection-main/saved_vit_model'
-model = ViTForImageClassification.from_pretrained(model_path)
-feature_extractor = ViTFeatureExtractor.from_pretrained(model_path)
-model.eval()  # Set model to evaluation mode
+preprocessor = ViTPreprocessor.from_pretrained(model_path)
+
+# VIT_BACKEND=onnx serves through ONNX Runtime; falls back to eager PyTorch if the artifact is missing.
+# VIT_BACKEND=int8 serves the PyTorch model with dynamically quantized INT8 Linear layers.
+onnx_model = load_onnx_backend(model_path) if backend_name() == 'onnx' else None
+model = None
+if onnx_model is None:
+    # Memory-maps model.safetensors when prepare_weights.py has been run
+    model = load_vit_model(model_path)
+    model.eval()  # Set model to evaluation mode
+    if backend_name() == 'int8':
+        model = quantize_dynamic_int8(model)
+        app.logger.info("Serving ViT with dynamic INT8 quantization")
+
+# Cascade mode: VIT_CASCADE_STUDENT points at a student distilled with distill_student.py. It
+# classifies every image first; the full model only sees images it escalates (see cascade.py).
+with open(os.path.join(model_path, 'config.json'), 'r', encoding='utf-8') as f:
+    NUM_LABELS = len(json.load(f)['id2label'])
+CASCADE_STUDENT = os.getenv('VIT_CASCADE_STUDENT')
+student_model = None
+if CASCADE_STUDENT:
+    student_model = load_student(CASCADE_STUDENT, NUM_LABELS, preprocessor.size)
+    if backend_name() == 'int8':
+        student_model = quantize_dynamic_int8(student_model)
+    app.logger.info(f"Cascade mode: student from {CASCADE_STUDENT}")
+# Escalate when the student's top-1 probability is below this, or its condition is critical
+cascade_policy = CascadePolicy(
+    float(os.getenv('VIT_CASCADE_THRESHOLD', '0.9')),
+    lambda index: get_category_from_index(index) in CRITICAL_CONDITIONS
+)
+
+# Micro-batching: concurrent /predict calls share one forward pass
+MAX_BATCH_SIZE = int(os.getenv('VIT_MAX_BATCH_SIZE', '8'))
+MAX_BATCH_WAIT_MS = float(os.getenv('VIT_MAX_BATCH_WAIT_MS', '10'))
+
+def run_model_batch(pixel_batches):
+    """Run one forward pass over the stacked inputs and return one logits row per input."""
+    pixel_values = torch.cat(pixel_batches, dim=0)
+    if onnx_model is not None:
+        return list(torch.from_numpy(onnx_model(pixel_values.numpy())))
+    with torch.no_grad():
+        logits = model(pixel_values=pixel_values).logits
+    return list(logits)
+
+# Prometheus metrics on /metrics: per-stage latency, requests/errors, batch sizes, queue depth
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram('vit_stage_seconds', 'Time spent in each /predict stage', ('stage',))
+REQUEST_SECONDS = metrics.histogram('vit_request_seconds', 'Request latency by endpoint', ('endpoint',))
+REQUESTS = metrics.counter('vit_requests_total', 'Requests by endpoint and status code', ('endpoint', 'status'))
+ERRORS = metrics.counter('vit_errors_total', 'Failed predictions by endpoint and exception type', ('endpoint', 'error'))
+BATCH_SIZE = metrics.histogram('vit_batch_size', 'Images per model forward pass', buckets=BATCH_SIZE_BUCKETS)
+
+CASCADE_IMAGES = metrics.counter(
+    'vit_cascade_images_total', 'Cascade outcome per image (student, low_confidence, critical)', ('outcome',)
+)
+for outcome in CASCADE_OUTCOMES:
+    CASCADE_IMAGES.inc(outcome, amount=0)
+
+def run_student_batch(pixel_values):
+    """Student forward pass over an (N, 3, H, W) tensor; returns the logits."""
+    with torch.no_grad():
+        return student_model(pixel_values=pixel_values).logits
+
+def cascade_escalations(results):
+    """Apply the cascade policy to per-image ``(top_probs, top_indices)`` and count the outcomes."""
+    escalations = cascade_policy.escalations(results)
+    CASCADE_IMAGES.inc('student', amount=len(results) - len(escalations))
+    for _, outcome in escalations:
+        CASCADE_IMAGES.inc(outcome)
+    return escalations
+
+def run_instrumented_batch(pixel_batches):
+    """``run_model_batch`` plus batch-size and forward-pass metrics (warmup bypasses this)."""
+    BATCH_SIZE.observe(sum(len(pixel_values) for pixel_values in pixel_batches))
+    if student_model is None:
+        with STAGE_SECONDS.time('forward'):
+            return run_model_batch(pixel_batches)
+    pixel_values = torch.cat(pixel_batches, dim=0)
+    with STAGE_SECONDS.time('student_forward'):
+        logits = run_student_batch(pixel_values)
+        top_probs, top_indices = torch.topk(torch.nn.functional.softmax(logits, dim=1), k=1, dim=1)
+    rows = [row for row, _ in cascade_escalations(list(zip(top_probs.tolist(), top_indices.tolist())))]
+    if rows:
+        with STAGE_SECONDS.time('forward'):
+            logits[rows] = torch.stack(run_model_batch([pixel_values[rows]]))
+    return list(logits)
+
+# Staged pipeline: decode workers turn uploads into tensors while the batcher's worker runs the
+# previous batch. Both queues are bounded, so at most VIT_PIPELINE_MAX_PENDING uploads and
+# VIT_MAX_BATCH_QUEUE decoded tensors wait between the stages.
+PIPELINE_WORKERS = int(os.getenv('VIT_PIPELINE_WORKERS', str(min(4, os.cpu_count() or 1))))
+PIPELINE_MAX_PENDING = int(os.getenv('VIT_PIPELINE_MAX_PENDING', str(MAX_BATCH_SIZE * 8)))
+MAX_BATCH_QUEUE = int(os.getenv('VIT_MAX_BATCH_QUEUE', str(MAX_BATCH_SIZE * 2)))
+
+# Preallocated buffers reused by every /predict: one input slot per image that can be between
+# decode and forward at once, and the model worker's input batch, logits and top-k outputs.
+INPUT_SHAPE = (3,) + preprocessor.size
+input_slots = SlotPool(PIPELINE_WORKERS + MAX_BATCH_QUEUE + MAX_BATCH_SIZE, INPUT_SHAPE)
+batch_buffers = BatchBuffers(MAX_BATCH_SIZE, INPUT_SHAPE, NUM_LABELS, top_k=3)
+
+def run_pooled_batch(slot_indices):
+    """
+    Model stage of the pipeline: gather the decoded slots into the reused
+    input batch, run the forward pass and return ``(top_probs, top_indices)``
+    per image, computed in the reused output buffers. In cascade mode the
+    student runs first and only the escalated images go through the full model.
+    """
+    size = batch_buffers.gather(input_slots, slot_indices)
+    BATCH_SIZE.observe(size)
+    if student_model is None:
+        return run_pooled_forward(size)
+
+    with STAGE_SECONDS.time('student_forward'):
+        batch_buffers.logits_t[:size].copy_(run_student_batch(batch_buffers.pixel_values_t[:size]))
+        results = batch_buffers.top_k_results(size)
+    escalations = cascade_escalations(results)
+    if escalations:
+        # Move the escalated images to the front of the input batch and run only those
+        rows = [row for row, _ in escalations]
+        pixel_values = batch_buffers.pixel_values_t
+        pixel_values[:len(rows)] = pixel_values[rows]
+        for row, result in zip(rows, run_pooled_forward(len(rows))):
+            results[row] = result
+    return results
+
+def run_pooled_forward(size):
+    """Full-model forward pass over the first ``size`` rows of the pooled input batch."""
+    with STAGE_SECONDS.time('forward'):
+        if onnx_model is not None:
+            onnx_model(batch_buffers.pixel_values[:size], out=batch_buffers.logits[:size])
+        else:
+            with torch.no_grad():
+                logits = model(pixel_values=batch_buffers.pixel_values_t[:size]).logits
+                batch_buffers.logits_t[:size].copy_(logits)
+        return batch_buffers.top_k_results(size)
+
+batcher = MicroBatcher(
+    run_pooled_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS, max_queue=MAX_BATCH_QUEUE
+)
+
+def decode_into_slot(image_bytes):
+    """
+    Decode stage of the pipeline: upload bytes -> index of an input slot holding the pixel values.
+    An already decoded (H, W, 3) uint8 array (from the IPC transport) skips decoding.
+    """
+    with STAGE_SECONDS.time('decode'):
+        if isinstance(image_bytes, np.ndarray):
+            image = image_bytes
+            if image.shape[:2] != preprocessor.size:
+                image = np.asarray(Image.fromarray(image).resize(preprocessor.size[::-1], Image.BICUBIC))
+        else:
+            image = preprocessor.decode(image_bytes)
+    with STAGE_SECONDS.time('preprocess'):
+        index = input_slots.acquire()
+        try:
+            preprocessor.to_pixel_values(image[None], out=input_slots.array(index)[None])
+        except Exception:
+            input_slots.release(index)
+            raise
+    return index
+
+pipeline = DecodePipeline(
+    decode_into_slot, batcher, workers=PIPELINE_WORKERS, max_pending=PIPELINE_MAX_PENDING,
+    discard=input_slots.release
+)
+metrics.gauge('vit_decode_queue_depth', 'Uploads waiting for a decode worker', pipeline.queue_depth)
+metrics.gauge('vit_batch_queue_depth', 'Decoded images waiting for the micro-batcher', batcher.queue_depth)
+
+# Readiness: /readyz stays 503 until warmup has run and while the decode queue is backed up
+readiness = Readiness()
+READY_MAX_QUEUE_DEPTH = int(os.getenv('VIT_READY_MAX_QUEUE_DEPTH', str(PIPELINE_MAX_PENDING * 3 // 4)))
+
+def warmup():
+    """Run synthetic batches at each configured batch size before taking traffic."""
+    image_size = preprocessor.size
+    def run_synthetic_batch(batch_size):
+        images = np.zeros((batch_size, image_size[0], image_size[1], 3), dtype=np.uint8)
+        pixel_values = torch.from_numpy(preprocessor.to_pixel_values(images))
+        run_model_batch([pixel_values])
+        if student_model is not None:
+            run_student_batch(pixel_values)
+    timings = readiness.warmup(run_synthetic_batch, warmup_batch_sizes(MAX_BATCH_SIZE))
+    app.logger.info(f"Warmup finished: {', '.join(f'batch {size}: {ms:.0f} ms' for size, ms in timings.items())}")
+
+# Prediction cache keyed by SHA-256 of the uploaded bytes (VIT_CACHE_DIR enables the disk tier).
+# Disk entries are namespaced by this server, the model files, the backend actually serving
+# and the cascade setup, so changing any of them doesn't serve stale predictions.
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv('VIT_CACHE_SIZE', '1024')),
+    disk_dir=os.getenv('VIT_CACHE_DIR') or None,
+    namespace=model_fingerprint(
+        model_path, 'local_ai_server',
+        'onnx' if onnx_model is not None else ('int8' if backend_name() == 'int8' else 'eager'),
+        model_fingerprint(CASCADE_STUDENT) if student_model is not None else None,
+        cascade_policy.threshold if student_model is not None else None,
+        extra_files=[onnx_model.path] if onnx_model is not None else (),
+    )
+)
+
+# Thread pool for decoding the images of a /predict_batch request in parallel
+DECODE_WORKERS = int(os.getenv('VIT_DECODE_WORKERS', str(min(8, os.cpu_count() or 1))))
+decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix='vit-decode')
 
 # Define categories with their corresponding ImageNet class ranges
 CATEGORIES = [
@@ -123,8 +343,35 @@ def load_products_from_csv():
         ]
     return products
 
-# Load all products
-ALL_PRODUCTS = load_products_from_csv()
+# Load all products into a copy-on-write store; readers use product_store.snapshot() without locks
+product_store = ProductStore(load_products_from_csv())
+
+# Admin-uploaded product images, stored once by content hash in resized variants
+product_images = ProductImageStore(
+    os.getenv('PRODUCT_IMAGE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'product_image_store')
+)
+
+def store_product_image(image):
+    """Replace an inline data URL with the short URL of its stored copy; other URLs pass through."""
+    if not is_data_url(image):
+        return image
+    digest = product_images.store_data_url(image)
+    return url_for('get_product_image', digest=digest, variant=DEFAULT_VARIANT, _external=True)
+
+# /products body, compressed variants and ETag, rebuilt only when the catalog version changes
+serialized_catalog = SerializedCatalogCache(product_store)
+
+# Map skin conditions to product targets
+CONDITION_TO_TARGETS = {
+    "Acne": ["Breakouts & blemishes", "Enlarged pores", "Excess oil", "Black Heads"],
+    "Eczema": ["Redness", "Irritation", "Dry Skin", "Sensitive Skin"],
+    "Rosacea": ["Redness", "Irritation", "Sensitive Skin"],
+    "Oily Skin": ["Sebum control", "Enlarged pores", "Excess oil"],
+    "Dry Skin": ["Dry Skin", "Moisturising", "Hyderating"],
+    "Normal": ["Dull skin", "Uneven skin tone"],
+    "Non-Wrinkled Skin": ["Anti Aging", "Fine Lines", "Wrinkles"]
+}
+DEFAULT_TARGETS = ["Dull skin", "Uneven skin tone"]
 
 def get_category_from_index(idx):
     """Map model output index to skin condition category."""
@@ -138,110 +385,273 @@ def recommend_products(condition, top_k=3):
     Recommend products based on the detected skin condition.
     This function matches the condition with suitable products from the CSV.
     """
-    recommended_products = []
-    
-    # Map skin conditions to product targets
-    condition_to_targets = {
-        "Acne": ["Breakouts & blemishes", "Enlarged pores", "Excess oil", "Black Heads"],
-        "Eczema": ["Redness", "Irritation", "Dry Skin", "Sensitive Skin"],
-        "Rosacea": ["Redness", "Irritation", "Sensitive Skin"],
-        "Oily Skin": ["Sebum control", "Enlarged pores", "Excess oil"],
-        "Dry Skin": ["Dry Skin", "Moisturising", "Hyderating"],
-        "Normal": ["Dull skin", "Uneven skin tone"],
-        "Non-Wrinkled Skin": ["Anti Aging", "Fine Lines", "Wrinkles"]
-    }
-    
     # Get relevant targets for the condition
-    relevant_targets = condition_to_targets.get(condition, ["Dull skin", "Uneven skin tone"])
+    relevant_targets = CONDITION_TO_TARGETS.get(condition, DEFAULT_TARGETS)
     
-    # Find products that target the condition
-    for product in ALL_PRODUCTS:
-        # Check if any of the product's targets match the condition's targets
-        product_targets = [target.strip() for target in product["targets"].split(",")]
-        if any(target in product_targets for target in relevant_targets):
-            recommended_products.append(product)
+    # Look up products that target the condition (first top_k in catalog order)
+    catalog = product_store.snapshot()
+    recommended_products = catalog.lookup_targets(relevant_targets, limit=top_k)
     
     # If no specific matches, return random products
     if not recommended_products:
-        recommended_products = random.sample(ALL_PRODUCTS, min(top_k, len(ALL_PRODUCTS)))
-    else:
-        # Limit to top_k products
-        recommended_products = recommended_products[:top_k]
+        recommended_products = random.sample(catalog.products, min(top_k, len(catalog)))
     
     return recommended_products
 
+def classify_logits(logits):
+    """Turn one image's logits into the condition/confidence part of the /predict payload."""
+    with torch.no_grad():
+        probs = torch.nn.functional.softmax(logits, dim=0)
+        
+        # Get top 3 predictions
+        top_probs, top_indices = torch.topk(probs, k=3)
+    
+    return classify_top_k(top_probs.tolist(), top_indices.tolist())
+
+def classify_top_k(top_probs, top_indices):
+    """Build the condition/confidence payload from the top-k probabilities and class indices."""
+    # Map the top prediction to our categories
+    condition = get_category_from_index(top_indices[0])
+    confidence = float(top_probs[0])
+    
+    # Get alternative predictions
+    alt_predictions = []
+    for i in range(1, min(3, len(top_indices))):
+        alt_condition = get_category_from_index(top_indices[i])
+        alt_confidence = float(top_probs[i])
+        if alt_confidence > 0.1:  # Only include if confidence is above 10%
+            alt_predictions.append({
+                "condition": alt_condition,
+                "confidence": alt_confidence
+            })
+    
+    return {
+        "condition": condition,
+        "confidence": confidence,
+        "alternative_predictions": alt_predictions
+    }
+
+def add_recommendations(result):
+    """Add recommendation_type, message and recommendations to a classified result."""
+    condition = result["condition"]
+    confidence = result["confidence"]
+    
+    # Add recommendations based on confidence
+    if confidence >= 0.99:
+        result["recommendation_type"] = "products"
+        result["recommendations"] = recommend_products(condition)
+    elif confidence < 0.90 and condition in CRITICAL_CONDITIONS:
+        result["recommendation_type"] = "refer"
+        result["message"] = "Model is not confident and condition is critical. Please consult a dermatologist."
+        result["recommendations"] = recommend_products(condition)
+    else:
+        result["recommendation_type"] = "cautious_products"
+        result["message"] = "Model is moderately confident. Use recommended products with care."
+        result["recommendations"] = recommend_products(condition)
+    
+    return result
+
+def build_prediction_result(logits):
+    """Turn one image's logits into the /predict response payload."""
+    return add_recommendations(classify_logits(logits))
+
+def predict_image_bytes(image_bytes):
+    """Classify one uploaded image through the decode -> batch -> forward pipeline."""
+    # Hand the bytes to the decode workers and get our top-k row back from the batched forward pass
+    # ('inference' is both queue waits plus the 'decode', 'preprocess' and shared 'forward' stages)
+    with STAGE_SECONDS.time('inference'):
+        top_probs, top_indices = pipeline.submit(image_bytes)
+    with STAGE_SECONDS.time('postprocess'):
+        return classify_top_k(top_probs, top_indices)
+
+def handle_ipc_request(ipc_request):
+    """Serve one request from the Unix-socket transport (see inference_ipc.py)."""
+    if ipc_request.data is not None:
+        image_bytes = ipc_request.data
+        key = image_key(image_bytes)
+        compute = lambda: predict_image_bytes(image_bytes)
+    else:
+        if ipc_request.shape[2] != 3:
+            raise ValueError("Expected an RGB image")
+        image = np.frombuffer(ipc_request.pixels, dtype=np.uint8).reshape(ipc_request.shape)
+        # Decoded pixels never collide with a key of raw upload bytes
+        key = 'rgb-' + image_key(ipc_request.pixels)
+        compute = lambda: predict_image_bytes(image)
+    try:
+        result = prediction_cache.get_or_compute(key, compute)
+        with STAGE_SECONDS.time('recommend'):
+            return add_recommendations(result)
+    except Exception as e:
+        ERRORS.inc('ipc', type(e).__name__)
+        raise
+
+# Optional Unix-socket transport for a backend on the same host. The socket is bound here,
+# before gunicorn forks, and each worker accepts on it once start_ipc() has run.
+IPC_SOCKET = os.getenv('VIT_IPC_SOCKET')
+IPC_PATH_ROOTS = os.getenv(
+    'VIT_IPC_PATH_ROOTS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media')
+).split(os.pathsep)
+ipc_server = InferenceIPCServer(IPC_SOCKET, handle_ipc_request, IPC_PATH_ROOTS) if IPC_SOCKET else None
+
+def start_ipc():
+    if ipc_server is not None:
+        ipc_server.start()
+        app.logger.info(f"Serving inference over {IPC_SOCKET}")
+
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        if 'file' not in request.files:
+        # Multipart parsing happens on first access to request.files
+        with STAGE_SECONDS.time('parse'):
+            file = request.files.get('file')
+            image_bytes = file.read() if file is not None else None
+        if file is None:
             return jsonify({"error": "No image file provided"}), 400
-
-        file = request.files['file']
-        image_bytes = file.read()
-        image = Image.open(io.BytesIO(image_bytes)).convert('RGB').resize((224, 224))
         
-        # Prepare image for model
-        inputs = feature_extractor(images=[np.array(image)], return_tensors='pt')
+        # Identical uploads share one cached (or in-flight) prediction
+        result = prediction_cache.get_or_compute(
+            image_key(image_bytes), lambda: predict_image_bytes(image_bytes)
+        )
+        with STAGE_SECONDS.time('recommend'):
+            result = add_recommendations(result)
         
-        # Get predictions
-        with torch.no_grad():
-            outputs = model(**inputs)
-            logits = outputs.logits
-            probs = torch.nn.functional.softmax(logits, dim=1)
-            
-            # Get top 3 predictions
-            top_probs, top_indices = torch.topk(probs[0], k=3)
-            
-            # Convert to numpy for easier handling
-            top_probs = top_probs.numpy()
-            top_indices = top_indices.numpy()
-            
-            # Map the top prediction to our categories
-            condition = get_category_from_index(top_indices[0])
-            confidence = float(top_probs[0])
-            
-            # Get alternative predictions
-            alt_predictions = []
-            for i in range(1, min(3, len(top_indices))):
-                alt_condition = get_category_from_index(top_indices[i])
-                alt_confidence = float(top_probs[i])
-                if alt_confidence > 0.1:  # Only include if confidence is above 10%
-                    alt_predictions.append({
-                        "condition": alt_condition,
-                        "confidence": alt_confidence
-                    })
-        
-        # Prepare response
-        result = {
-            "condition": condition,
-            "confidence": confidence,
-            "alternative_predictions": alt_predictions
-        }
-        
-        # Add recommendations based on confidence
-        if confidence >= 0.99:
-            result["recommendation_type"] = "products"
-            result["recommendations"] = recommend_products(condition)
-        elif confidence < 0.90 and condition in CRITICAL_CONDITIONS:
-            result["recommendation_type"] = "refer"
-            result["message"] = "Model is not confident and condition is critical. Please consult a dermatologist."
-            result["recommendations"] = recommend_products(condition)
-        else:
-            result["recommendation_type"] = "cautious_products"
-            result["message"] = "Model is moderately confident. Use recommended products with care."
-            result["recommendations"] = recommend_products(condition)
-        
-        return jsonify(result)
+        with STAGE_SECONDS.time('serialize'):
+            return jsonify(result)
     except Exception as e:
         # Log the error
+        ERRORS.inc('predict', type(e).__name__)
         app.logger.error(f"Error processing image: {str(e)}")
         # Return a proper JSON error response
         return jsonify({"error": f"Error processing image: {str(e)}"}), 500
 
+# Most images one /predict_batch request may contain; larger requests get a 413
+MAX_BATCH_FILES = int(os.getenv('VIT_MAX_BATCH_FILES', '64'))
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    try:
+        files = request.files.getlist('file')
+        if not files:
+            return jsonify({"error": "No image files provided"}), 400
+        if len(files) > MAX_BATCH_FILES:
+            return jsonify({"error": f"Too many images: at most {MAX_BATCH_FILES} per request"}), 413
+
+        filenames = [file.filename for file in files]
+        payloads = [file.read() for file in files]
+        
+        # Decode all images in parallel; a corrupt image only fails its own entry
+        futures = [decode_pool.submit(preprocessor.decode, image_bytes) for image_bytes in payloads]
+        results = [None] * len(files)
+        images = []
+        image_slots = []
+        for i, future in enumerate(futures):
+            try:
+                images.append(future.result())
+                image_slots.append(i)
+            except Exception as e:
+                ERRORS.inc('predict_batch', type(e).__name__)
+                app.logger.warning(f"Could not decode image {filenames[i]}: {str(e)}")
+                results[i] = {"filename": filenames[i], "error": f"Error processing image: {str(e)}"}
+        
+        # Batched forward passes over the images that decoded, at most MAX_BATCH_SIZE at a time
+        for start in range(0, len(images), MAX_BATCH_SIZE):
+            chunk = images[start:start + MAX_BATCH_SIZE]
+            pixel_values = torch.from_numpy(preprocessor.to_pixel_values(chunk))
+            batch_logits = run_instrumented_batch([pixel_values])
+            for slot, logits in zip(image_slots[start:start + MAX_BATCH_SIZE], batch_logits):
+                result = build_prediction_result(logits)
+                result["filename"] = filenames[slot]
+                results[slot] = result
+        
+        return jsonify({"results": results})
+    except Exception as e:
+        ERRORS.inc('predict_batch', type(e).__name__)
+        app.logger.error(f"Error processing image batch: {str(e)}")
+        return jsonify({"error": f"Error processing image batch: {str(e)}"}), 500
+
+# Request count and latency for every endpoint (labelled by Flask endpoint name, so bounded)
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+        REQUESTS.inc(endpoint, str(response.status_code))
+    return response
+
+# Prometheus scrape endpoint (per process; each gunicorn worker reports its own)
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+# Liveness: the process is up and serving HTTP
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({"status": "ok"})
+
+# Readiness: model loaded, warmed up, and the batch queue is healthy
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    ready, payload = readiness.status(
+        model_loaded=model is not None or onnx_model is not None,
+        queue_healthy=pipeline.is_healthy(READY_MAX_QUEUE_DEPTH) and batcher.is_healthy(MAX_BATCH_QUEUE),
+    )
+    payload["decode_queue_depth"] = pipeline.queue_depth()
+    payload["queue_depth"] = batcher.queue_depth()
+    return jsonify(payload), 200 if ready else 503
+
+# Micro-batching statistics (batch sizes, queue wait)
+@app.route('/batch_stats', methods=['GET'])
+def batch_stats():
+    return jsonify(batcher.stats())
+
+# Pipeline statistics: per-stage occupancy and queue depth show which stage is the bottleneck
+@app.route('/pipeline_stats', methods=['GET'])
+def pipeline_stats():
+    stats = pipeline.stats()
+    stats["input_slots"] = input_slots.stats()
+    if student_model is not None:
+        stats["cascade"] = cascade_policy.stats()
+    return jsonify(stats)
+
+# Prediction cache statistics (hits, misses, coalesced requests)
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
 # Add a new endpoint to get all products
 @app.route('/products', methods=['GET'])
 def get_all_products():
-    return jsonify(ALL_PRODUCTS)
+    catalog = serialized_catalog.get()
+    
+    # Each encoding has its own ETag; clients holding the current version of theirs get a 304
+    encoding = catalog.pick_encoding(request.headers.get('Accept-Encoding'))
+    etag = catalog.etag_for(encoding)
+    # If-None-Match uses weak comparison (RFC 7232 section 3.2), so W/"..." validators match too
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(catalog.bodies[encoding], mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Serve stored product images; the URL contains the content hash, so it can be cached forever
+@app.route('/product_images/<digest>/<variant>', methods=['GET'])
+def get_product_image(digest, variant):
+    path = product_images.path_for(digest, variant)
+    if path is None:
+        return jsonify({"error": "Image not found"}), 404
+    response = send_file(path, max_age=31536000, conditional=True)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 # Add a new endpoint to update product images
 @app.route('/update_product_image', methods=['POST', 'OPTIONS'])
@@ -273,12 +683,23 @@ def update_product_image():
         # Convert product_id to string for comparison
         product_id_str = str(product_id)
         
-        # Find the product and update its image
-        for product in ALL_PRODUCTS:
-            if str(product['id']) == product_id_str:
-                product['image'] = image_url
-                app.logger.info(f"Updated image for product ID {product_id_str}")
-                return jsonify({"success": True, "product": product})
+        # Reject an unknown id before storing the image (update checks again atomically)
+        if product_store.snapshot().get(product_id_str) is None:
+            app.logger.error(f"Product not found with ID: {product_id_str}")
+            return jsonify({"error": "Product not found"}), 404
+        
+        # Store inline image data on disk and keep only its URL in the product
+        try:
+            image_url = store_product_image(image_url)
+        except ValueError as e:
+            app.logger.error(f"Invalid product image: {str(e)}")
+            return jsonify({"error": str(e)}), 400
+        
+        # Publish a new catalog version with the product's image replaced
+        product = product_store.update(product_id_str, {'image': image_url})
+        if product is not None:
+            app.logger.info(f"Updated image for product ID {product_id_str}")
+            return jsonify({"success": True, "product": product})
         
         app.logger.error(f"Product not found with ID: {product_id_str}")
         return jsonify({"error": "Product not found"}), 404
@@ -311,16 +732,23 @@ def update_product():
         # Convert product_id to string for comparison
         product_id_str = str(product_id)
         
-        # Find the product and update it
-        for product in ALL_PRODUCTS:
-            if str(product['id']) == product_id_str:
-                # Update all fields except id
-                for key, value in data.items():
-                    if key != 'id':  # Don't update the ID
-                        product[key] = value
-                
-                app.logger.info(f"Updated product ID {product_id_str}")
-                return jsonify({"success": True, "product": product})
+        # Reject an unknown id before storing any image (update checks again atomically)
+        if product_store.snapshot().get(product_id_str) is None:
+            app.logger.error(f"Product not found with ID: {product_id_str}")
+            return jsonify({"error": "Product not found"}), 404
+        
+        # Update all fields except id and publish a new catalog version
+        changes = {key: value for key, value in data.items() if key != 'id'}  # Don't update the ID
+        if 'image' in changes:
+            try:
+                changes['image'] = store_product_image(changes['image'])
+            except ValueError as e:
+                app.logger.error(f"Invalid product image: {str(e)}")
+                return jsonify({"error": str(e)}), 400
+        product = product_store.update(product_id_str, changes)
+        if product is not None:
+            app.logger.info(f"Updated product ID {product_id_str}")
+            return jsonify({"success": True, "product": product})
         
         app.logger.error(f"Product not found with ID: {product_id_str}")
         return jsonify({"error": "Product not found"}), 404
@@ -351,23 +779,40 @@ def add_product():
                 app.logger.error(f"Missing required field: {field}")
                 return jsonify({"error": f"Missing required field: {field}"}), 400
         
+        # Reject a taken id before storing any image (product_store.add checks again atomically)
+        product_id = str(data.get('id', len(product_store.snapshot()) + 1))  # Ensure ID is a string
+        if product_id in product_store.snapshot().by_id:
+            app.logger.error(f"Product with ID {product_id} already exists")
+            return jsonify({"error": f"Product with ID {product_id} already exists"}), 400
+        
+        # Store inline image data on disk and keep only its URL in the product
+        try:
+            image_url = store_product_image(data.get('image', 'https://via.placeholder.com/300x300?text=No+Image'))
+        except ValueError as e:
+            app.logger.error(f"Invalid product image: {str(e)}")
+            return jsonify({"error": str(e)}), 400
+        
         # Create a new product
         new_product = {
-            'id': str(data.get('id', len(ALL_PRODUCTS) + 1)),  # Ensure ID is a string
+            'id': product_id,
             'name': data['name'],
             'brand': data['brand'],
             'category': data['category'],
             'description': data['description'],
             'price': float(data['price']),
             'stock': int(data['stock']),
-            'image': data.get('image', 'https://via.placeholder.com/300x300?text=No+Image'),
+            'image': image_url,
             'suitable_for': data.get('suitable_for', ''),
             'targets': data.get('targets', ''),
             'when_to_apply': data.get('when_to_apply', '')
         }
         
-        # Add the new product to the list
-        ALL_PRODUCTS.append(new_product)
+        # Add the new product to the catalog
+        try:
+            new_product = product_store.add(new_product)
+        except ValueError as e:
+            app.logger.error(str(e))
+            return jsonify({"error": str(e)}), 400
         
         app.logger.info(f"Added new product: {new_product['name']} with ID {new_product['id']}")
         return jsonify({"success": True, "product": new_product})
@@ -376,4 +821,6 @@ def add_product():
         return jsonify({"error": f"Error adding product: {str(e)}"}), 500
 
 if __name__ == '__main__':
+    warmup()
+    start_ipc()
     app.run(host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -7,12 +7,35 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.conf import settings
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from inference_ipc import InferenceIPCClient, InferenceIPCError, InferenceServerError
 from .models import User, UploadedImage, AnalysisResult, Product, Appointment
 from .serializers import (
     UserSerializer, UploadedImageSerializer, AnalysisResultSerializer,
     ProductSerializer, AppointmentSerializer
 )
 
+_ipc_client = None
+
+def analyze_over_ipc(image_path):
+    """
+    Classify an uploaded image through the local inference server's Unix socket.
+    Returns None when no socket is configured or the transport fails, in which
+    case the caller falls back to the HTTP endpoint. Raises InferenceServerError
+    when the server read the image but couldn't classify it.
+    """
+    global _ipc_client
+    if not settings.AI_IPC_SOCKET:
+        return None
+    if _ipc_client is None:
+        _ipc_client = InferenceIPCClient(settings.AI_IPC_SOCKET, timeout=settings.AI_IPC_TIMEOUT)
+    try:
+        if settings.AI_IPC_MODE == 'shm':
+            return _ipc_client.analyze_image_file(image_path)
+        return _ipc_client.analyze_path(image_path)
+    except InferenceIPCError as e:
+        print(f"Local inference transport failed, falling back to HTTP: {str(e)}")
+        return None
+
 class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = User.EMAIL_FIELD
 
@@ -114,6 +137,27 @@ class UploadedImageViewSet(viewsets.ModelViewSet):
         image = self.get_object()
         
         try:
+            # Prefer the local inference server over its Unix socket when one is configured
+            try:
+                ai_response = analyze_over_ipc(image.image.path)
+            except InferenceServerError as e:
+                # The server got the image; sending it again over HTTP would fail the same way
+                print(f"AI model error for image {image.id}: {str(e)}")
+                return Response(
+                    {'error': f'Error processing image: {str(e)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if ai_response is not None:
+                print(f"Image {image.id} analyzed over {settings.AI_IPC_SOCKET}")
+                try:
+                    return self._analysis_response(request, image, ai_response)
+                except ValueError as ve:
+                    print(f"Validation error: {str(ve)}")
+                    return Response(
+                        {'error': str(ve)},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            
             # Open the image file in binary mode
             with open(image.image.path, 'rb') as image_file:
                 files = {'file': image_file}
@@ -124,7 +168,7 @@ class UploadedImageViewSet(viewsets.ModelViewSet):
                 # Call the AI endpoint with increased timeout
                 try:
                     response = requests.post(
-                        'https://us-central1-aurora-457407.cloudfunctions.net/predict',
+                        settings.AI_PREDICT_URL,
                         files=files,
                         timeout=120  # Increased timeout to 120 seconds
                     )
@@ -153,55 +197,7 @@ class UploadedImageViewSet(viewsets.ModelViewSet):
                 
                 if response.status_code == 200:
                     try:
-                        ai_response = response.json()
-                        
-                        # Validate required fields
-                        required_fields = ['condition', 'confidence', 'recommendation_type']
-                        for field in required_fields:
-                            if field not in ai_response:
-                                raise ValueError(f"Missing required field: {field}")
-                        
-                        # Create analysis result
-                        analysis = AnalysisResult.objects.create(
-                            image=image,
-                            user=request.user,
-                            condition=ai_response['condition'],
-                            confidence=ai_response['confidence'],
-                            recommendation_type=ai_response['recommendation_type'],
-                            message=ai_response.get('message', '')
-                        )
-                        
-                        # If products are recommended, fetch them from our database
-                        if 'recommendations' in ai_response:
-                            # Extract product names from recommendations
-                            product_names = [r.get('Product', '') for r in ai_response['recommendations']]
-                            # Filter out empty strings
-                            product_names = [name for name in product_names if name]
-                            
-                            if product_names:
-                                # Get products from database that match the recommended names
-                                products = Product.objects.filter(name__in=product_names)
-                                
-                                # Get the condition from the AI response
-                                condition = ai_response['condition'].lower()
-                                
-                                # Filter products based on the condition
-                                filtered_products = []
-                                for product in products:
-                                    # Check if the product's targets or suitable_for contains the condition
-                                    if (condition in product.targets.lower() or 
-                                        condition in product.suitable_for.lower()):
-                                        filtered_products.append(product)
-                                
-                                # Serialize the filtered products
-                                product_data = ProductSerializer(filtered_products, many=True, context={'request': request}).data
-                                
-                                # Include only the filtered products in the response
-                                ai_response['products'] = product_data
-                                # Remove the original recommendations since we're using our database products
-                                ai_response.pop('recommendations', None)
-                        
-                        return Response(ai_response)
+                        return self._analysis_response(request, image, response.json())
                     except ValueError as ve:
                         print(f"Validation error: {str(ve)}")
                         return Response(
@@ -234,6 +230,56 @@ class UploadedImageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def _analysis_response(self, request, image, ai_response):
+        """Store the AI result for ``image`` and swap its recommendations for our database products."""
+        # Validate required fields
+        required_fields = ['condition', 'confidence', 'recommendation_type']
+        for field in required_fields:
+            if field not in ai_response:
+                raise ValueError(f"Missing required field: {field}")
+        
+        # Create analysis result
+        analysis = AnalysisResult.objects.create(
+            image=image,
+            user=request.user,
+            condition=ai_response['condition'],
+            confidence=ai_response['confidence'],
+            recommendation_type=ai_response['recommendation_type'],
+            message=ai_response.get('message', '')
+        )
+        
+        # If products are recommended, fetch them from our database
+        if 'recommendations' in ai_response:
+            # Extract product names from recommendations
+            product_names = [r.get('Product', '') for r in ai_response['recommendations']]
+            # Filter out empty strings
+            product_names = [name for name in product_names if name]
+            
+            if product_names:
+                # Get products from database that match the recommended names
+                products = Product.objects.filter(name__in=product_names)
+                
+                # Get the condition from the AI response
+                condition = ai_response['condition'].lower()
+                
+                # Filter products based on the condition
+                filtered_products = []
+                for product in products:
+                    # Check if the product's targets or suitable_for contains the condition
+                    if (condition in product.targets.lower() or 
+                        condition in product.suitable_for.lower()):
+                        filtered_products.append(product)
+                
+                # Serialize the filtered products
+                product_data = ProductSerializer(filtered_products, many=True, context={'request': request}).data
+                
+                # Include only the filtered products in the response
+                ai_response['products'] = product_data
+                # Remove the original recommendations since we're using our database products
+                ai_response.pop('recommendations', None)
+        
+        return Response(ai_response)
+
 class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
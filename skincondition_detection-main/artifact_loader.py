@@ -0,0 +1,140 @@
+"""Model artifact fetching for the Cloud Function cold start.
+
+Artifacts are fetched from pluggable storage (a GCS bucket, or a local
+directory standing in for one in tests) into a cache directory such as
+``/tmp/vit_model``. A ``manifest.json`` there records the remote checksum
+of every file already fetched, so a warm ``/tmp`` (e.g. an instance reused
+after the global state was reset) skips the download. Files that do need
+fetching are downloaded in parallel.
+"""
+import base64
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_FILENAME = 'manifest.json'
+
+
+def file_md5(path):
+    """Base64 MD5 of a file, the same format GCS reports in ``Blob.md5_hash``."""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return base64.b64encode(digest.digest()).decode('ascii')
+
+
+class GCSStorage:
+    """Artifacts stored as blobs in a GCS bucket."""
+
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            # Imported here so the client library only loads when GCS is used
+            from google.cloud import storage
+            self._bucket = storage.Client().bucket(self.bucket_name)
+        return self._bucket
+
+    def checksum(self, name):
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            raise FileNotFoundError(f"gs://{self.bucket_name}/{name}")
+        return blob.md5_hash or blob.crc32c or f"{blob.size}-{blob.updated}"
+
+    def download(self, name, destination):
+        self.bucket.blob(name).download_to_filename(destination)
+
+
+class LocalDirStorage:
+    """Artifacts stored as files under a local directory (a stand-in for GCS)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, name):
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return path
+
+    def checksum(self, name):
+        return file_md5(self._path(name))
+
+    def download(self, name, destination):
+        shutil.copyfile(self._path(name), destination)
+
+
+class ArtifactCache:
+    """Fetches named artifacts into ``cache_dir``, skipping ones the manifest says are current."""
+
+    def __init__(self, storage, cache_dir, max_workers=4):
+        self.storage = storage
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        os.makedirs(cache_dir, exist_ok=True)
+        self.manifest_path = os.path.join(cache_dir, MANIFEST_FILENAME)
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self):
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _fetch_one(self, local_name, remote_name):
+        start = time.perf_counter()
+        path = os.path.join(self.cache_dir, local_name)
+        checksum = self.storage.checksum(remote_name)
+        entry = self.manifest.get(local_name)
+        if (entry and entry.get('source') == remote_name and entry.get('checksum') == checksum
+                and os.path.exists(path) and os.path.getsize(path) == entry.get('size')):
+            return local_name, path, {'cached': True, 'seconds': time.perf_counter() - start}
+
+        tmp_path = f"{path}.{os.getpid()}.part"
+        self.storage.download(remote_name, tmp_path)
+        os.replace(tmp_path, path)
+        entry = {'source': remote_name, 'checksum': checksum, 'size': os.path.getsize(path)}
+        return local_name, path, {'cached': False, 'seconds': time.perf_counter() - start, 'entry': entry}
+
+    def fetch(self, artifacts, optional=()):
+        """
+        Fetch ``{local_name: remote_name}`` in parallel. Returns
+        ``(paths, timings)``; optional artifacts that don't exist remotely
+        map to None instead of raising.
+        """
+        paths, timings = {}, {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                local_name: pool.submit(self._fetch_one, local_name, remote_name)
+                for local_name, remote_name in artifacts.items()
+            }
+            for local_name, future in futures.items():
+                try:
+                    _, path, timing = future.result()
+                except FileNotFoundError:
+                    if local_name not in optional:
+                        raise
+                    paths[local_name] = None
+                    timings[local_name] = {'missing': True}
+                    continue
+                entry = timing.pop('entry', None)
+                if entry is not None:
+                    self.manifest[local_name] = entry
+                paths[local_name] = path
+                timings[local_name] = timing
+        self._write_manifest()
+        return paths, timings
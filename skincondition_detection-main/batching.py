@@ -0,0 +1,194 @@
+"""In-process micro-batching for the ViT inference servers.
+
+Concurrent requests are queued and handed to a single worker thread, which
+groups them into batches of up to ``max_batch_size`` items or whatever
+arrived within ``max_wait_ms`` of the first item, whichever comes first.
+The worker runs one forward pass per batch and gives each caller back its
+own slice of the output.
+
+With ``max_queue`` set, the queue is bounded and producers block while it
+is full, which caps the memory held by waiting inputs. ``submit_async()``
+lets a producer stage (see pipeline.py) hand items over without waiting
+for the forward pass.
+
+The worker thread is started lazily and restarted in forked children, so a
+batcher created at import time in a pre-fork parent works in every worker.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    __slots__ = ('item', 'callback', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, item, callback=None):
+        self.item = item
+        self.callback = callback
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collect concurrent ``submit()`` calls into batches for ``run_batch``.
+
+    ``run_batch`` receives a list of submitted items and must return a
+    sequence of the same length, one result per item, in order.
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=10, name='vit-batcher', max_queue=0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.run_batch = run_batch
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+        # 0 means unbounded
+        self.max_queue = max(int(max_queue), 0)
+        self.name = name
+        self._init_state()
+        if hasattr(os, 'register_at_fork'):
+            # Threads don't survive fork(); give each child a fresh queue and worker
+            os.register_at_fork(after_in_child=self._init_state)
+
+    def _init_state(self):
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._stats_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._worker = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._batch_sizes = {}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._busy_total = 0.0
+        self._stats_started = time.perf_counter()
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                worker.start()
+                self._worker = worker
+
+    def _enqueue(self, pending, timeout):
+        self._ensure_worker()
+        try:
+            self._queue.put(pending, timeout=timeout)
+        except queue.Full:
+            raise TimeoutError("Timed out waiting for space in the batch queue")
+
+    def submit(self, item, timeout=None):
+        """Queue ``item`` and block until its slice of the batch result is ready."""
+        pending = _Pending(item)
+        self._enqueue(pending, timeout)
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for batched inference")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def submit_async(self, item, callback, timeout=None):
+        """
+        Queue ``item`` without waiting for the result; ``callback(result, error)``
+        is called on the worker thread when its batch finishes. Blocks only
+        while a bounded queue is full.
+        """
+        self._enqueue(_Pending(item, callback), timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def is_healthy(self, max_queue_depth):
+        """False if the worker thread died or the queue is backed up past ``max_queue_depth``."""
+        worker = self._worker
+        if worker is not None and not worker.is_alive():
+            return False
+        return self._queue.qsize() <= max_queue_depth
+
+    def stats(self):
+        """Return batch-size and queue-wait statistics since startup."""
+        with self._stats_lock:
+            batches = self._batches
+            items = self._items
+            elapsed = time.perf_counter() - self._stats_started
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_queue": self.max_queue,
+                "batches": batches,
+                "items": items,
+                "errors": self._errors,
+                "queue_depth": self._queue.qsize(),
+                "avg_batch_size": items / batches if batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "avg_queue_wait_ms": self._wait_total / items * 1000.0 if items else 0.0,
+                "max_queue_wait_ms": self._wait_max * 1000.0,
+                # Fraction of wall time the worker spent in run_batch
+                "occupancy": self._busy_total / elapsed if elapsed > 0 else 0.0,
+            }
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            waits = [started - pending.enqueued_at for pending in batch]
+            try:
+                results = self.run_batch([pending.item for pending in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"run_batch returned {len(results)} results for {len(batch)} items"
+                    )
+                for pending, result in zip(batch, results):
+                    pending.result = result
+                failed = False
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+                failed = True
+            busy = time.perf_counter() - started
+
+            with self._stats_lock:
+                size = len(batch)
+                self._batches += 1
+                self._items += size
+                self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+                self._wait_total += sum(waits)
+                self._wait_max = max(self._wait_max, max(waits))
+                self._busy_total += busy
+                if failed:
+                    self._errors += 1
+
+            for pending in batch:
+                if pending.callback is not None:
+                    try:
+                        pending.callback(pending.result, pending.error)
+                    except Exception:
+                        logger.exception("Batch result callback failed")
+                pending.done.set()
@@ -0,0 +1,105 @@
+"""Bounded worker pool with admission control for async servers.
+
+CPU-bound work (image decode, model inference) runs on a fixed pool of
+threads instead of the event loop. At most ``max_workers + max_queue``
+jobs are admitted at once; beyond that ``run()`` raises ``Overloaded``
+immediately so the server can answer 503 with ``Retry-After`` rather than
+letting requests pile up until clients time out. Jobs that waited in the
+queue longer than ``queue_timeout`` are dropped the same way before they
+start.
+"""
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """Raised when a job is rejected because the pool is saturated."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Run blocking callables from coroutines on a bounded thread pool.
+
+    Admission bookkeeping is only touched from the event loop thread, so it
+    needs no locks.
+    """
+
+    def __init__(self, max_workers=1, max_queue=8, queue_timeout=None, retry_after=1,
+                 thread_name_prefix='inference'):
+        self.max_workers = int(max_workers)
+        self.max_queue = int(max_queue)
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=thread_name_prefix)
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def is_full(self):
+        return self.in_flight >= self.capacity
+
+    def queued(self):
+        return max(0, self.in_flight - self.max_workers)
+
+    def check_capacity(self):
+        """Raise ``Overloaded`` now if a new job would be rejected."""
+        if self.is_full():
+            self.rejected += 1
+            raise Overloaded("Inference queue is full", self.retry_after)
+
+    def _call(self, enqueued_at, fn):
+        # Runs on a worker thread
+        if self.queue_timeout is not None and time.monotonic() - enqueued_at > self.queue_timeout:
+            raise Overloaded("Request waited too long in the inference queue", self.retry_after)
+        return fn()
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` on the pool, or raise ``Overloaded``."""
+        self.check_capacity()
+        loop = asyncio.get_running_loop()
+        job = functools.partial(self._call, time.monotonic(), functools.partial(fn, *args, **kwargs))
+        future = self._executor.submit(job)
+        self.in_flight += 1
+        # Release the slot when the job finishes, not when the caller stops waiting: a
+        # cancelled request (client disconnected) leaves its job running on the pool
+        future.add_done_callback(lambda done: self._call_soon(loop, self._finished, done))
+        return await asyncio.wrap_future(future)
+
+    @staticmethod
+    def _call_soon(loop, callback, *args):
+        # Done callbacks run on a worker thread, or on the loop when a queued job is cancelled
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass  # loop closed during shutdown
+
+    def _finished(self, future):
+        self.in_flight -= 1
+        if future.cancelled():
+            return
+        if isinstance(future.exception(), Overloaded):
+            self.expired += 1
+        elif future.exception() is None:
+            self.completed += 1
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued(),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "expired": self.expired,
+        }
@@ -0,0 +1,109 @@
+"""Preallocated, reused tensor buffers for the PyTorch inference path.
+
+Allocating a fresh float32 input tensor, logits and softmax output for
+every request churns the allocator at high QPS, and the fragmentation
+shows up as RSS that keeps creeping up over hours. Here the buffers are
+allocated once at startup and reused:
+
+``SlotPool``
+    a fixed set of (3, H, W) float32 slots that decode workers normalize
+    single images into. Acquiring blocks when every slot is in use, so
+    the pool also caps how many decoded images exist at once.
+
+``BatchBuffers``
+    one input batch of ``max_batch_size`` images plus logits and top-k
+    outputs, owned by the single model worker. Softmax and top-k run in
+    place, and only small Python lists leave the worker, so nothing a
+    request holds on to points into a buffer that the next batch
+    overwrites.
+
+What the model allocates internally for its activations is outside this
+module's control; ``memory_soak.py`` measures the end-to-end effect.
+"""
+import queue
+
+import numpy as np
+import torch
+
+
+class SlotPool:
+    """Fixed number of preallocated arrays of one shape, handed out by index."""
+
+    def __init__(self, count, shape, dtype=np.float32):
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        self.shape = tuple(shape)
+        self._arrays = [np.zeros(self.shape, dtype=dtype) for _ in range(count)]
+        # LIFO: the most recently released slot is the one most likely still in cache
+        self._free = queue.LifoQueue()
+        for index in range(count):
+            self._free.put(index)
+        self.waits = 0
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def acquire(self, timeout=None):
+        """Return the index of a free slot, blocking until one is released."""
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            self.waits += 1
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("Timed out waiting for a free input buffer")
+
+    def release(self, index):
+        self._free.put(index)
+
+    def array(self, index):
+        return self._arrays[index]
+
+    def stats(self):
+        return {
+            "slots": len(self._arrays),
+            "in_use": len(self._arrays) - self._free.qsize(),
+            "waits": self.waits,
+            "bytes": sum(array.nbytes for array in self._arrays),
+        }
+
+
+class BatchBuffers:
+    """Input, logits and top-k buffers for batches of up to ``max_batch_size``; single-threaded use only."""
+
+    def __init__(self, max_batch_size, input_shape, num_labels, top_k=3):
+        self.max_batch_size = int(max_batch_size)
+        self.top_k = int(top_k)
+        self.pixel_values = np.zeros((self.max_batch_size,) + tuple(input_shape), dtype=np.float32)
+        self.logits = np.zeros((self.max_batch_size, num_labels), dtype=np.float32)
+        self.top_probs = np.zeros((self.max_batch_size, self.top_k), dtype=np.float32)
+        self.top_indices = np.zeros((self.max_batch_size, self.top_k), dtype=np.int64)
+        # Torch views sharing the same memory
+        self.pixel_values_t = torch.from_numpy(self.pixel_values)
+        self.logits_t = torch.from_numpy(self.logits)
+        self.top_probs_t = torch.from_numpy(self.top_probs)
+        self.top_indices_t = torch.from_numpy(self.top_indices)
+
+    def gather(self, slot_pool, slot_indices):
+        """Copy the given slots into the first rows of the input batch and release them."""
+        try:
+            for row, index in enumerate(slot_indices):
+                np.copyto(self.pixel_values[row], slot_pool.array(index))
+        finally:
+            for index in slot_indices:
+                slot_pool.release(index)
+        return len(slot_indices)
+
+    def top_k_results(self, size):
+        """
+        Softmax the first ``size`` logits rows in place and return one
+        ``(top_probs, top_indices)`` pair of lists per row.
+        """
+        logits = self.logits_t[:size]
+        with torch.no_grad():
+            logits.sub_(logits.max(dim=1, keepdim=True).values)
+            logits.exp_()
+            logits.div_(logits.sum(dim=1, keepdim=True))
+            torch.topk(logits, self.top_k, dim=1, out=(self.top_probs_t[:size], self.top_indices_t[:size]))
+        return list(zip(self.top_probs[:size].tolist(), self.top_indices[:size].tolist()))
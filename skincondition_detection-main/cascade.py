@@ -0,0 +1,86 @@
+"""Cascade inference: a small student model first, the full ViT only when needed.
+
+The student (see distill_student.py) is trained against the ViT's outputs
+over the same 1000 labels, so its top-k maps to conditions exactly like the
+ViT's does. Every image goes through the student. It is escalated to the
+full model when the student's top-1 probability is below ``threshold``,
+or when the condition it predicts is critical and a wrong answer costs
+more than the extra forward pass.
+
+cascade_report.py (next to local_ai_server.py) measures the escalation
+rate, latency and agreement with ViT-only predictions for a range of
+thresholds.
+"""
+import os
+import threading
+
+OUTCOMES = ('student', 'low_confidence', 'critical')
+
+
+def load_student(model_dir, num_labels, image_size):
+    """
+    Load the student from ``model_dir`` and check that it predicts the same
+    labels as the full model from the same input size.
+    """
+    from mmap_weights import load_vit_model
+
+    student = load_vit_model(model_dir)
+    config = student.config
+    if config.num_labels != num_labels:
+        raise ValueError(f"Student in {model_dir} has {config.num_labels} labels, the ViT has {num_labels}")
+    if (config.image_size, config.image_size) != tuple(image_size):
+        raise ValueError(f"Student in {model_dir} expects {config.image_size}px inputs, not {image_size}")
+    return student
+
+
+class CascadePolicy:
+    """
+    Decides which student predictions escalate. ``is_critical(index)`` says
+    whether a class index maps to a critical condition.
+    """
+
+    def __init__(self, threshold, is_critical):
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError("threshold must be between 0 and 1")
+        self.threshold = float(threshold)
+        self.is_critical = is_critical
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(OUTCOMES, 0)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(OUTCOMES, 0)
+
+    def outcome(self, top_prob, top_index):
+        """'student' if the student's answer stands, otherwise why it escalates."""
+        if self.is_critical(top_index):
+            return 'critical'
+        if top_prob < self.threshold:
+            return 'low_confidence'
+        return 'student'
+
+    def escalations(self, results):
+        """
+        Given one ``(top_probs, top_indices)`` pair per image, return the
+        ``(row, outcome)`` pairs of the images to escalate and count every
+        image's outcome.
+        """
+        outcomes = [self.outcome(top_probs[0], top_indices[0]) for top_probs, top_indices in results]
+        with self._lock:
+            for outcome in outcomes:
+                self._counts[outcome] += 1
+        return [(row, outcome) for row, outcome in enumerate(outcomes) if outcome != 'student']
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        escalated = total - counts['student']
+        return {
+            "threshold": self.threshold,
+            "images": total,
+            "outcomes": counts,
+            "escalation_rate": escalated / total if total else 0.0,
+        }
@@ -0,0 +1,107 @@
+"""Benchmark JPEG draft-mode decoding against a full decode.
+
+For every image in a folder, times the full decode + resize and the
+draft-mode decode + resize, and (with --predict) checks that the model's
+top-1 prediction is the same for both.
+
+Usage:
+    python decode_benchmark.py path/to/images [--repeat 5] [--predict] [--output report.json]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from preprocessing import ViTPreprocessor, list_images
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def time_decode(preprocessor, image_bytes, repeat):
+    """Return the best-of-``repeat`` decode time in ms and the decoded array."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        array = preprocessor.decode(image_bytes)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0, array
+
+
+def predict_probs(model_dir, full_arrays, draft_arrays, preprocessor):
+    import torch
+    from transformers import ViTForImageClassification
+
+    model = ViTForImageClassification.from_pretrained(model_dir)
+    model.eval()
+    with torch.no_grad():
+        full = model(pixel_values=torch.from_numpy(preprocessor.to_pixel_values(full_arrays))).logits
+        draft = model(pixel_values=torch.from_numpy(preprocessor.to_pixel_values(draft_arrays))).logits
+    full_probs = torch.nn.functional.softmax(full, dim=1).numpy()
+    draft_probs = torch.nn.functional.softmax(draft, dim=1).numpy()
+    return full_probs, draft_probs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('images', help="Folder of images")
+    parser.add_argument('--model-dir', default=os.path.join(HERE, 'saved_vit_model'))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--predict', action='store_true', help="Also compare model predictions")
+    parser.add_argument('--output', default=None, help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    full_decoder = ViTPreprocessor.from_pretrained(args.model_dir, jpeg_draft=False)
+    draft_decoder = ViTPreprocessor.from_pretrained(args.model_dir, jpeg_draft=True)
+
+    rows, full_arrays, draft_arrays = [], [], []
+    for path in list_images(args.images):
+        name = os.path.basename(path)
+        with open(path, 'rb') as f:
+            image_bytes = f.read()
+        full_ms, full_array = time_decode(full_decoder, image_bytes, args.repeat)
+        draft_ms, draft_array = time_decode(draft_decoder, image_bytes, args.repeat)
+        full_arrays.append(full_array)
+        draft_arrays.append(draft_array)
+        rows.append({
+            "image": name,
+            "bytes": len(image_bytes),
+            "full_ms": full_ms,
+            "draft_ms": draft_ms,
+            "speedup": full_ms / draft_ms if draft_ms else None,
+            "max_pixel_diff": int(np.max(np.abs(full_array.astype(np.int16) - draft_array.astype(np.int16)))),
+        })
+        print(f"{name}: full {full_ms:.1f} ms, draft {draft_ms:.1f} ms")
+
+    if not rows:
+        raise SystemExit(f"No images found in {args.images}")
+
+    report = {
+        "images": len(rows),
+        "full_ms_total": sum(row["full_ms"] for row in rows),
+        "draft_ms_total": sum(row["draft_ms"] for row in rows),
+        "rows": rows,
+    }
+    report["speedup"] = report["full_ms_total"] / report["draft_ms_total"]
+
+    if args.predict:
+        full_probs, draft_probs = predict_probs(args.model_dir, full_arrays, draft_arrays, full_decoder)
+        agree = full_probs.argmax(axis=1) == draft_probs.argmax(axis=1)
+        report["top1_agreement"] = float(agree.mean())
+        report["max_probability_delta"] = float(np.max(np.abs(full_probs - draft_probs)))
+        for row, same in zip(rows, agree):
+            row["same_top1"] = bool(same)
+
+    print(f"{report['images']} images: full {report['full_ms_total']:.1f} ms, "
+          f"draft {report['draft_ms_total']:.1f} ms ({report['speedup']:.2f}x)")
+    if args.predict:
+        print(f"top-1 agreement {report['top1_agreement']:.3f}, "
+              f"max probability delta {report['max_probability_delta']:.4f}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
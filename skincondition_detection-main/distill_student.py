@@ -0,0 +1,224 @@
+"""Distill a small student ViT from the saved ViT for cascade inference.
+
+The student is trained only on the teacher's soft outputs: a temperature-scaled
+KL divergence over the same 1000 labels. That means any unlabeled folder of
+representative images will do, e.g. a sample of production uploads. Teacher
+logits are computed once per image (and per flip) and then reused on every
+epoch, so the expensive model runs only during the first epoch.
+
+The default architecture is ViT-Tiny (12 layers, hidden size 192, 3 heads).
+``--init`` starts from a pretrained student checkpoint with the same labels
+instead of random weights, which needs far fewer images and epochs.
+
+The output directory is self-contained: config, ``model.safetensors`` (which
+the server memory-maps) and a copy of the teacher's preprocessor config. Each
+epoch prints validation top-1 agreement with the teacher, and the best epoch
+is kept. Serve it with ``VIT_CASCADE_STUDENT=<output dir>`` and pick the
+threshold with ``cascade_report.py``.
+
+Usage:
+    python distill_student.py path/to/images [--output saved_student_model] [--epochs 30]
+        [--layers 12 --hidden-size 192 --heads 3] [--init path/or/hub-id]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from transformers import ViTConfig, ViTForImageClassification
+
+from mmap_weights import load_vit_model
+from preprocessing import PREPROCESSOR_CONFIG, ViTPreprocessor, list_images
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class ImageFolder(torch.utils.data.Dataset):
+    """Images decoded with the serving preprocessor; yields (index, flipped, pixel_values)."""
+
+    def __init__(self, paths, preprocessor, flip=False):
+        self.paths = paths
+        self.preprocessor = preprocessor
+        self.flip = flip
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        with open(self.paths[index], 'rb') as f:
+            image = self.preprocessor.decode(f.read())
+        flipped = self.flip and random.random() < 0.5
+        if flipped:
+            image = np.ascontiguousarray(image[:, ::-1])
+        return index, flipped, torch.from_numpy(self.preprocessor.to_pixel_values(image[None])[0])
+
+
+class TeacherCache:
+    """Teacher logits per (image, flipped), stored as float16 after the first time they're needed."""
+
+    def __init__(self, teacher):
+        self.teacher = teacher
+        self._logits = {}
+
+    def __call__(self, indices, flipped, pixel_values):
+        keys = list(zip(indices.tolist(), flipped.tolist()))
+        missing = [row for row, key in enumerate(keys) if key not in self._logits]
+        if missing:
+            with torch.no_grad():
+                logits = self.teacher(pixel_values=pixel_values[missing]).logits
+            for row, value in zip(missing, logits.half()):
+                self._logits[keys[row]] = value
+        return torch.stack([self._logits[key] for key in keys]).float()
+
+
+def distillation_loss(student_logits, teacher_logits, temperature):
+    """KL(teacher || student) on temperature-softened distributions, scaled by T^2."""
+    return F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.log_softmax(teacher_logits / temperature, dim=1),
+        reduction='batchmean',
+        log_target=True,
+    ) * temperature ** 2
+
+
+def build_student(teacher_config, args):
+    if args.init:
+        student = ViTForImageClassification.from_pretrained(args.init)
+        if student.config.num_labels != teacher_config.num_labels:
+            raise SystemExit(f"{args.init} has {student.config.num_labels} labels, the teacher has "
+                             f"{teacher_config.num_labels}")
+        student.config.id2label = dict(teacher_config.id2label)
+        student.config.label2id = dict(teacher_config.label2id)
+    else:
+        config = ViTConfig(
+            hidden_size=args.hidden_size,
+            num_hidden_layers=args.layers,
+            num_attention_heads=args.heads,
+            intermediate_size=args.intermediate_size or args.hidden_size * 4,
+            image_size=teacher_config.image_size,
+            patch_size=teacher_config.patch_size,
+            num_channels=teacher_config.num_channels,
+            qkv_bias=teacher_config.qkv_bias,
+            # Same labels as the teacher, so the server maps the student's top-k to conditions unchanged
+            id2label=dict(teacher_config.id2label),
+            label2id=dict(teacher_config.label2id),
+        )
+        student = ViTForImageClassification(config)
+    return student
+
+
+@torch.no_grad()
+def evaluate(student, loader, teacher_cache, temperature):
+    student.eval()
+    agree = total = 0
+    loss_sum = 0.0
+    for indices, flipped, pixel_values in loader:
+        teacher_logits = teacher_cache(indices, flipped, pixel_values)
+        student_logits = student(pixel_values=pixel_values).logits
+        loss_sum += float(distillation_loss(student_logits, teacher_logits, temperature)) * len(indices)
+        agree += int((student_logits.argmax(dim=1) == teacher_logits.argmax(dim=1)).sum())
+        total += len(indices)
+    return {"kl": loss_sum / total, "top1_agreement": agree / total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('images', help="Folder of representative (unlabeled) images")
+    parser.add_argument('--model-dir', default=os.path.join(HERE, 'saved_vit_model'), help="Teacher")
+    parser.add_argument('--output', default=os.path.join(HERE, 'saved_student_model'))
+    parser.add_argument('--init', default=None, help="Pretrained student checkpoint to start from")
+    parser.add_argument('--layers', type=int, default=12)
+    parser.add_argument('--hidden-size', type=int, default=192)
+    parser.add_argument('--heads', type=int, default=3)
+    parser.add_argument('--intermediate-size', type=int, default=None, help="Default: 4 x hidden size")
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--lr', type=float, default=5e-4)
+    parser.add_argument('--weight-decay', type=float, default=0.05)
+    parser.add_argument('--temperature', type=float, default=2.0)
+    parser.add_argument('--val-fraction', type=float, default=0.1)
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help="Decode workers")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    paths = list_images(args.images)
+    if len(paths) < 2:
+        raise SystemExit(f"Need at least 2 images in {args.images}")
+    random.Random(args.seed).shuffle(paths)
+    val_count = max(1, int(len(paths) * args.val_fraction))
+    train_paths, val_paths = paths[val_count:], paths[:val_count]
+
+    preprocessor = ViTPreprocessor.from_pretrained(args.model_dir)
+    teacher = load_vit_model(args.model_dir)
+    student = build_student(teacher.config, args)
+    print(f"Teacher {sum(p.numel() for p in teacher.parameters()) / 1e6:.1f}M parameters, "
+          f"student {sum(p.numel() for p in student.parameters()) / 1e6:.1f}M; "
+          f"{len(train_paths)} training and {len(val_paths)} validation images")
+
+    train_loader = torch.utils.data.DataLoader(
+        ImageFolder(train_paths, preprocessor, flip=True), batch_size=args.batch_size, shuffle=True,
+        num_workers=args.workers, drop_last=len(train_paths) > args.batch_size
+    )
+    val_loader = torch.utils.data.DataLoader(
+        ImageFolder(val_paths, preprocessor), batch_size=args.batch_size, num_workers=args.workers
+    )
+    # Separate caches: indices refer to different path lists
+    train_teacher = TeacherCache(teacher)
+    val_teacher = TeacherCache(teacher)
+
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.lr, weight_decay=args.weight_decay)
+    total_steps = args.epochs * len(train_loader)
+    warmup_steps = min(len(train_loader), total_steps // 10)
+    scheduler = torch.optim.lr_scheduler.LambdaLR(
+        optimizer,
+        lambda step: (step + 1) / warmup_steps if step < warmup_steps
+        else 0.5 * (1 + math.cos(math.pi * (step - warmup_steps) / max(1, total_steps - warmup_steps)))
+    )
+
+    os.makedirs(args.output, exist_ok=True)
+    best = None
+    history = []
+    for epoch in range(1, args.epochs + 1):
+        student.train()
+        started = time.perf_counter()
+        loss_sum = 0.0
+        seen = 0
+        for indices, flipped, pixel_values in train_loader:
+            teacher_logits = train_teacher(indices, flipped, pixel_values)
+            loss = distillation_loss(student(pixel_values=pixel_values).logits, teacher_logits, args.temperature)
+            optimizer.zero_grad(set_to_none=True)
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+            optimizer.step()
+            scheduler.step()
+            loss_sum += float(loss) * len(indices)
+            seen += len(indices)
+
+        val = evaluate(student, val_loader, val_teacher, args.temperature)
+        entry = {"epoch": epoch, "train_kl": loss_sum / max(seen, 1), "val_kl": val["kl"],
+                 "val_top1_agreement": val["top1_agreement"], "seconds": time.perf_counter() - started}
+        history.append(entry)
+        print(f"epoch {epoch}: train KL {entry['train_kl']:.4f}, val KL {val['kl']:.4f}, "
+              f"val top-1 agreement {val['top1_agreement']:.3f} ({entry['seconds']:.0f} s)")
+        if best is None or val["top1_agreement"] > best["val_top1_agreement"]:
+            best = entry
+            student.save_pretrained(args.output, safe_serialization=True)
+
+    shutil.copy(os.path.join(args.model_dir, PREPROCESSOR_CONFIG), os.path.join(args.output, PREPROCESSOR_CONFIG))
+    with open(os.path.join(args.output, 'distillation.json'), 'w', encoding='utf-8') as f:
+        json.dump({"teacher": os.path.abspath(args.model_dir), "args": vars(args), "best": best,
+                   "history": history}, f, indent=2)
+    print(f"Saved the epoch {best['epoch']} student (val top-1 agreement "
+          f"{best['val_top1_agreement']:.3f}) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Export the saved ViT model to ONNX and check it against PyTorch.
+
+Usage:
+    python export_onnx.py [--model-dir saved_vit_model] [--output saved_vit_model/model.onnx]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import torch
+from transformers import ViTForImageClassification
+
+from onnx_backend import ONNX_FILENAME, OnnxBackend
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Wrap the HF model so the exported graph has a single ``logits`` output."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model(pixel_values=pixel_values).logits
+
+
+def export(model_dir, output_path, opset=14):
+    model = ViTForImageClassification.from_pretrained(model_dir)
+    model.eval()
+    size = model.config.image_size
+    dummy = torch.randn(1, model.config.num_channels, size, size)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model),
+            (dummy,),
+            output_path,
+            input_names=['pixel_values'],
+            output_names=['logits'],
+            dynamic_axes={'pixel_values': {0: 'batch'}, 'logits': {0: 'batch'}},
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    print(f"Exported ONNX model to {output_path}")
+    return model
+
+
+def verify(model, output_path, batch_sizes=(1, 4), atol=1e-3):
+    """Compare ONNX Runtime logits with eager PyTorch on random inputs."""
+    backend = OnnxBackend(output_path)
+    size = model.config.image_size
+    ok = True
+    for batch_size in batch_sizes:
+        pixel_values = torch.randn(batch_size, model.config.num_channels, size, size)
+        with torch.no_grad():
+            expected = model(pixel_values=pixel_values).logits.numpy()
+        actual = backend(pixel_values.numpy())
+        max_diff = float(np.max(np.abs(expected - actual)))
+        same_top1 = bool(np.all(expected.argmax(axis=1) == actual.argmax(axis=1)))
+        print(f"batch={batch_size}: max |logit diff| = {max_diff:.2e}, top-1 match = {same_top1}")
+        ok = ok and max_diff <= atol and same_top1
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model-dir', default=os.path.join(HERE, 'saved_vit_model'))
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--opset', type=int, default=14)
+    parser.add_argument('--atol', type=float, default=1e-3)
+    args = parser.parse_args()
+
+    output_path = args.output or os.path.join(args.model_dir, ONNX_FILENAME)
+    model = export(args.model_dir, output_path, opset=args.opset)
+    if not verify(model, output_path, atol=args.atol):
+        print(f"ONNX outputs differ from PyTorch by more than {args.atol}")
+        sys.exit(1)
+    print("ONNX outputs match PyTorch")
+
+
+if __name__ == '__main__':
+    main()
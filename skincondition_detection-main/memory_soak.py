@@ -0,0 +1,174 @@
+"""Soak test for steady-state memory of the inference path.
+
+Two ways to run it:
+
+In process: loops decode -> normalize -> forward -> softmax/top-k over a
+folder of images for ``--duration`` seconds, either with the pooled
+buffers the server uses (``--mode pooled``) or with fresh allocations
+per request (``--mode fresh``), sampling this process's RSS.
+
+    python memory_soak.py path/to/images --mode pooled --duration 3600 --output soak.json
+
+Against a running server: samples the RSS of ``--pid`` while load is
+driven separately, e.g. with ``load_test.py``.
+
+    python memory_soak.py --pid 12345 --duration 3600 --output soak.json
+
+The report has the RSS samples, the RSS at the start and end of the steady
+state (after the first ``--settle`` fraction of the run), and the growth
+rate fitted over that window in MB/hour. Flat memory shows up as a slope
+near zero.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def rss_mb(pid='self'):
+    with open(f'/proc/{pid}/status', 'r') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024.0
+    return None
+
+
+class RssSampler:
+    """Samples a process's RSS every ``interval`` seconds on a background thread."""
+
+    def __init__(self, pid='self', interval=5.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        started = time.perf_counter()
+        while True:
+            self.samples.append((time.perf_counter() - started, rss_mb(self.pid)))
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+def build_report(samples, settle, config):
+    times = np.array([t for t, _ in samples])
+    rss = np.array([value for _, value in samples])
+    steady = times >= times[-1] * settle
+    if steady.sum() >= 2:
+        slope_per_s = float(np.polyfit(times[steady], rss[steady], 1)[0])
+    else:
+        slope_per_s = 0.0
+    return {
+        "config": config,
+        "duration_s": float(times[-1]),
+        "rss_mb_first": float(rss[0]),
+        "rss_mb_steady_start": float(rss[steady][0]),
+        "rss_mb_end": float(rss[-1]),
+        "rss_mb_max": float(rss.max()),
+        "steady_growth_mb": float(rss[-1] - rss[steady][0]),
+        "steady_slope_mb_per_hour": slope_per_s * 3600.0,
+        "samples": [{"t": round(float(t), 1), "rss_mb": round(float(value), 1)} for t, value in samples],
+    }
+
+
+def soak_in_process(args):
+    import torch
+
+    from buffer_pool import BatchBuffers, SlotPool
+    from mmap_weights import load_vit_model
+    from preprocessing import ViTPreprocessor, list_images
+
+    preprocessor = ViTPreprocessor.from_pretrained(args.model_dir)
+    model = load_vit_model(args.model_dir)
+    payloads = []
+    for path in list_images(args.images):
+        with open(path, 'rb') as f:
+            payloads.append(f.read())
+    if not payloads:
+        raise SystemExit(f"No images found in {args.images}")
+
+    batch_size = args.batch_size
+    input_shape = (3,) + preprocessor.size
+    slots = SlotPool(batch_size, input_shape)
+    buffers = BatchBuffers(batch_size, input_shape, model.config.num_labels)
+
+    def pooled_batch(batch_payloads):
+        indices = []
+        for image_bytes in batch_payloads:
+            image = preprocessor.decode(image_bytes)
+            index = slots.acquire()
+            preprocessor.to_pixel_values(image[None], out=slots.array(index)[None])
+            indices.append(index)
+        size = buffers.gather(slots, indices)
+        with torch.no_grad():
+            buffers.logits_t[:size].copy_(model(pixel_values=buffers.pixel_values_t[:size]).logits)
+        return buffers.top_k_results(size)
+
+    def fresh_batch(batch_payloads):
+        pixel_values = torch.from_numpy(preprocessor(batch_payloads))
+        with torch.no_grad():
+            probs = torch.nn.functional.softmax(model(pixel_values=pixel_values).logits, dim=1)
+            top_probs, top_indices = torch.topk(probs, k=3, dim=1)
+        return list(zip(top_probs.tolist(), top_indices.tolist()))
+
+    run_batch = pooled_batch if args.mode == 'pooled' else fresh_batch
+    sampler = RssSampler(interval=args.interval).start()
+    deadline = time.perf_counter() + args.duration
+    batches = 0
+    while time.perf_counter() < deadline:
+        start = (batches * batch_size) % len(payloads)
+        run_batch([payloads[(start + i) % len(payloads)] for i in range(batch_size)])
+        batches += 1
+    samples = sampler.stop()
+    return samples, {"mode": args.mode, "batch_size": batch_size, "batches": batches, "images": len(payloads)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('images', nargs='?', help="Folder of images (in-process soak)")
+    parser.add_argument('--pid', type=int, default=None, help="Sample a running server instead")
+    parser.add_argument('--mode', choices=('pooled', 'fresh'), default='pooled')
+    parser.add_argument('--model-dir', default=os.path.join(HERE, 'saved_vit_model'))
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=600.0, help="Seconds to run")
+    parser.add_argument('--interval', type=float, default=5.0, help="Seconds between RSS samples")
+    parser.add_argument('--settle', type=float, default=0.2, help="Fraction of the run treated as warmup")
+    parser.add_argument('--output', default=None, help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    if args.pid is not None:
+        sampler = RssSampler(pid=args.pid, interval=args.interval).start()
+        time.sleep(args.duration)
+        samples = sampler.stop()
+        config = {"pid": args.pid}
+    elif args.images:
+        samples, config = soak_in_process(args)
+    else:
+        parser.error("give an images folder or --pid")
+
+    report = build_report(samples, args.settle, config)
+    print(f"RSS {report['rss_mb_first']:.0f} MB at start, {report['rss_mb_steady_start']:.0f} MB after settling, "
+          f"{report['rss_mb_end']:.0f} MB at end (max {report['rss_mb_max']:.0f} MB); "
+          f"steady-state slope {report['steady_slope_mb_per_hour']:+.1f} MB/hour")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
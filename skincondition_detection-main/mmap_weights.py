@@ -0,0 +1,97 @@
+"""Memory-mapped safetensors loading for the PyTorch ViT.
+
+``prepare_weights.py`` writes ``model.safetensors`` next to the saved
+model. ``load_vit_model()`` maps that file read-only and copy-on-write
+(MAP_PRIVATE) and builds the model around views into the mapping, without
+running ``from_pretrained``'s deserialization. Pages are read from the OS
+page cache only when first used, so replicas on one host share a single
+copy of the weights. Without the prepared file the usual
+``from_pretrained`` path is used.
+"""
+import json
+import logging
+import os
+import struct
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+WEIGHTS_FILENAME = 'model.safetensors'
+
+_DTYPES = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+
+
+def mmap_state_dict(path):
+    """Return a state dict whose tensors are views into a private mapping of ``path``."""
+    with open(path, 'rb') as f:
+        (header_len,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_len))
+    header.pop('__metadata__', None)
+
+    data_start = 8 + header_len
+    nbytes = os.path.getsize(path)
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=nbytes)
+
+    state_dict = {}
+    for name, info in header.items():
+        dtype = _DTYPES[info['dtype']]
+        start, end = info['data_offsets']
+        itemsize = torch.empty((), dtype=dtype).element_size()
+        offset = data_start + start
+        if offset % itemsize:
+            # Unaligned entry: fall back to a copy rather than a misaligned view
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = bytearray(f.read(end - start))
+            state_dict[name] = torch.frombuffer(data, dtype=dtype).reshape(info['shape'])
+            continue
+        tensor = torch.empty(0, dtype=dtype)
+        tensor.set_(storage, offset // itemsize, torch.Size(info['shape']))
+        state_dict[name] = tensor
+    return state_dict
+
+
+def load_vit_model(model_dir, model_class=None):
+    """
+    Load the ViT from ``model_dir``, memory-mapping ``model.safetensors``
+    when it exists and ``VIT_MMAP_WEIGHTS`` isn't ``0``.
+    """
+    from transformers import AutoConfig, ViTForImageClassification
+
+    model_class = model_class or ViTForImageClassification
+    weights_path = os.path.join(model_dir, WEIGHTS_FILENAME)
+    if os.getenv('VIT_MMAP_WEIGHTS', '1') == '0' or not os.path.exists(weights_path):
+        model = model_class.from_pretrained(model_dir)
+        model.eval()
+        return model
+
+    config = AutoConfig.from_pretrained(model_dir)
+    # Build the module tree without allocating or initialising any weights
+    with torch.device('meta'):
+        model = model_class(config)
+    missing, unexpected = model.load_state_dict(mmap_state_dict(weights_path), strict=False, assign=True)
+    if missing:
+        raise RuntimeError(f"{weights_path} is missing weights: {', '.join(missing)}")
+    if unexpected:
+        logger.warning(f"Ignoring unexpected weights in {weights_path}: {', '.join(unexpected)}")
+    if any(buffer.is_meta for buffer in model.buffers()):
+        # Non-persistent buffers aren't in the file; let from_pretrained build them
+        logger.warning("Model has buffers outside the weights file; loading with from_pretrained")
+        model = model_class.from_pretrained(model_dir)
+        model.eval()
+        return model
+    model.eval()
+    logger.info(f"Memory-mapped ViT weights from {weights_path}")
+    return model
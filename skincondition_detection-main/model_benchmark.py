@@ -0,0 +1,264 @@
+"""Benchmark every ViT serving backend on the same images.
+
+Each (backend, thread count) pair runs in a fresh Python process, so peak
+RSS and thread settings are per backend and loading one model doesn't
+affect the next. For every batch size the child reports images/sec and
+per-batch latency; the parent compares each backend's probabilities over
+the image set against the reference backend (top-1 agreement and max
+probability delta).
+
+Backends:
+    torch-eager  ViTForImageClassification.from_pretrained
+    torch-mmap   memory-mapped model.safetensors (run prepare_weights.py first)
+    torch-int8   dynamic INT8 quantization
+    onnx         ONNX Runtime on model.onnx (run export_onnx.py first)
+    tf-eager     TFViTForImageClassification, eager
+    tf-graph     the same, traced into a tf.function
+    tf-xla       the same, XLA-compiled
+
+Backends whose artifact or package is missing are reported as skipped.
+
+Usage:
+    python model_benchmark.py path/to/images [--backends torch-eager,onnx] [--batch-sizes 1,4,8,16]
+        [--threads 1,4] [--iterations 10] [--output results.json] [--csv results.csv]
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKENDS = ('torch-eager', 'torch-mmap', 'torch-int8', 'onnx', 'tf-eager', 'tf-graph', 'tf-xla')
+TABLE_COLUMNS = (
+    'backend', 'threads', 'batch_size', 'images_per_s', 'latency_ms_p50', 'latency_ms_p90',
+    'latency_ms_max', 'load_s', 'peak_rss_mb', 'top1_agreement', 'max_probability_delta',
+)
+
+
+class BackendUnavailable(Exception):
+    pass
+
+
+def softmax(logits):
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def load_backend(name, model_dir, threads):
+    """Return a callable mapping (N, 3, H, W) float32 pixel values to (N, labels) probabilities."""
+    if name.startswith('torch-'):
+        import torch
+
+        torch.set_num_threads(threads)
+        if name == 'torch-mmap':
+            from mmap_weights import WEIGHTS_FILENAME, load_vit_model
+
+            if not os.path.exists(os.path.join(model_dir, WEIGHTS_FILENAME)):
+                raise BackendUnavailable(f"{WEIGHTS_FILENAME} not found; run prepare_weights.py")
+            os.environ['VIT_MMAP_WEIGHTS'] = '1'
+            model = load_vit_model(model_dir)
+        else:
+            from transformers import ViTForImageClassification
+
+            model = ViTForImageClassification.from_pretrained(model_dir)
+            model.eval()
+        if name == 'torch-int8':
+            from quantization import quantize_dynamic_int8
+
+            model = quantize_dynamic_int8(model)
+
+        def forward(pixel_values):
+            with torch.no_grad():
+                logits = model(pixel_values=torch.from_numpy(pixel_values)).logits
+            return torch.nn.functional.softmax(logits, dim=1).numpy()
+        return forward
+
+    if name == 'onnx':
+        from onnx_backend import OnnxBackend, default_onnx_path
+
+        onnx_path = default_onnx_path(model_dir)
+        if not os.path.exists(onnx_path):
+            raise BackendUnavailable(f"{onnx_path} not found; run export_onnx.py")
+        backend = OnnxBackend(onnx_path, intra_op_threads=threads, inter_op_threads=1)
+        return lambda pixel_values: softmax(backend(pixel_values))
+
+    if name.startswith('tf-'):
+        import tensorflow as tf
+
+        # Must be set before TF creates its thread pools
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+        from transformers import TFViTForImageClassification
+        from tf_graph import compile_forward, eager_forward
+
+        model = TFViTForImageClassification.from_pretrained(model_dir)
+        mode = name[len('tf-'):]
+        tf_forward = eager_forward(model) if mode == 'eager' else compile_forward(model, jit_compile=(mode == 'xla'))
+        return lambda pixel_values: tf_forward(tf.constant(pixel_values)).numpy()
+
+    raise ValueError(f"Unknown backend {name!r}; choose from {', '.join(BACKENDS)}")
+
+
+def run_child(args):
+    """Load one backend, sweep the batch sizes and print a JSON result line."""
+    pixel_values = np.load(args.pixel_values)
+    start = time.perf_counter()
+    try:
+        forward = load_backend(args.child, args.model_dir, args.child_threads)
+    except (BackendUnavailable, ImportError) as e:
+        print(json.dumps({"skipped": str(e)}))
+        return
+    load_s = time.perf_counter() - start
+
+    # Probabilities over the whole image set, for agreement with the reference
+    probs = np.concatenate([forward(pixel_values[i:i + 8]) for i in range(0, len(pixel_values), 8)])
+    np.save(args.probs_out, probs)
+
+    rows = []
+    count = len(pixel_values)
+    for batch_size in (int(size) for size in args.batch_sizes.split(',')):
+        # Cycle through the images so every batch is full whatever the set size
+        batches = [
+            pixel_values[(start_index + np.arange(batch_size)) % count]
+            for start_index in range(0, max(count, batch_size), batch_size)
+        ]
+        forward(batches[0])  # warm this batch shape outside the timed loop
+        latencies = []
+        for i in range(args.iterations):
+            batch_start = time.perf_counter()
+            forward(batches[i % len(batches)])
+            latencies.append((time.perf_counter() - batch_start) * 1000.0)
+        rows.append({
+            "batch_size": batch_size,
+            "images_per_s": batch_size * len(latencies) * 1000.0 / sum(latencies),
+            "latency_ms_p50": float(np.percentile(latencies, 50)),
+            "latency_ms_p90": float(np.percentile(latencies, 90)),
+            "latency_ms_max": float(max(latencies)),
+        })
+
+    # ru_maxrss is in kB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    print(json.dumps({"load_s": load_s, "peak_rss_mb": peak_rss_mb, "rows": rows}))
+
+
+def load_pixel_values(folder, model_dir):
+    from preprocessing import ViTPreprocessor, list_images
+
+    preprocessor = ViTPreprocessor.from_pretrained(model_dir)
+    paths = list_images(folder)
+    if not paths:
+        raise SystemExit(f"No images found in {folder}")
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append(preprocessor.decode(f.read()))
+    return paths, preprocessor.to_pixel_values(images)
+
+
+def spawn(backend, threads, args, pixel_path, probs_path):
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child', backend, '--child-threads', str(threads),
+        '--pixel-values', pixel_path, '--probs-out', probs_path, '--model-dir', args.model_dir,
+        '--batch-sizes', args.batch_sizes, '--iterations', str(args.iterations),
+    ]
+    output = subprocess.run(command, capture_output=True, text=True)
+    if output.returncode != 0:
+        error_lines = output.stderr.strip().splitlines()
+        return {"skipped": f"failed: {error_lines[-1] if error_lines else output.returncode}"}
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def write_csv(rows, path):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS + ('skipped',), extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('images', nargs='?', help="Folder of images (the fixed benchmark set)")
+    parser.add_argument('--model-dir', default=os.path.join(HERE, 'saved_vit_model'))
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--reference', default='torch-eager', help="Backend the others are compared against")
+    parser.add_argument('--batch-sizes', default='1,4,8,16')
+    parser.add_argument('--threads', default=f"1,{os.cpu_count() or 1}", help="Comma-separated thread counts")
+    parser.add_argument('--iterations', type=int, default=10, help="Timed batches per batch size")
+    parser.add_argument('--output', default=None, help="Write the results table as JSON to this path")
+    parser.add_argument('--csv', default=None, help="Also write the results table as CSV")
+    # Internal: run a single backend in this process
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--child-threads', type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument('--pixel-values', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--probs-out', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+    if not args.images:
+        parser.error("the images folder is required")
+
+    backends = [backend.strip() for backend in args.backends.split(',') if backend.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"Unknown backends: {', '.join(sorted(unknown))}")
+    # The reference runs first so every other backend can be compared against it
+    backends.sort(key=lambda backend: backend != args.reference)
+    thread_counts = sorted({int(threads) for threads in args.threads.split(',')})
+
+    paths, pixel_values = load_pixel_values(args.images, args.model_dir)
+    print(f"Benchmarking {len(backends)} backends on {len(paths)} images")
+
+    table = []
+    reference_probs = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pixel_path = os.path.join(tmp_dir, 'pixel_values.npy')
+        np.save(pixel_path, pixel_values)
+        for backend in backends:
+            for threads in thread_counts:
+                probs_path = os.path.join(tmp_dir, f"{backend}-{threads}.npy")
+                result = spawn(backend, threads, args, pixel_path, probs_path)
+                if 'skipped' in result:
+                    print(f"{backend:12s} threads {threads:2d}: skipped ({result['skipped']})")
+                    table.append({"backend": backend, "threads": threads, "skipped": result['skipped']})
+                    continue
+
+                probs = np.load(probs_path)
+                if backend == args.reference and reference_probs is None:
+                    reference_probs = probs
+                agreement = delta = None
+                if reference_probs is not None:
+                    agreement = float(np.mean(probs.argmax(axis=1) == reference_probs.argmax(axis=1)))
+                    delta = float(np.max(np.abs(probs - reference_probs)))
+
+                for row in result['rows']:
+                    row.update(
+                        backend=backend, threads=threads, load_s=result['load_s'],
+                        peak_rss_mb=result['peak_rss_mb'], top1_agreement=agreement,
+                        max_probability_delta=delta,
+                    )
+                    table.append(row)
+                    print(f"{backend:12s} threads {threads:2d} batch {row['batch_size']:3d}: "
+                          f"{row['images_per_s']:7.1f} img/s, p50 {row['latency_ms_p50']:8.1f} ms, "
+                          f"RSS {row['peak_rss_mb']:6.0f} MB"
+                          + (f", top-1 {agreement:.3f}, max delta {delta:.1e}" if agreement is not None else ""))
+
+    table = [{column: row.get(column) for column in TABLE_COLUMNS + ('skipped',) if column in row} for row in table]
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"images": [os.path.basename(path) for path in paths],
+                       "reference": args.reference, "results": table}, f, indent=2)
+    if args.csv:
+        write_csv(table, args.csv)
+
+
+if __name__ == '__main__':
+    main()
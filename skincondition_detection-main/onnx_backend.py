@@ -0,0 +1,124 @@
+"""ONNX Runtime inference backend for the saved ViT model.
+
+``export_onnx.py`` writes ``model.onnx`` next to the saved model. The
+servers call ``load_onnx_backend()`` at startup when ``VIT_BACKEND=onnx``;
+it returns ``None`` if the artifact or onnxruntime is missing, in which
+case the server keeps its eager PyTorch/TF path.
+"""
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ONNX_FILENAME = 'model.onnx'
+
+
+def backend_name():
+    """Return the backend requested through ``VIT_BACKEND`` (default: the eager framework)."""
+    return os.getenv('VIT_BACKEND', 'eager').strip().lower()
+
+
+def default_onnx_path(model_dir):
+    return os.getenv('VIT_ONNX_PATH') or os.path.join(model_dir, ONNX_FILENAME)
+
+
+class OnnxBackend:
+    """
+    Callable mapping a float32 ``pixel_values`` batch (N, 3, H, W) to logits (N, num_labels).
+
+    With ``lazy=True`` the InferenceSession is only created on first use.
+    Sessions and their thread pools don't survive fork(), so a backend
+    created at import time in a pre-fork master builds its session in each
+    worker instead, and forked children always drop an inherited one.
+    """
+
+    def __init__(self, onnx_path, intra_op_threads=0, inter_op_threads=0, lazy=False):
+        self.path = onnx_path
+        # 0 lets onnxruntime pick its default
+        self.intra_op_threads = int(intra_op_threads)
+        self.inter_op_threads = int(inter_op_threads)
+        self._session_lock = threading.Lock()
+        self.session = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._drop_session)
+        if not lazy:
+            self.load()
+
+    def _drop_session(self):
+        self._session_lock = threading.Lock()
+        self.session = None
+
+    def set_threads(self, intra_op_threads=None, inter_op_threads=None):
+        """Change the thread counts; only sessions created afterwards use them."""
+        if intra_op_threads is not None:
+            self.intra_op_threads = int(intra_op_threads)
+        if inter_op_threads is not None:
+            self.inter_op_threads = int(inter_op_threads)
+
+    def load(self):
+        """Create the InferenceSession if this process doesn't have one yet."""
+        if self.session is not None:
+            return self
+        with self._session_lock:
+            if self.session is None:
+                import onnxruntime as ort
+
+                options = ort.SessionOptions()
+                options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                options.intra_op_num_threads = self.intra_op_threads
+                options.inter_op_num_threads = self.inter_op_threads
+                if self.inter_op_threads > 1:
+                    options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+                session = ort.InferenceSession(
+                    self.path, sess_options=options, providers=['CPUExecutionProvider']
+                )
+                self.input_name = session.get_inputs()[0].name
+                self.output_name = session.get_outputs()[0].name
+                self.session = session
+        return self
+
+    def __call__(self, pixel_values, out=None):
+        """Return the logits; with ``out`` (a C-contiguous float32 array) they are written there instead."""
+        self.load()
+        pixel_values = np.ascontiguousarray(pixel_values, dtype=np.float32)
+        if out is None:
+            return self.session.run([self.output_name], {self.input_name: pixel_values})[0]
+        binding = self.session.io_binding()
+        binding.bind_cpu_input(self.input_name, pixel_values)
+        binding.bind_output(self.output_name, 'cpu', 0, np.float32, list(out.shape), out.ctypes.data)
+        self.session.run_with_iobinding(binding)
+        return out
+
+
+def load_onnx_backend(model_dir, onnx_path=None, lazy=True):
+    """
+    Build an ``OnnxBackend`` for ``model_dir``, or return ``None`` so the
+    caller falls back to eager inference. By default the session is created
+    on first use, so servers that import this before forking get one per
+    worker.
+
+    Thread counts come from ``VIT_ORT_INTRA_OP_THREADS`` and
+    ``VIT_ORT_INTER_OP_THREADS``.
+    """
+    onnx_path = onnx_path or default_onnx_path(model_dir)
+    if not os.path.exists(onnx_path):
+        logger.warning(f"ONNX model not found at {onnx_path}; falling back to eager inference")
+        return None
+    try:
+        backend = OnnxBackend(
+            onnx_path,
+            intra_op_threads=os.getenv('VIT_ORT_INTRA_OP_THREADS', '0'),
+            inter_op_threads=os.getenv('VIT_ORT_INTER_OP_THREADS', '0'),
+            lazy=lazy,
+        )
+        if lazy:
+            # Fail over to eager inference now rather than on the first request
+            import onnxruntime  # noqa: F401
+    except ImportError:
+        logger.warning("onnxruntime is not installed; falling back to eager inference")
+        return None
+    logger.info(f"Serving ViT through ONNX Runtime from {onnx_path}")
+    return backend
@@ -0,0 +1,151 @@
+"""Staged decode -> batch -> forward pipeline for the inference servers.
+
+Request threads hand raw upload bytes to a bounded input queue. A pool of
+decode workers turns them into normalized tensors and passes those to a
+``MicroBatcher`` (ideally with its own bounded queue), whose worker runs
+the forward pass. Decoding the next images therefore overlaps with the
+forward pass of the current batch, and the two bounded queues cap how
+many images are held in memory between the stages.
+
+``stats()`` reports each stage's occupancy (fraction of wall time spent
+working) and queue depth. A decode stage that is mostly *blocked* on a
+full batch queue means the model is the bottleneck; a model worker with
+low occupancy and an empty batch queue means decoding is.
+
+Like the batcher, worker threads start lazily and are recreated in forked
+children.
+"""
+import os
+import queue
+import threading
+import time
+
+
+class _Job:
+    __slots__ = ('image_bytes', 'done', 'result', 'error')
+
+    def __init__(self, image_bytes):
+        self.image_bytes = image_bytes
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def finish(self, result, error):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+
+class DecodePipeline:
+    """
+    Run ``decode(image_bytes)`` on ``workers`` threads and feed the results to
+    ``batcher``; ``submit()`` returns the batcher's per-item result.
+    ``discard(item)``, if given, is called for a decoded item that could not
+    be handed to the batcher (e.g. to return a pooled buffer).
+    """
+
+    def __init__(self, decode, batcher, workers=2, max_pending=32, name='vit-decode', discard=None):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.decode = decode
+        self.batcher = batcher
+        self.discard = discard
+        self.workers = int(workers)
+        self.max_pending = max(int(max_pending), 1)
+        self.name = name
+        self._init_state()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._init_state)
+
+    def _init_state(self):
+        self._input = queue.Queue(maxsize=self.max_pending)
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._threads = []
+        self._decoded = 0
+        self._errors = 0
+        self._busy_total = 0.0
+        self._blocked_total = 0.0
+        self._stats_started = time.perf_counter()
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if not self._threads:
+                threads = [
+                    threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+                    for i in range(self.workers)
+                ]
+                for thread in threads:
+                    thread.start()
+                self._threads = threads
+
+    def submit(self, image_bytes, timeout=None):
+        """Queue an upload and block until its batched result is ready."""
+        self._ensure_workers()
+        job = _Job(image_bytes)
+        try:
+            self._input.put(job, timeout=timeout)
+        except queue.Full:
+            raise TimeoutError("Timed out waiting for space in the decode queue")
+        if not job.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for pipelined inference")
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def queue_depth(self):
+        return self._input.qsize()
+
+    def is_healthy(self, max_queue_depth):
+        """False if a decode worker died or the input queue is backed up past ``max_queue_depth``."""
+        if any(not thread.is_alive() for thread in self._threads):
+            return False
+        return self._input.qsize() <= max_queue_depth
+
+    def stats(self):
+        """Return per-stage occupancy and queue depths since startup."""
+        with self._stats_lock:
+            elapsed = time.perf_counter() - self._stats_started
+            capacity = elapsed * self.workers
+            attempts = self._decoded + self._errors
+            decode = {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queue_depth": self._input.qsize(),
+                "decoded": self._decoded,
+                "errors": self._errors,
+                "avg_decode_ms": self._busy_total / attempts * 1000.0 if attempts else 0.0,
+                # Fractions of the workers' wall time spent decoding / waiting on a full batch queue
+                "occupancy": self._busy_total / capacity if capacity > 0 else 0.0,
+                "blocked": self._blocked_total / capacity if capacity > 0 else 0.0,
+            }
+        return {"decode": decode, "model": self.batcher.stats()}
+
+    def _run(self):
+        while True:
+            job = self._input.get()
+            started = time.perf_counter()
+            try:
+                item = self.decode(job.image_bytes)
+            except Exception as e:
+                with self._stats_lock:
+                    self._errors += 1
+                    self._busy_total += time.perf_counter() - started
+                job.finish(None, e)
+                continue
+            decoded = time.perf_counter()
+
+            try:
+                # Blocks while the batch queue is full, which in turn lets the input queue fill up
+                self.batcher.submit_async(item, job.finish)
+            except Exception as e:
+                if self.discard is not None:
+                    self.discard(item)
+                job.finish(None, e)
+
+            with self._stats_lock:
+                self._decoded += 1
+                self._busy_total += decoded - started
+                self._blocked_total += time.perf_counter() - decoded
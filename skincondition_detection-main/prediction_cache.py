@@ -0,0 +1,227 @@
+"""Content-addressed cache for model predictions.
+
+Predictions are keyed by the SHA-256 of the uploaded image bytes. Results
+live in a bounded in-memory LRU and, optionally, in a directory of JSON
+files that survives restarts. Concurrent requests for the same image wait
+on the one computation already in flight instead of running the model again.
+Async servers use ``get_or_compute_async()`` so that the waiting happens on
+the event loop rather than in a worker thread.
+
+Because disk entries outlive the process, they are stored under a
+``namespace`` subdirectory, normally a ``model_fingerprint()`` of the
+serving server, model and settings. Changing any of those starts a fresh
+namespace instead of serving predictions from the old model.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+# Weight artifacts that may sit in a model directory; one the server doesn't use only costs a stat()
+WEIGHT_FILES = ('model.safetensors', 'pytorch_model.bin', 'tf_model.h5', 'model.onnx')
+
+
+def image_key(image_bytes):
+    """Return the cache key for an uploaded image."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def model_fingerprint(model_dir, *settings, extra_files=()):
+    """
+    Short digest of ``model_dir``'s config.json, the identity (name, size,
+    mtime) of its weight files and ``extra_files``, and any ``settings``
+    that change predictions (server, backend, ...). Weights are identified
+    by stat() rather than hashed, so this stays cheap at startup.
+    """
+    digest = hashlib.sha256()
+    with open(os.path.join(model_dir, 'config.json'), 'rb') as f:
+        digest.update(f.read())
+    paths = [os.path.join(model_dir, name) for name in WEIGHT_FILES] + list(extra_files)
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        digest.update(f"\0{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    for setting in settings:
+        digest.update(f"\0{setting!r}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class _InFlight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PredictionCache:
+    """
+    Bounded LRU of JSON-serializable prediction results.
+
+    ``disk_dir`` enables the on-disk tier; pass ``None`` to keep the cache
+    in memory only. Files go in ``disk_dir/namespace`` when a namespace is
+    given. ``max_entries`` of 0 disables caching but still coalesces
+    concurrent requests for the same key.
+    """
+
+    def __init__(self, max_entries=1024, disk_dir=None, namespace=None):
+        self.max_entries = int(max_entries)
+        self.namespace = namespace
+        if disk_dir and namespace:
+            disk_dir = os.path.join(disk_dir, namespace)
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        # key -> asyncio.Task, only touched from the event loop thread
+        self._async_in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, result):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _remember(self, key, result):
+        # Caller holds self._lock
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return a copy of the in-memory result for ``key`` without blocking, or None."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(self._entries[key])
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result for ``key``, computing it with ``compute()``
+        at most once across concurrent callers.
+
+        Returned dicts are shallow copies, so callers may add fields to them.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(self._entries[key])
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                flight = _InFlight()
+                self._in_flight[key] = flight
+                owner = True
+
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return dict(flight.result)
+
+        from_disk = False
+        try:
+            result = self._read_disk(key)
+            from_disk = result is not None
+            if not from_disk:
+                result = compute()
+                self._write_disk(key, result)
+            flight.result = result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None:
+                    self._remember(key, flight.result)
+                    if from_disk:
+                        self.disk_hits += 1
+                    else:
+                        self.misses += 1
+                del self._in_flight[key]
+            flight.done.set()
+        return dict(result)
+
+    async def get_or_compute_async(self, key, compute):
+        """
+        Coroutine counterpart of ``get_or_compute`` for an asyncio server.
+
+        ``compute`` is a coroutine function, typically one that runs
+        ``get_or_compute`` on a thread pool. Only the first caller for a key
+        starts it; concurrent callers await the same task on the event loop,
+        so duplicate uploads don't each tie up a pool worker. The task runs
+        to completion even if the caller that started it is cancelled.
+        """
+        result = self.get(key)
+        if result is not None:
+            return result
+        task = self._async_in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._async_in_flight[key] = task
+            task.add_done_callback(lambda done: self._async_done(key, done))
+        else:
+            with self._lock:
+                self.coalesced += 1
+        return dict(await asyncio.shield(task))
+
+    def _async_done(self, key, task):
+        if self._async_in_flight.get(key) is task:
+            del self._async_in_flight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every waiter went away
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_tier": bool(self.disk_dir),
+                "namespace": self.namespace,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight) + len(self._async_in_flight),
+            }
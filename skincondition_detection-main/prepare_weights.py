@@ -0,0 +1,41 @@
+"""Write the ViT weights as model.safetensors for memory-mapped loading.
+
+Usage:
+    python prepare_weights.py [--model-dir saved_vit_model]
+"""
+import argparse
+import os
+
+import torch
+from safetensors.torch import save_file
+from transformers import ViTForImageClassification
+
+from mmap_weights import WEIGHTS_FILENAME, load_vit_model
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model-dir', default=os.path.join(HERE, 'saved_vit_model'))
+    args = parser.parse_args()
+
+    model = ViTForImageClassification.from_pretrained(args.model_dir)
+    model.eval()
+    state_dict = {name: tensor.contiguous() for name, tensor in model.state_dict().items()}
+    output_path = os.path.join(args.model_dir, WEIGHTS_FILENAME)
+    save_file(state_dict, output_path, metadata={'format': 'pt'})
+    print(f"Wrote {len(state_dict)} tensors to {output_path}")
+
+    # Check that the mapped model reproduces the original outputs
+    mapped = load_vit_model(args.model_dir)
+    pixel_values = torch.randn(2, 3, model.config.image_size, model.config.image_size)
+    with torch.no_grad():
+        diff = (model(pixel_values=pixel_values).logits - mapped(pixel_values=pixel_values).logits).abs().max()
+    print(f"max |logit diff| between from_pretrained and mmap: {float(diff):.2e}")
+    if float(diff) > 1e-5:
+        raise SystemExit("Memory-mapped weights do not match the original model")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Vectorized ViT preprocessing shared by the inference servers.
+
+Replaces the per-request ``ViTFeatureExtractor`` call: each image is
+decoded and resized once, then a whole batch is converted from uint8 to
+normalized float32 in a single fused multiply-add, using the rescale
+factor, mean and std from ``preprocessor_config.json``.
+
+JPEGs are decoded in draft mode: libjpeg is asked for the smallest DCT
+scale (1/2, 1/4 or 1/8) that still covers the model resolution, so a
+48 MP phone photo is never fully decoded just to be shrunk to 224x224.
+Other formats keep the full decode.
+
+Run as a script to check parity with ``ViTFeatureExtractor``:
+    python preprocessing.py path/to/images [--model-dir saved_vit_model]
+"""
+import io
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PREPROCESSOR_CONFIG = 'preprocessor_config.json'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+
+def list_images(folder):
+    """Paths of the image files directly in ``folder``, sorted by name."""
+    return [
+        os.path.join(folder, name) for name in sorted(os.listdir(folder))
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+class ViTPreprocessor:
+    """Decode images and turn batches of them into ``pixel_values`` (N, 3, H, W) float32."""
+
+    def __init__(self, size=(224, 224), image_mean=(0.5, 0.5, 0.5), image_std=(0.5, 0.5, 0.5),
+                 rescale_factor=1 / 255, resample=Image.BICUBIC, jpeg_draft=True):
+        # size is (height, width)
+        self.size = tuple(size)
+        self.jpeg_draft = jpeg_draft
+        self.resample = resample
+        mean = np.asarray(image_mean, dtype=np.float32)
+        std = np.asarray(image_std, dtype=np.float32)
+        # (x * rescale - mean) / std == x * scale + offset
+        self.scale = (np.float32(rescale_factor) / std).reshape(1, 3, 1, 1)
+        self.offset = (-mean / std).reshape(1, 3, 1, 1)
+
+    @classmethod
+    def from_pretrained(cls, model_dir, jpeg_draft=None):
+        with open(os.path.join(model_dir, PREPROCESSOR_CONFIG), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        size = config.get('size', 224)
+        if isinstance(size, dict):
+            size = (size['height'], size['width'])
+        elif isinstance(size, int):
+            size = (size, size)
+        return cls(
+            size=size,
+            image_mean=config.get('image_mean', (0.5, 0.5, 0.5)),
+            image_std=config.get('image_std', (0.5, 0.5, 0.5)),
+            rescale_factor=config.get('rescale_factor', 1 / 255),
+            jpeg_draft=(os.getenv('VIT_JPEG_DRAFT', '1') != '0') if jpeg_draft is None else jpeg_draft,
+        )
+
+    def decode(self, image_bytes):
+        """Decode uploaded bytes into a (H, W, 3) uint8 array at model resolution."""
+        image = Image.open(io.BytesIO(image_bytes))
+        if self.jpeg_draft and image.format == 'JPEG':
+            height, width = self.size
+            # Picks the largest DCT downscale that keeps both sides >= the target
+            image.draft('RGB', (width, height))
+        return self.resize(image.convert('RGB'))
+
+    def resize(self, image):
+        """Resize a decoded RGB PIL image to model resolution as a uint8 array."""
+        height, width = self.size
+        # The servers resized with PIL's bicubic default before the extractor's
+        # same-size bilinear pass, which is a no-op; keep that single resize.
+        return np.asarray(image.resize((width, height), self.resample), dtype=np.uint8)
+
+    def to_pixel_values(self, images, out=None):
+        """
+        Normalize a batch of (H, W, 3) uint8 arrays, or one (N, H, W, 3) array,
+        into (N, 3, H, W) float32. ``out`` may be a preallocated array to fill.
+        """
+        batch = images if isinstance(images, np.ndarray) else np.stack(images)
+        nchw = batch.transpose(0, 3, 1, 2)
+        if out is None:
+            out = np.empty(nchw.shape, dtype=np.float32)
+        np.multiply(nchw, self.scale, out=out, casting='unsafe')
+        out += self.offset
+        return out
+
+    def __call__(self, images_bytes):
+        """Decode and normalize a list of uploaded images in one go."""
+        return self.to_pixel_values([self.decode(image_bytes) for image_bytes in images_bytes])
+
+
+def check_parity(model_dir, image_paths, atol=1e-5):
+    """Return the max abs difference between this pipeline and ViTFeatureExtractor."""
+    from transformers import ViTFeatureExtractor
+
+    feature_extractor = ViTFeatureExtractor.from_pretrained(model_dir)
+    # Draft decoding changes pixels on purpose; decode_benchmark.py covers it
+    preprocessor = ViTPreprocessor.from_pretrained(model_dir, jpeg_draft=False)
+    max_diff = 0.0
+    for path in image_paths:
+        with open(path, 'rb') as f:
+            image_bytes = f.read()
+        # The servers' original path: resize once with PIL, then the extractor
+        image = Image.open(io.BytesIO(image_bytes)).convert('RGB').resize((224, 224))
+        expected = feature_extractor(images=[np.array(image)], return_tensors='np')['pixel_values']
+        actual = preprocessor([image_bytes])
+        max_diff = max(max_diff, float(np.max(np.abs(expected - actual))))
+    return max_diff, max_diff <= atol
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check preprocessing parity with ViTFeatureExtractor")
+    parser.add_argument('images', help="Folder of images")
+    parser.add_argument('--model-dir', default=os.path.join(HERE, 'saved_vit_model'))
+    parser.add_argument('--atol', type=float, default=1e-5)
+    args = parser.parse_args()
+
+    paths = list_images(args.images)
+    max_diff, ok = check_parity(args.model_dir, paths, atol=args.atol)
+    print(f"{len(paths)} images, max |diff| = {max_diff:.2e}: {'OK' if ok else 'MISMATCH'}")
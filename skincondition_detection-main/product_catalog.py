@@ -0,0 +1,230 @@
+"""Copy-on-write product catalog for the inference servers.
+
+Readers take a ``CatalogSnapshot`` from ``ProductStore.snapshot()`` and
+use it without locking: a snapshot and the product dicts in it are never
+modified once published. Writers copy what they change, build a new
+snapshot under a write lock and publish it with a single reference
+assignment.
+
+Each snapshot carries an id index (O(1) lookup by id) and an inverted
+index from normalized target term (e.g. "excess oil") to product ids, so
+recommending for a condition is a union of a few small sets instead of a
+scan over the whole catalog.
+
+``SerializedCatalog`` caches the JSON body of a snapshot (plus gzip and,
+if the ``brotli`` package is installed, brotli variants) and its ETag, so
+the serialization work is done once per catalog version.
+"""
+import gzip
+import hashlib
+import heapq
+import json
+import threading
+from types import MappingProxyType
+
+try:
+    import brotli
+except ImportError:  # optional; responses fall back to gzip
+    brotli = None
+
+
+def normalize_target(term):
+    return term.strip().lower()
+
+
+def split_targets(targets):
+    """Return the normalized terms of a comma-separated ``targets`` string."""
+    return frozenset(
+        normalize_target(term) for term in (targets or '').split(',') if term.strip()
+    )
+
+
+class CatalogSnapshot:
+    """
+    Immutable view of the catalog at one version.
+
+    Product ids are compared as strings, like the admin endpoints do.
+    """
+
+    __slots__ = ('version', 'products', 'by_id', '_positions', '_postings')
+
+    def __init__(self, version, products, positions, postings):
+        self.version = version
+        self.products = products
+        self.by_id = MappingProxyType({product_id: products[pos] for product_id, pos in positions.items()})
+        self._positions = positions
+        self._postings = postings
+
+    def __len__(self):
+        return len(self.products)
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def get(self, product_id):
+        return self.by_id.get(str(product_id))
+
+    def lookup_targets(self, targets, limit=None):
+        """Return products matching any of ``targets``, in catalog order, at most ``limit``."""
+        matches = set()
+        for term in targets:
+            matches.update(self._postings.get(normalize_target(term), ()))
+        if limit is None:
+            ids = sorted(matches, key=self._positions.__getitem__)
+        else:
+            ids = heapq.nsmallest(limit, matches, key=self._positions.__getitem__)
+        return [self.by_id[product_id] for product_id in ids]
+
+
+class ProductStore:
+    """Holds the current ``CatalogSnapshot`` and publishes new ones on writes."""
+
+    def __init__(self, products=()):
+        self._write_lock = threading.Lock()
+        products = tuple(dict(product) for product in products)
+        positions = {}
+        postings = {}
+        for pos, product in enumerate(products):
+            product_id = str(product['id'])
+            positions[product_id] = pos
+            for term in split_targets(product.get('targets', '')):
+                postings.setdefault(term, set()).add(product_id)
+        postings = {term: frozenset(ids) for term, ids in postings.items()}
+        self._snapshot = CatalogSnapshot(0, products, positions, postings)
+
+    def snapshot(self):
+        """Return the current catalog; safe to use without locks."""
+        return self._snapshot
+
+    @staticmethod
+    def _reindex(postings, product_id, old_terms, new_terms):
+        """Return ``postings`` with ``product_id`` moved from ``old_terms`` to ``new_terms``."""
+        if old_terms == new_terms:
+            return postings
+        postings = dict(postings)
+        for term in old_terms - new_terms:
+            remaining = postings.get(term, frozenset()) - {product_id}
+            if remaining:
+                postings[term] = remaining
+            else:
+                postings.pop(term, None)
+        for term in new_terms - old_terms:
+            postings[term] = postings.get(term, frozenset()) | {product_id}
+        return postings
+
+    def add(self, product):
+        """Append a new product and return it; raises ValueError if the id is taken."""
+        product = dict(product)
+        product_id = str(product['id'])
+        with self._write_lock:
+            current = self._snapshot
+            if product_id in current.by_id:
+                raise ValueError(f"Product with ID {product_id} already exists")
+            positions = dict(current._positions)
+            positions[product_id] = len(current.products)
+            postings = self._reindex(
+                current._postings, product_id, frozenset(), split_targets(product.get('targets', ''))
+            )
+            self._snapshot = CatalogSnapshot(
+                current.version + 1, current.products + (product,), positions, postings
+            )
+        return product
+
+    def update(self, product_id, changes):
+        """
+        Apply ``changes`` to a copy of the product and publish it. Returns the
+        updated product, or None if there is no product with that id.
+        """
+        product_id = str(product_id)
+        with self._write_lock:
+            current = self._snapshot
+            pos = current._positions.get(product_id)
+            if pos is None:
+                return None
+            old = current.products[pos]
+            product = dict(old)
+            product.update(changes)
+            product['id'] = old['id']  # ids are immutable
+            products = current.products[:pos] + (product,) + current.products[pos + 1:]
+            postings = self._reindex(
+                current._postings, product_id,
+                split_targets(old.get('targets', '')), split_targets(product.get('targets', ''))
+            )
+            self._snapshot = CatalogSnapshot(
+                current.version + 1, products, current._positions, postings
+            )
+        return product
+
+
+class SerializedCatalog:
+    """Pre-serialized ``/products`` payload for one catalog version."""
+
+    __slots__ = ('version', 'etag', 'bodies')
+
+    def __init__(self, snapshot):
+        body = json.dumps(list(snapshot.products), separators=(',', ':')).encode('utf-8')
+        self.version = snapshot.version
+        # Derived from the serialized content, so ETags stay valid across
+        # restarts and agree between replicas holding the same catalog.
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.bodies = {
+            'identity': body,
+            'gzip': gzip.compress(body, compresslevel=6),
+        }
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body, quality=5)
+
+    def pick_encoding(self, accept_encoding):
+        """Choose the variant the client prefers (smallest on ties) from an Accept-Encoding header."""
+        qualities = parse_accept_encoding(accept_encoding)
+        best, best_q = 'identity', 0.0
+        # Smallest first, so an equal q-value keeps the smaller variant
+        for encoding in ('br', 'gzip'):
+            q = qualities.get(encoding, qualities.get('*', 0.0))
+            if encoding in self.bodies and q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def etag_for(self, encoding):
+        """Strong ETag of one variant; each encoding is a different representation."""
+        return self.etag if encoding == 'identity' else f"{self.etag}-{encoding}"
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value (1.0 when absent, 0.0 if malformed)."""
+    qualities = {}
+    for part in (header or '').split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        qualities[coding.lower()] = q
+    return qualities
+
+
+class SerializedCatalogCache:
+    """Keeps the ``SerializedCatalog`` of the latest snapshot, rebuilding it only when the version changes."""
+
+    def __init__(self, store):
+        self._store = store
+        self._lock = threading.Lock()
+        self._current = None
+
+    def get(self):
+        snapshot = self._store.snapshot()
+        current = self._current
+        if current is not None and current.version == snapshot.version:
+            return current
+        with self._lock:
+            current = self._current
+            if current is None or current.version != snapshot.version:
+                current = SerializedCatalog(snapshot)
+                self._current = current
+            return current
@@ -0,0 +1,101 @@
+"""Content-addressed store for admin-uploaded product images.
+
+Images arrive from the admin dashboard as base64 data URLs. Instead of
+keeping those multi-MB strings in the product records, each image is
+decoded once, stored on disk under the SHA-256 of its bytes in a few
+resized variants, and referenced by a short URL. Identical uploads map to
+the same files, and since a hash never changes content, the files can be
+served with a far-future, immutable cache lifetime.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+from PIL import Image
+
+# name -> longest side in pixels
+VARIANTS = {
+    'thumb': 150,
+    'medium': 300,
+    'large': 800,
+}
+DEFAULT_VARIANT = 'medium'
+
+_DATA_URL = re.compile(r'^data:(?P<mime>[\w.+-]+/[\w.+-]+)?(?:;[\w-]+=[^;,]*)*;base64,(?P<data>.*)$', re.DOTALL)
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+
+def is_data_url(value):
+    return isinstance(value, str) and value.startswith('data:')
+
+
+class ProductImageStore:
+    """Writes and locates resized image variants under ``root_dir/<sha256>/``."""
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+    def store_data_url(self, data_url):
+        """Decode a base64 data URL, store its variants and return the content hash."""
+        match = _DATA_URL.match(data_url)
+        if not match:
+            raise ValueError("Image must be a base64 data URL")
+        try:
+            image_bytes = base64.b64decode(match.group('data'), validate=False)
+        except (binascii.Error, ValueError):
+            raise ValueError("Image data is not valid base64")
+        return self.store_bytes(image_bytes)
+
+    def store_bytes(self, image_bytes):
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        if all(self.path_for(digest, variant) for variant in VARIANTS):
+            return digest  # already stored
+
+        try:
+            image = Image.open(io.BytesIO(image_bytes))
+            image.load()
+        except Exception as e:
+            raise ValueError(f"Could not decode image: {str(e)}")
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        directory = os.path.join(self.root_dir, digest)
+        os.makedirs(directory, exist_ok=True)
+        for variant, max_side in VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((max_side, max_side), Image.LANCZOS)
+            if has_alpha:
+                extension, save_kwargs = 'png', {'format': 'PNG', 'optimize': True}
+            else:
+                extension, save_kwargs = 'jpg', {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True}
+            path = os.path.join(directory, f"{variant}.{extension}")
+            # A unique temp file per writer: concurrent uploads of the same image each
+            # write their own copy, and whichever os.replace() lands last wins
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{variant}.", suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    resized.save(f, **save_kwargs)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        return digest
+
+    def path_for(self, digest, variant):
+        """Return the file for ``digest``/``variant``, or None if it doesn't exist or the names are invalid."""
+        if not _DIGEST.match(digest or '') or variant not in VARIANTS:
+            return None
+        for extension in ('jpg', 'png'):
+            path = os.path.join(self.root_dir, digest, f"{variant}.{extension}")
+            if os.path.exists(path):
+                return path
+        return None
@@ -0,0 +1,29 @@
+"""Dynamic INT8 quantization of the PyTorch ViT for CPU serving.
+
+Only the ``nn.Linear`` layers (attention projections, MLP and classifier,
+which hold almost all of ViT-Base's weights) are quantized. Activations
+are quantized on the fly, so no calibration data is needed.
+"""
+import torch
+
+
+def quantize_dynamic_int8(model):
+    """Return ``model`` with its Linear layers replaced by dynamic INT8 equivalents."""
+    model.eval()
+    # Quantize in place so the fp32 Linear weights can be freed instead of
+    # living alongside the INT8 copy.
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+def state_dict_bytes(model):
+    """Approximate in-memory size of the model's parameters and buffers."""
+    total = 0
+    for value in model.state_dict().values():
+        if isinstance(value, torch.Tensor):
+            total += value.numel() * value.element_size()
+        elif isinstance(value, tuple):
+            # Packed quantized Linear params are stored as (weight, bias)
+            total += sum(t.numel() * t.element_size() for t in value if isinstance(t, torch.Tensor))
+    return total
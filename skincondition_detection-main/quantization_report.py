@@ -0,0 +1,118 @@
+"""Compare INT8 dynamic-quantized ViT predictions against fp32.
+
+Runs both models over a folder of reference images and reports top-1
+agreement, confidence drift, latency and weight size. Images and models go
+through the same path local_ai_server.py serves: ``ViTPreprocessor``
+decoding and normalization, ``load_vit_model`` weights, and
+``quantize_dynamic_int8`` on top of them for INT8.
+
+Usage:
+    python quantization_report.py path/to/reference_images [--model-dir saved_vit_model] [--output report.json]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import torch
+
+from mmap_weights import load_vit_model
+from preprocessing import ViTPreprocessor, list_images
+from quantization import quantize_dynamic_int8, state_dict_bytes
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_pixel_values(folder, model_dir):
+    """Decode and normalize every image in ``folder`` the way the server does."""
+    preprocessor = ViTPreprocessor.from_pretrained(model_dir)
+    paths = list_images(folder)
+    images_bytes = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images_bytes.append(f.read())
+    return paths, torch.from_numpy(preprocessor(images_bytes)) if paths else None
+
+
+def run(model, pixel_values):
+    """Return per-image probabilities and per-image latency in ms (batch of one each)."""
+    probs, latencies = [], []
+    with torch.no_grad():
+        # One warmup pass so lazy init doesn't skew the first latency
+        model(pixel_values=pixel_values[:1])
+        for i in range(pixel_values.shape[0]):
+            start = time.perf_counter()
+            logits = model(pixel_values=pixel_values[i:i + 1]).logits
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            probs.append(torch.nn.functional.softmax(logits, dim=1)[0].numpy())
+    return np.stack(probs), np.array(latencies)
+
+
+def build_report(paths, fp32_probs, int8_probs, fp32_ms, int8_ms, fp32_bytes, int8_bytes):
+    fp32_top1 = fp32_probs.argmax(axis=1)
+    int8_top1 = int8_probs.argmax(axis=1)
+    fp32_conf = fp32_probs.max(axis=1)
+    # Drift of the probability the fp32 model assigned to its own top-1 label
+    int8_conf_on_fp32_label = int8_probs[np.arange(len(paths)), fp32_top1]
+    drift = np.abs(int8_conf_on_fp32_label - fp32_conf)
+
+    return {
+        "images": len(paths),
+        "top1_agreement": float(np.mean(fp32_top1 == int8_top1)),
+        "confidence_drift_mean": float(drift.mean()),
+        "confidence_drift_max": float(drift.max()),
+        "max_probability_delta": float(np.max(np.abs(fp32_probs - int8_probs))),
+        "fp32_latency_ms_p50": float(np.percentile(fp32_ms, 50)),
+        "int8_latency_ms_p50": float(np.percentile(int8_ms, 50)),
+        "speedup_p50": float(np.percentile(fp32_ms, 50) / np.percentile(int8_ms, 50)),
+        "fp32_weight_mb": fp32_bytes / 1e6,
+        "int8_weight_mb": int8_bytes / 1e6,
+        "disagreements": [
+            {
+                "image": os.path.basename(paths[i]),
+                "fp32": int(fp32_top1[i]),
+                "int8": int(int8_top1[i]),
+            }
+            for i in np.nonzero(fp32_top1 != int8_top1)[0]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('images', help="Folder of reference images")
+    parser.add_argument('--model-dir', default=os.path.join(HERE, 'saved_vit_model'))
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads")
+    parser.add_argument('--output', default=None, help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    paths, pixel_values = load_pixel_values(args.images, args.model_dir)
+    if not paths:
+        raise SystemExit(f"No images found in {args.images}")
+
+    # Each model is loaded on its own, as VIT_BACKEND=int8 and the default backend do
+    fp32_model = load_vit_model(args.model_dir)
+    fp32_model.eval()
+    int8_model = load_vit_model(args.model_dir)
+    int8_model.eval()
+    int8_model = quantize_dynamic_int8(int8_model)
+
+    fp32_probs, fp32_ms = run(fp32_model, pixel_values)
+    int8_probs, int8_ms = run(int8_model, pixel_values)
+
+    report = build_report(
+        paths, fp32_probs, int8_probs, fp32_ms, int8_ms,
+        state_dict_bytes(fp32_model), state_dict_bytes(int8_model),
+    )
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
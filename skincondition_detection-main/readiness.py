@@ -0,0 +1,69 @@
+"""Startup warmup and readiness tracking for the inference servers.
+
+The first forward passes at a given batch size pay for lazy kernel
+selection and allocator growth. ``Readiness.warmup()`` runs synthetic
+batches at every configured batch size before a server takes traffic, and
+``/readyz`` reports ready only after it has finished.
+"""
+import os
+import threading
+import time
+
+
+def warmup_batch_sizes(max_batch_size):
+    """Batch sizes to warm, from ``VIT_WARMUP_BATCH_SIZES`` (e.g. "1,4,8") or 1 and the max."""
+    configured = os.getenv('VIT_WARMUP_BATCH_SIZES')
+    if configured:
+        return sorted({int(size) for size in configured.split(',') if size.strip()})
+    return sorted({1, int(max_batch_size)})
+
+
+class Readiness:
+    """Tracks whether the model is loaded and warm."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.warmed = False
+        self.warmup_ms = {}
+        self.error = None
+        self._lock = threading.Lock()
+
+    def warmup(self, run_batch, batch_sizes, rounds=None):
+        """
+        Call ``run_batch(batch_size)`` ``rounds`` times for each batch size and
+        record the last round's latency. Safe to call more than once; only the
+        first call does any work.
+        """
+        rounds = int(os.getenv('VIT_WARMUP_ROUNDS', '2')) if rounds is None else rounds
+        with self._lock:
+            if self.warmed:
+                return self.warmup_ms
+            try:
+                for batch_size in batch_sizes:
+                    for _ in range(max(1, rounds)):
+                        start = time.perf_counter()
+                        run_batch(batch_size)
+                        self.warmup_ms[batch_size] = (time.perf_counter() - start) * 1000.0
+                self.warmed = True
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+                raise
+        return self.warmup_ms
+
+    def status(self, **checks):
+        """
+        Return ``(ready, payload)``. Every keyword check must be truthy, in
+        addition to the warmup having completed.
+        """
+        ready = self.warmed and all(checks.values())
+        payload = {
+            "ready": ready,
+            "warmed": self.warmed,
+            "warmup_ms": {str(size): ms for size, ms in self.warmup_ms.items()},
+            "uptime_s": time.time() - self.started_at,
+        }
+        payload.update(checks)
+        if self.error:
+            payload["warmup_error"] = self.error
+        return ready, payload
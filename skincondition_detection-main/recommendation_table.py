@@ -0,0 +1,50 @@
+"""Precomputed condition -> recommendations tables for the TF servers.
+
+The recommendation CSVs are read once with the stdlib ``csv`` module and
+turned into ready-to-serialize record lists for every condition the model
+can predict. Request handling is then a dict lookup, and pandas is not
+needed in the serving process at all.
+"""
+import csv
+
+
+def load_csv_records(path):
+    """Read a CSV into a list of dicts; empty cells become None (pandas would give NaN)."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return [
+            {key: (value if value != '' else None) for key, value in row.items()}
+            for row in csv.DictReader(f)
+        ]
+
+
+def build_exact_table(records, key_column, conditions, columns, top_k=3):
+    """
+    Map each condition (lower-cased) to the first ``top_k`` records whose
+    ``key_column`` equals it case-insensitively, keeping only ``columns``.
+    """
+    table = {condition.lower(): [] for condition in conditions}
+    for record in records:
+        matches = table.get((record.get(key_column) or '').lower())
+        if matches is not None and len(matches) < top_k:
+            matches.append({column: record.get(column) for column in columns})
+    return table
+
+
+def build_contains_table(records, text_column, conditions, required_column=None, top_k=3):
+    """
+    Map each condition to the first ``top_k`` records whose ``text_column``
+    contains it case-insensitively and whose ``required_column`` is set.
+    """
+    table = {}
+    for condition in conditions:
+        needle = condition.lower()
+        matches = []
+        for record in records:
+            if required_column and record.get(required_column) is None:
+                continue
+            if needle in (record.get(text_column) or '').lower():
+                matches.append(dict(record))
+                if len(matches) == top_k:
+                    break
+        table[condition] = matches
+    return table
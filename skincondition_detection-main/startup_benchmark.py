@@ -0,0 +1,83 @@
+"""Compare server cold-start cost of from_pretrained and memory-mapped weights.
+
+Each loader runs in a fresh Python process so nothing is shared with the
+previous run except the OS page cache. Reports time to a loaded model, time
+to the first prediction, and RSS at both points.
+
+Usage:
+    python startup_benchmark.py [--model-dir saved_vit_model] [--runs 3] [--output report.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r'''
+import json, os, sys, time
+start = time.perf_counter()
+import torch
+sys.path.insert(0, {here!r})
+os.environ['VIT_MMAP_WEIGHTS'] = {mmap!r}
+from mmap_weights import load_vit_model
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return None
+
+imported = time.perf_counter()
+model = load_vit_model({model_dir!r})
+loaded = time.perf_counter()
+rss_loaded = rss_mb()
+with torch.no_grad():
+    model(pixel_values=torch.zeros(1, 3, 224, 224))
+first = time.perf_counter()
+print(json.dumps({{
+    "import_s": imported - start,
+    "load_s": loaded - imported,
+    "first_predict_s": first - loaded,
+    "total_s": first - start,
+    "rss_loaded_mb": rss_loaded,
+    "rss_after_predict_mb": rss_mb(),
+}}))
+'''
+
+
+def run_child(model_dir, mmap):
+    code = CHILD.format(here=HERE, mmap='1' if mmap else '0', model_dir=model_dir)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    keys = runs[0].keys()
+    return {key: min(run[key] for run in runs if run[key] is not None) for key in keys}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model-dir', default=os.path.join(HERE, 'saved_vit_model'))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--output', default=None, help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    report = {}
+    for label, mmap in (('from_pretrained', False), ('mmap_safetensors', True)):
+        runs = [run_child(args.model_dir, mmap) for _ in range(args.runs)]
+        report[label] = {"best": summarize(runs), "runs": runs}
+        best = report[label]["best"]
+        print(f"{label}: load {best['load_s']:.2f} s, first predict {best['first_predict_s']:.2f} s, "
+              f"RSS {best['rss_loaded_mb']:.0f} MB loaded / {best['rss_after_predict_mb']:.0f} MB after predict")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
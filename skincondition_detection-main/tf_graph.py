@@ -0,0 +1,87 @@
+"""Compiled TF graph execution for the TFViT servers.
+
+``VIT_TF_MODE`` selects how the forward pass runs:
+    eager  the model is called eagerly on every request (default)
+    graph  forward pass + softmax traced once into a ``tf.function``
+    xla    the same graph, JIT-compiled with XLA
+
+The traced function has a fixed ``(None, C, H, W)`` float32 signature, so
+any batch size reuses the same trace. ``load_forward()`` warms the graph
+and checks it against eager mode, falling back to eager on a mismatch.
+"""
+import logging
+import os
+
+import numpy as np
+import tensorflow as tf
+
+logger = logging.getLogger(__name__)
+
+TF_MODES = ('eager', 'graph', 'xla')
+
+
+def tf_mode():
+    mode = os.getenv('VIT_TF_MODE', 'eager').strip().lower()
+    if mode not in TF_MODES:
+        logger.warning(f"Unknown VIT_TF_MODE {mode!r}; using eager")
+        return 'eager'
+    return mode
+
+
+def eager_forward(model):
+    """Eager forward pass + softmax with the same call signature as the compiled one."""
+    def forward(pixel_values):
+        logits = model(pixel_values=pixel_values, training=False).logits
+        return tf.nn.softmax(logits, axis=1)
+    return forward
+
+
+def compile_forward(model, jit_compile=False):
+    """Trace forward pass + softmax into a ``tf.function`` with a dynamic batch dimension."""
+    config = model.config
+    signature = [tf.TensorSpec([None, config.num_channels, config.image_size, config.image_size], tf.float32)]
+
+    @tf.function(input_signature=signature, jit_compile=jit_compile)
+    def forward(pixel_values):
+        logits = model(pixel_values=pixel_values, training=False).logits
+        return tf.nn.softmax(logits, axis=1)
+
+    return forward
+
+
+def check_parity(model, forward, batch_sizes=(1, 4), atol=1e-4):
+    """Return the max abs probability difference between ``forward`` and eager mode."""
+    config = model.config
+    eager = eager_forward(model)
+    rng = np.random.default_rng(0)
+    max_diff = 0.0
+    for batch_size in batch_sizes:
+        pixel_values = rng.standard_normal(
+            (batch_size, config.num_channels, config.image_size, config.image_size), dtype=np.float32
+        )
+        expected = eager(pixel_values).numpy()
+        actual = forward(tf.constant(pixel_values)).numpy()
+        max_diff = max(max_diff, float(np.max(np.abs(expected - actual))))
+    return max_diff, max_diff <= atol
+
+
+def load_forward(model, mode=None):
+    """
+    Return a callable mapping a pixel_values batch to softmax probabilities
+    for ``mode`` (default ``VIT_TF_MODE``). Compiled modes are traced, warmed
+    and parity-checked here; on failure the eager forward pass is returned.
+    """
+    mode = mode or tf_mode()
+    if mode == 'eager':
+        return eager_forward(model)
+    try:
+        forward = compile_forward(model, jit_compile=(mode == 'xla'))
+        max_diff, ok = check_parity(model, forward)
+    except Exception as e:
+        logger.warning(f"Could not compile the {mode} forward pass ({e}); using eager")
+        return eager_forward(model)
+    if not ok:
+        logger.warning(f"{mode} forward pass differs from eager by {max_diff:.2e}; using eager")
+        return eager_forward(model)
+    logger.info(f"Serving TF ViT in {mode} mode (max diff vs eager {max_diff:.2e})")
+    return forward
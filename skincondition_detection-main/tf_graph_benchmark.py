@@ -0,0 +1,72 @@
+"""Compare TF ViT latency in eager, graph and XLA modes.
+
+Usage:
+    python tf_graph_benchmark.py [--model-dir saved_vit_model] [--batch-sizes 1,4,16] [--iterations 20]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from transformers import TFViTForImageClassification
+
+from tf_graph import TF_MODES, check_parity, compile_forward, eager_forward
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def time_forward(forward, pixel_values, iterations):
+    forward(pixel_values)  # warm (and trace) outside the timed loop
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        forward(pixel_values).numpy()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model-dir', default=os.path.join(HERE, 'saved_vit_model'))
+    parser.add_argument('--batch-sizes', default='1,4,16')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--output', default=None, help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    model = TFViTForImageClassification.from_pretrained(args.model_dir)
+    config = model.config
+    forwards = {
+        'eager': eager_forward(model),
+        'graph': compile_forward(model),
+        'xla': compile_forward(model, jit_compile=True),
+    }
+
+    results = []
+    for mode in TF_MODES:
+        max_diff = 0.0 if mode == 'eager' else check_parity(model, forwards[mode])[0]
+        for batch_size in (int(size) for size in args.batch_sizes.split(',')):
+            pixel_values = tf.constant(np.random.default_rng(0).standard_normal(
+                (batch_size, config.num_channels, config.image_size, config.image_size), dtype=np.float32
+            ))
+            latencies = time_forward(forwards[mode], pixel_values, args.iterations)
+            row = {
+                "mode": mode,
+                "batch_size": batch_size,
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p90_ms": float(np.percentile(latencies, 90)),
+                "images_per_s": batch_size * 1000.0 / float(np.percentile(latencies, 50)),
+                "max_diff_vs_eager": max_diff,
+            }
+            results.append(row)
+            print(f"{mode:5s} batch {batch_size:3d}: p50 {row['p50_ms']:8.1f} ms, "
+                  f"{row['images_per_s']:7.1f} img/s, max diff {max_diff:.1e}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,15 +7,23 @@ Original file is located at
     https://colab.research.google.com/drive/1Y7ryzPMl71ws_vXoh2BIM4TKwQDsHSZ-
 """
 
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 import uvicorn
 import numpy as np
-from io import BytesIO
-from PIL import Image
+import os
+import time
 import tensorflow as tf
-import pandas as pd
-from transformers import TFViTForImageClassification, ViTFeatureExtractor
+from transformers import TFViTForImageClassification
+from prediction_cache import PredictionCache, image_key, model_fingerprint
+from onnx_backend import backend_name, load_onnx_backend
+from preprocessing import ViTPreprocessor
+from readiness import Readiness, warmup_batch_sizes
+from recommendation_table import build_exact_table, load_csv_records
+from bounded_executor import BoundedExecutor, Overloaded
+from tf_graph import load_forward
+from metrics import BATCH_SIZE_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
 
 app = FastAPI()
 
@@ -36,185 +44,223 @@ app.add_middleware(
 MODEL_PATH = "saved_vit_model"  # path to your ViT model directory
 CSV_PATH = "skincare_recommendations_full.csv"
 
-vit_model = TFViTForImageClassification.from_pretrained(MODEL_PATH)
-feature_extractor = ViTFeatureExtractor.from_pretrained(MODEL_PATH)
+preprocessor = ViTPreprocessor.from_pretrained(MODEL_PATH)
 
-# === Load CSV recommendation data ===
-df = pd.read_csv(CSV_PATH)
+# VIT_BACKEND=onnx serves through ONNX Runtime; falls back to eager TF if the artifact is missing
+onnx_model = load_onnx_backend(MODEL_PATH) if backend_name() == "onnx" else None
+vit_model = None
+tf_forward = None
+if onnx_model is None:
+    vit_model = TFViTForImageClassification.from_pretrained(MODEL_PATH)
+    # VIT_TF_MODE=graph|xla traces forward + softmax into a tf.function (warmed and parity-checked here)
+    tf_forward = load_forward(vit_model)
 
 # === Class categories ===
 CATEGORIES = ['acne', 'Milia', 'Dry', 'Oily', 'Wrinkles', 'Non Wrinkles',
               'hyperpigmentation', 'Keratosis', 'Normal']
 CRITICAL_CONDITIONS = ['acne', 'Milia', 'Keratosis', 'hyperpigmentation']
 
-# === Utility Functions ===
-def read_imagefile(file) -> Image.Image:
-    image = Image.open(BytesIO(file)).convert("RGB")
-    return image
-
-def recommend_products(condition, top_k=3):
-    condition = condition.lower()
-    matches = df[df['condition'].str.lower() == condition]
-    if matches.empty:
-        return []
-    return matches[['product', 'brand', 'skin_type', 'category']].head(top_k).to_dict(orient='records')
-
-# === Test endpoint ===
-@app.get("/ping")
-async def ping():
-    return {"message": "API is live!"}
-
-# === Prediction endpoint ===
-@app.post("/predict")
-async def predict(file: UploadFile = File(...)):
-    image = read_imagefile(await file.read()).resize((224, 224))
-    inputs = feature_extractor(images=[np.array(image)], return_tensors='tf')
-
-    logits = vit_model(**inputs).logits
-    probs = tf.nn.softmax(logits, axis=1).numpy()[0]
-
-    top_idx = np.argmax(probs)
-    confidence = float(probs[top_idx])
-    condition = CATEGORIES[top_idx]
-
-    result = {
-        "condition": condition,
-        "confidence": confidence
-    }
-
-    # Confidence-based logic
-    if confidence >= 0.99:
-        result["recommendation_type"] = "products"
-        result["recommendations"] = recommend_products(condition)
-    elif confidence < 0.90 and condition.lower() in [c.lower() for c in CRITICAL_CONDITIONS]:
-        result["recommendation_type"] = "refer"
-        result["message"] = "Model is not confident and condition is critical. Please consult a dermatologist."
-    else:
-        result["recommendation_type"] = "cautious_products"
-        result["message"] = "Model is moderately confident. Use recommended products with care."
-        result["recommendations"] = recommend_products(condition)
-
-    return result
-
-# === Run server ===
-if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
-
-pip install fastapi
-
-pip install uvicorn
-
-from fastapi import FastAPI, File, UploadFile
-from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-import numpy as np
-from io import BytesIO
-from PIL import Image
-import tensorflow as tf
-import pandas as pd
-from transformers import TFViTForImageClassification, ViTFeatureExtractor
-
-app = FastAPI()
-
-# CORS configuration
-origins = [
-    "http://localhost",
-    "http://localhost:3000",
-]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# === Precompute recommendations for every category from the CSV ===
+RECOMMENDATION_COLUMNS = ['product', 'brand', 'skin_type', 'category']
+RECOMMENDATIONS = build_exact_table(
+    load_csv_records(CSV_PATH), 'condition', CATEGORIES, RECOMMENDATION_COLUMNS, top_k=3
 )
 
-# === Load ViT model and feature extractor ===
-MODEL_PATH = "/content/drive/MyDrive/saved_vit_model"  # path to your ViT model directory
-CSV_PATH = "/content/drive/MyDrive/skincare_recommendations_full.csv"
-
-vit_model = TFViTForImageClassification.from_pretrained(MODEL_PATH)
-feature_extractor = ViTFeatureExtractor.from_pretrained(MODEL_PATH)
-
-# === Load CSV recommendation data ===
-df = pd.read_csv(CSV_PATH)
-
-# === Class categories ===
-CATEGORIES = ['acne', 'Milia', 'Dry', 'Oily', 'Wrinkles', 'Non Wrinkles',
-              'hyperpigmentation', 'Keratosis', 'Normal']
-CRITICAL_CONDITIONS = ['acne', 'Milia', 'Keratosis', 'hyperpigmentation']
-
-pip install python-multipart
+# === Prediction cache (keyed by SHA-256 of the uploaded bytes) ===
+# Disk entries are namespaced by this server, the model files and the backend
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("VIT_CACHE_SIZE", "1024")),
+    disk_dir=os.getenv("VIT_CACHE_DIR") or None,
+    namespace=model_fingerprint(
+        MODEL_PATH, "vit_api", "onnx" if onnx_model is not None else f"tf-{os.getenv('VIT_TF_MODE', 'eager')}",
+        extra_files=[onnx_model.path] if onnx_model is not None else (),
+    ),
+)
 
-import nest_asyncio
-import uvicorn
+# === Bounded inference pool: decode + inference run off the event loop ===
+# Beyond VIT_INFERENCE_WORKERS running and VIT_MAX_QUEUED waiting requests,
+# /predict answers 503 with Retry-After instead of queueing more work.
+queue_timeout = float(os.getenv("VIT_QUEUE_TIMEOUT_S", "0")) or None
+inference_pool = BoundedExecutor(
+    max_workers=int(os.getenv("VIT_INFERENCE_WORKERS", "1")),
+    max_queue=int(os.getenv("VIT_MAX_QUEUED", "8")),
+    queue_timeout=queue_timeout,
+    retry_after=int(os.getenv("VIT_RETRY_AFTER_S", "1")),
+)
 
-nest_asyncio.apply()
+def overloaded_response(error):
+    return JSONResponse(
+        content={"error": f"Server is busy, please retry: {error}"},
+        status_code=503,
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+# === Prometheus metrics (see /metrics) ===
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram("vit_stage_seconds", "Time spent in each /predict stage", ("stage",))
+REQUEST_SECONDS = metrics.histogram("vit_request_seconds", "Request latency by endpoint", ("endpoint",))
+REQUESTS = metrics.counter("vit_requests_total", "Requests by endpoint and status code", ("endpoint", "status"))
+ERRORS = metrics.counter("vit_errors_total", "Failed predictions by endpoint and exception type", ("endpoint", "error"))
+BATCH_SIZE = metrics.histogram("vit_batch_size", "Images per model forward pass", buckets=BATCH_SIZE_BUCKETS)
+metrics.gauge("vit_inference_in_flight", "Requests running or queued on the inference pool",
+              lambda: inference_pool.in_flight)
+metrics.gauge("vit_inference_queued", "Requests waiting for an inference worker", inference_pool.queued)
+
+class RequestMetricsMiddleware:
+    """
+    Plain ASGI middleware counting requests and timing them from arrival,
+    so multipart parsing (done by FastAPI before the handler runs) is
+    included. Endpoints are labelled by handler name to keep labels bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        scope.setdefault("state", {})["request_started"] = started
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            endpoint = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+            REQUESTS.inc(endpoint, str(status))
+
+app.add_middleware(RequestMetricsMiddleware)
+
+# === Readiness (see /healthz and /readyz) ===
+readiness = Readiness()
 
 # === Utility Functions ===
-def read_imagefile(file) -> Image.Image:
-    image = Image.open(BytesIO(file)).convert("RGB")
-    return image
-
 def recommend_products(condition, top_k=3):
-    condition = condition.lower()
-    matches = df[df['condition'].str.lower() == condition]
-    if matches.empty:
-        return []
-    return matches[['product', 'brand', 'skin_type', 'category']].head(top_k).to_dict(orient='records')
+    return RECOMMENDATIONS.get(condition.lower(), [])[:top_k]
+
+def run_model(pixel_values):
+    """Return softmax probabilities for a (N, 3, H, W) float32 batch."""
+    if onnx_model is not None:
+        return tf.nn.softmax(onnx_model(pixel_values), axis=1).numpy()
+    return tf_forward(pixel_values).numpy()
+
+def classify_image_bytes(image_bytes):
+    with STAGE_SECONDS.time("decode"):
+        image = preprocessor.decode(image_bytes)
+    with STAGE_SECONDS.time("preprocess"):
+        pixel_values = preprocessor.to_pixel_values([image])
+    BATCH_SIZE.observe(len(pixel_values))
+    with STAGE_SECONDS.time("forward"):
+        probs = run_model(pixel_values)[0]
+
+    with STAGE_SECONDS.time("postprocess"):
+        top_idx = np.argmax(probs)
+        return {
+            "condition": CATEGORIES[top_idx],
+            "confidence": float(probs[top_idx])
+        }
+
+def run_synthetic_batch(batch_size):
+    height, width = preprocessor.size
+    run_model(preprocessor.to_pixel_values(np.zeros((batch_size, height, width, 3), dtype=np.uint8)))
+
+# === Warmup: uvicorn only starts accepting requests after startup handlers finish ===
+@app.on_event("startup")
+def warmup():
+    timings = readiness.warmup(run_synthetic_batch, warmup_batch_sizes(1))
+    print("Warmup finished: " + ", ".join(f"batch {size}: {ms:.0f} ms" for size, ms in timings.items()))
 
 # === Test endpoint ===
 @app.get("/ping")
 async def ping():
     return {"message": "API is live!"}
 
-# === Prediction endpoint ===
-@app.post("/predict")
-async def predict(file: UploadFile = File(...)):
-    image = read_imagefile(await file.read()).resize((224, 224))
-    inputs = feature_extractor(images=[np.array(image)], return_tensors='tf')
-
-    logits = vit_model(**inputs).logits
-    probs = tf.nn.softmax(logits, axis=1).numpy()[0]
+# === Liveness / readiness ===
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
 
-    top_idx = np.argmax(probs)
-    confidence = float(probs[top_idx])
-    condition = CATEGORIES[top_idx]
+@app.get("/readyz")
+async def readyz():
+    ready, payload = readiness.status(
+        model_loaded=vit_model is not None or onnx_model is not None,
+        queue_healthy=not inference_pool.is_full(),
+    )
+    payload["inference_pool"] = inference_pool.stats()
+    return JSONResponse(content=payload, status_code=200 if ready else 503)
 
-    result = {
-        "condition": condition,
-        "confidence": confidence
-    }
-
-    # Confidence-based logic
-    if confidence >= 0.99:
-        result["recommendation_type"] = "products"
-        result["recommendations"] = recommend_products(condition)
-    elif confidence < 0.90 and condition.lower() in [c.lower() for c in CRITICAL_CONDITIONS]:
-        result["recommendation_type"] = "refer"
-        result["message"] = "Model is not confident and condition is critical. Please consult a dermatologist."
-    else:
-        result["recommendation_type"] = "cautious_products"
-        result["message"] = "Model is moderately confident. Use recommended products with care."
-        result["recommendations"] = recommend_products(condition)
-
-    return result
-
-# === Run server ===
-#if __name__ == "__main__":
-    #uvicorn.run(app, host="0.0.0.0", port=8000)
+@app.get("/cache_stats")
+async def cache_stats():
+    return prediction_cache.stats()
 
-!pip install fastapi uvicorn nest-asyncio pyngrok python-multipart transformers tensorflow pillow pandas
+@app.get("/pool_stats")
+async def pool_stats():
+    return inference_pool.stats()
 
-!ngrok config add-authtoken 2vj15mq7lP8peG1Vbs4ev61ARMl_4vnMy8pxqyzu2F76E68WR
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(content=metrics.render(), headers={"Content-Type": METRICS_CONTENT_TYPE})
 
-from pyngrok import ngrok
-import nest_asyncio
-import uvicorn
-
-nest_asyncio.apply()
+# === Prediction endpoint ===
+@app.post("/predict")
+async def predict(request: Request, file: UploadFile = File(...)):
+    # Shed load before doing any work if the pool is saturated
+    try:
+        inference_pool.check_capacity()
+    except Overloaded as e:
+        ERRORS.inc("predict", "Overloaded")
+        return overloaded_response(e)
+
+    image_bytes = await file.read()
+    # From arrival (see RequestMetricsMiddleware) through multipart parsing and the read
+    STAGE_SECONDS.observe(time.perf_counter() - request.state.request_started, "parse")
+    key = image_key(image_bytes)
+
+    # Cache hits are answered on the loop. Identical uploads already in flight wait on
+    # the loop too; only the first one runs on the pool (disk tier, decode, forward)
+    async def compute():
+        return await inference_pool.run(
+            prediction_cache.get_or_compute, key, lambda: classify_image_bytes(image_bytes)
+        )
+
+    try:
+        # 'inference' is pool queue wait plus decode, preprocess and forward
+        with STAGE_SECONDS.time("inference"):
+            result = await prediction_cache.get_or_compute_async(key, compute)
+    except Overloaded as e:
+        ERRORS.inc("predict", "Overloaded")
+        return overloaded_response(e)
+    except Exception as e:
+        ERRORS.inc("predict", type(e).__name__)
+        raise
+    condition = result["condition"]
+    confidence = result["confidence"]
 
-public_url = ngrok.connect(8000)
-print(f"🚀 Your FastAPI app is live at: {public_url}/docs")
+    # Confidence-based logic
+    with STAGE_SECONDS.time("recommend"):
+        if confidence >= 0.99:
+            result["recommendation_type"] = "products"
+            result["recommendations"] = recommend_products(condition)
+        elif confidence < 0.90 and condition.lower() in [c.lower() for c in CRITICAL_CONDITIONS]:
+            result["recommendation_type"] = "refer"
+            result["message"] = "Model is not confident and condition is critical. Please consult a dermatologist."
+        else:
+            result["recommendation_type"] = "cautious_products"
+            result["message"] = "Model is moderately confident. Use recommended products with care."
+            result["recommendations"] = recommend_products(condition)
+
+    # JSONResponse renders the body in its constructor
+    with STAGE_SECONDS.time("serialize"):
+        return JSONResponse(content=result)
 
-uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+# === Run server ===
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=8000)
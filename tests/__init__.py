@@ -0,0 +1,12 @@
+"""
+Unit tests for the pure-Python serving helpers (no torch or TensorFlow needed).
+
+    python -m unittest discover -s tests -t .
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'skincondition_detection-main')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
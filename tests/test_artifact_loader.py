@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+import unittest
+
+from artifact_loader import MANIFEST_FILENAME, ArtifactCache, LocalDirStorage, file_md5
+
+
+class CountingStorage(LocalDirStorage):
+    def __init__(self, root):
+        super().__init__(root)
+        self.downloads = []
+
+    def download(self, name, destination):
+        self.downloads.append(name)
+        super().download(name, destination)
+
+
+class ArtifactCacheTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.remote = os.path.join(tmp.name, 'bucket')
+        self.cache_dir = os.path.join(tmp.name, 'vit_model')
+        os.makedirs(self.remote)
+        self.put('models/config.json', b'{"num_labels": 9}')
+        self.put('models/tf_model.h5', b'weights v1')
+        self.storage = CountingStorage(self.remote)
+        self.artifacts = {'config.json': 'models/config.json', 'tf_model.h5': 'models/tf_model.h5'}
+
+    def put(self, name, data):
+        path = os.path.join(self.remote, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def fetch(self, artifacts=None, optional=()):
+        return ArtifactCache(self.storage, self.cache_dir).fetch(artifacts or self.artifacts, optional)
+
+    def test_cold_fetch_downloads_and_writes_the_manifest(self):
+        paths, timings = self.fetch()
+        self.assertEqual(sorted(self.storage.downloads), sorted(self.artifacts.values()))
+        self.assertFalse(any(timing['cached'] for timing in timings.values()))
+        with open(paths['tf_model.h5'], 'rb') as f:
+            self.assertEqual(f.read(), b'weights v1')
+
+        with open(os.path.join(self.cache_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest['tf_model.h5'], {
+            'source': 'models/tf_model.h5', 'checksum': file_md5(paths['tf_model.h5']), 'size': 10,
+        })
+
+    def test_warm_cache_skips_the_download(self):
+        self.fetch()
+        self.storage.downloads.clear()
+        paths, timings = self.fetch()  # a new ArtifactCache reads the manifest from disk
+        self.assertEqual(self.storage.downloads, [])
+        self.assertTrue(all(timing['cached'] for timing in timings.values()))
+        self.assertEqual(paths['config.json'], os.path.join(self.cache_dir, 'config.json'))
+
+    def test_changed_checksum_refetches_only_that_file(self):
+        self.fetch()
+        self.storage.downloads.clear()
+        self.put('models/tf_model.h5', b'weights v2')
+        paths, timings = self.fetch()
+        self.assertEqual(self.storage.downloads, ['models/tf_model.h5'])
+        self.assertTrue(timings['config.json']['cached'])
+        with open(paths['tf_model.h5'], 'rb') as f:
+            self.assertEqual(f.read(), b'weights v2')
+
+    def test_missing_or_truncated_local_file_is_refetched(self):
+        paths, _ = self.fetch()
+        os.remove(paths['config.json'])
+        with open(paths['tf_model.h5'], 'wb') as f:
+            f.write(b'trunc')
+        self.storage.downloads.clear()
+        self.fetch()
+        self.assertEqual(sorted(self.storage.downloads), sorted(self.artifacts.values()))
+
+    def test_changed_source_is_refetched(self):
+        self.put('models/v2/tf_model.h5', b'weights v1')  # same bytes, different blob
+        self.fetch()
+        self.storage.downloads.clear()
+        self.fetch(dict(self.artifacts, **{'tf_model.h5': 'models/v2/tf_model.h5'}))
+        self.assertEqual(self.storage.downloads, ['models/v2/tf_model.h5'])
+
+    def test_optional_artifacts_may_be_missing(self):
+        artifacts = dict(self.artifacts, **{'model.onnx': 'models/model.onnx'})
+        paths, timings = self.fetch(artifacts, optional=('model.onnx',))
+        self.assertIsNone(paths['model.onnx'])
+        self.assertEqual(timings['model.onnx'], {'missing': True})
+        with self.assertRaises(FileNotFoundError):
+            self.fetch(artifacts)
+
+    def test_corrupt_manifest_is_treated_as_empty(self):
+        os.makedirs(self.cache_dir)
+        with open(os.path.join(self.cache_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+            f.write('{not json')
+        _, timings = self.fetch()
+        self.assertFalse(any(timing['cached'] for timing in timings.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import threading
+import unittest
+
+from batching import MicroBatcher
+
+
+def submit_concurrently(batcher, items):
+    results = [None] * len(items)
+    errors = [None] * len(items)
+
+    def call(index, item):
+        try:
+            results[index] = batcher.submit(item, timeout=5)
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=call, args=pair) for pair in enumerate(items)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+class MicroBatcherTests(unittest.TestCase):
+    def test_each_caller_gets_its_own_result(self):
+        batches = []
+
+        def run_batch(items):
+            batches.append(list(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(run_batch, max_batch_size=4, max_wait_ms=50)
+        results, errors = submit_concurrently(batcher, list(range(10)))
+
+        self.assertEqual(errors, [None] * 10)
+        self.assertEqual(results, [item * 2 for item in range(10)])
+        self.assertTrue(all(len(batch) <= 4 for batch in batches))
+        self.assertEqual(sorted(item for batch in batches for item in batch), list(range(10)))
+        stats = batcher.stats()
+        self.assertEqual((stats['items'], stats['batches'], stats['errors']), (10, len(batches), 0))
+
+    def test_run_batch_error_reaches_every_caller(self):
+        def run_batch(items):
+            raise RuntimeError("forward pass failed")
+
+        batcher = MicroBatcher(run_batch, max_batch_size=8, max_wait_ms=50)
+        results, errors = submit_concurrently(batcher, list(range(4)))
+
+        self.assertEqual(results, [None] * 4)
+        for error in errors:
+            self.assertIsInstance(error, RuntimeError)
+            self.assertEqual(str(error), "forward pass failed")
+        # The worker survives a failed batch
+        batcher.run_batch = lambda items: list(items)
+        self.assertEqual(batcher.submit('ok', timeout=5), 'ok')
+
+    def test_wrong_number_of_results_is_an_error(self):
+        batcher = MicroBatcher(lambda items: [], max_batch_size=2, max_wait_ms=0)
+        with self.assertRaises(RuntimeError):
+            batcher.submit(1, timeout=5)
+
+    def test_submit_async_calls_back_with_result_or_error(self):
+        done = threading.Event()
+        received = []
+
+        def callback(result, error):
+            received.append((result, error))
+            if len(received) == 2:
+                done.set()
+
+        def run_batch(items):
+            if 'bad' in items:
+                raise ValueError("bad item")
+            return [item.upper() for item in items]
+
+        batcher = MicroBatcher(run_batch, max_batch_size=1, max_wait_ms=0)
+        batcher.submit_async('good', callback)
+        batcher.submit_async('bad', callback)
+        self.assertTrue(done.wait(5))
+
+        self.assertEqual(received[0], ('GOOD', None))
+        self.assertIsNone(received[1][0])
+        self.assertIsInstance(received[1][1], ValueError)
+
+    def test_invalid_batch_size(self):
+        with self.assertRaises(ValueError):
+            MicroBatcher(lambda items: items, max_batch_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import unittest
+
+from bounded_executor import BoundedExecutor, Overloaded
+
+
+class BoundedExecutorTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    async def started(self, pool, fn, *args):
+        task = asyncio.ensure_future(pool.run(fn, *args))
+        await asyncio.sleep(0.05)
+        return task
+
+    async def test_rejects_beyond_workers_plus_queue(self):
+        pool = BoundedExecutor(max_workers=1, max_queue=1, retry_after=7)
+        tasks = [await self.started(pool, self.release.wait, 5) for _ in range(2)]
+        self.assertEqual((pool.in_flight, pool.queued()), (2, 1))
+        self.assertTrue(pool.is_full())
+
+        with self.assertRaises(Overloaded) as raised:
+            await pool.run(lambda: None)
+        self.assertEqual(raised.exception.retry_after, 7)
+        with self.assertRaises(Overloaded):
+            pool.check_capacity()
+
+        self.release.set()
+        self.assertEqual(await asyncio.gather(*tasks), [True, True])
+        self.assertEqual(pool.stats(), {
+            "max_workers": 1, "max_queue": 1, "in_flight": 0, "queued": 0,
+            "completed": 2, "rejected": 2, "expired": 0,
+        })
+
+    async def test_queue_timeout_expires_waiting_jobs(self):
+        pool = BoundedExecutor(max_workers=1, max_queue=1, queue_timeout=0.05, retry_after=3)
+        running = await self.started(pool, self.release.wait, 5)
+        waiting = await self.started(pool, lambda: self.fail("expired job ran"))
+        await asyncio.sleep(0.1)
+        self.release.set()
+
+        self.assertTrue(await running)
+        with self.assertRaises(Overloaded) as raised:
+            await waiting
+        self.assertEqual(raised.exception.retry_after, 3)
+        self.assertEqual((pool.completed, pool.expired, pool.in_flight), (1, 1, 0))
+
+    async def test_cancelled_caller_keeps_its_slot_until_the_job_ends(self):
+        pool = BoundedExecutor(max_workers=1, max_queue=0)
+        task = await self.started(pool, self.release.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0.05)
+
+        # The forward pass is still running on the pool thread
+        self.assertEqual(pool.in_flight, 1)
+        with self.assertRaises(Overloaded):
+            await pool.run(lambda: None)
+
+        self.release.set()
+        await asyncio.sleep(0.05)
+        self.assertEqual(pool.in_flight, 0)
+        self.assertEqual(await pool.run(lambda: 'next'), 'next')
+
+    async def test_errors_propagate_and_free_the_slot(self):
+        pool = BoundedExecutor(max_workers=1, max_queue=0)
+
+        def fail():
+            raise ValueError("bad image")
+
+        with self.assertRaises(ValueError):
+            await pool.run(fail)
+        self.assertEqual((pool.in_flight, pool.completed, pool.expired), (0, 0, 0))
+        self.assertEqual(await pool.run(sum, [1, 2]), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
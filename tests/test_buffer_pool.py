@@ -0,0 +1,98 @@
+import threading
+import unittest
+
+import numpy as np
+
+try:
+    import torch
+except ImportError:  # buffer_pool needs torch; these tests run where the server does
+    torch = None
+
+if torch is not None:
+    from buffer_pool import BatchBuffers, SlotPool
+
+
+@unittest.skipIf(torch is None, "torch is not installed")
+class SlotPoolTests(unittest.TestCase):
+    def test_acquire_and_release(self):
+        pool = SlotPool(2, (3, 4, 4))
+        first, second = pool.acquire(), pool.acquire()
+        self.assertEqual({first, second}, {0, 1})
+        self.assertEqual(pool.stats()["in_use"], 2)
+        pool.release(first)
+        # LIFO: the slot released last comes back first
+        self.assertEqual(pool.acquire(), first)
+        self.assertEqual(pool.array(first).shape, (3, 4, 4))
+
+    def test_exhausted_pool_times_out(self):
+        pool = SlotPool(1, (3, 2, 2))
+        pool.acquire()
+        with self.assertRaises(TimeoutError):
+            pool.acquire(timeout=0.05)
+        self.assertEqual(pool.stats(), {"slots": 1, "in_use": 1, "waits": 1, "bytes": 48})
+
+    def test_exhausted_pool_blocks_until_release(self):
+        pool = SlotPool(1, (3, 2, 2))
+        index = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire(timeout=5)))
+        waiter.start()
+        waiter.join(0.05)
+        self.assertEqual(acquired, [])
+        pool.release(index)
+        waiter.join(5)
+        self.assertEqual(acquired, [index])
+
+    def test_invalid_count(self):
+        with self.assertRaises(ValueError):
+            SlotPool(0, (3, 2, 2))
+
+
+@unittest.skipIf(torch is None, "torch is not installed")
+class BatchBuffersTests(unittest.TestCase):
+    def setUp(self):
+        self.slots = SlotPool(4, (3, 2, 2))
+        self.buffers = BatchBuffers(max_batch_size=4, input_shape=(3, 2, 2), num_labels=5, top_k=2)
+
+    def test_gather_copies_and_releases_slots(self):
+        indices = [self.slots.acquire() for _ in range(3)]
+        for value, index in enumerate(indices, 1):
+            self.slots.array(index).fill(value)
+        self.assertEqual(self.buffers.gather(self.slots, indices), 3)
+        self.assertEqual(self.slots.stats()["in_use"], 0)
+        np.testing.assert_array_equal(self.buffers.pixel_values[:3, 0, 0, 0], [1, 2, 3])
+
+    def test_gather_releases_slots_when_the_copy_fails(self):
+        wrong_shape = SlotPool(2, (3, 3, 3))
+        indices = [wrong_shape.acquire(), wrong_shape.acquire()]
+        with self.assertRaises(ValueError):
+            self.buffers.gather(wrong_shape, indices)
+        self.assertEqual(wrong_shape.stats()["in_use"], 0)
+
+    def test_top_k_matches_softmax(self):
+        logits = np.array([[0.0, 1.0, 2.0, 3.0, 4.0], [4.0, 0.0, 0.0, 0.0, 1.0]], dtype=np.float32)
+        self.buffers.logits[:2] = logits
+        results = self.buffers.top_k_results(2)
+
+        expected = torch.softmax(torch.from_numpy(logits), dim=1)
+        top_probs, top_indices = torch.topk(expected, 2, dim=1)
+        for (probs, indices), want_probs, want_indices in zip(results, top_probs, top_indices):
+            np.testing.assert_allclose(probs, want_probs.numpy(), rtol=1e-6)
+            self.assertEqual(indices, want_indices.tolist())
+
+    def test_results_do_not_alias_the_next_batch(self):
+        self.buffers.logits[:1] = [[5.0, 0.0, 0.0, 0.0, 0.0]]
+        first = self.buffers.top_k_results(1)
+        snapshot = [(list(probs), list(indices)) for probs, indices in first]
+
+        self.buffers.logits[:1] = [[0.0, 0.0, 0.0, 0.0, 5.0]]
+        second = self.buffers.top_k_results(1)
+
+        self.assertEqual(first, snapshot)
+        self.assertEqual(first[0][1][0], 0)
+        self.assertEqual(second[0][1][0], 4)
+        self.assertIsInstance(first[0][0], list)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from cascade import CascadePolicy
+
+# Class indices 0 and 1 stand in for critical conditions
+CRITICAL = {0, 1}
+
+
+def make_policy(threshold=0.9):
+    return CascadePolicy(threshold, lambda index: index in CRITICAL)
+
+
+class CascadePolicyTests(unittest.TestCase):
+    def test_threshold_boundary(self):
+        policy = make_policy(0.9)
+        self.assertEqual(policy.outcome(0.9, 5), 'student')
+        self.assertEqual(policy.outcome(0.95, 5), 'student')
+        self.assertEqual(policy.outcome(0.8999, 5), 'low_confidence')
+
+    def test_critical_conditions_always_escalate(self):
+        # A confident student never makes the refer decision for a critical condition;
+        # the full model's confidence does
+        policy = make_policy(0.5)
+        self.assertEqual(policy.outcome(0.999, 0), 'critical')
+        self.assertEqual(policy.outcome(0.1, 1), 'critical')
+
+    def test_threshold_extremes(self):
+        self.assertEqual(make_policy(0.0).outcome(0.0, 5), 'student')
+        self.assertEqual(make_policy(1.0).outcome(0.999, 5), 'low_confidence')
+        for threshold in (-0.1, 1.1):
+            with self.assertRaises(ValueError):
+                make_policy(threshold)
+
+    def test_escalations_returns_rows_and_counts_outcomes(self):
+        policy = make_policy(0.9)
+        results = [
+            ([0.97, 0.02], [5, 6]),  # student answers
+            ([0.60, 0.30], [5, 6]),  # low confidence
+            ([0.99, 0.01], [0, 5]),  # critical
+            ([0.95, 0.03], [7, 0]),  # critical only as runner-up: student answers
+        ]
+        self.assertEqual(policy.escalations(results), [(1, 'low_confidence'), (2, 'critical')])
+        policy.escalations([([0.5], [3])])
+
+        self.assertEqual(policy.stats(), {
+            "threshold": 0.9,
+            "images": 5,
+            "outcomes": {"student": 2, "low_confidence": 2, "critical": 1},
+            "escalation_rate": 0.6,
+        })
+
+    def test_stats_before_any_image(self):
+        self.assertEqual(make_policy().stats()["escalation_rate"], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import socket
+import tempfile
+import unittest
+
+import inference_ipc
+from inference_ipc import (
+    KIND_PATH, MAGIC, InferenceIPCClient, InferenceIPCError, InferenceIPCServer, InferenceServerError,
+    _read_frame, _send_frame, decode_result, encode_result,
+)
+
+RESULT = {
+    'condition': 'Dry skin',
+    'confidence': 0.95,
+    'recommendation_type': 'cautious_products',
+    'recommendations': [{'name': 'Moisturiser'}, {'Product': 'Balm'}, {}],
+    'message': 'Patch test first',
+}
+
+
+class ResultEncodingTests(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(decode_result(encode_result(RESULT)), {
+            'condition': 'Dry skin',
+            'confidence': 0.95,
+            'recommendation_type': 'cautious_products',
+            'recommendations': [{'Product': 'Moisturiser'}, {'Product': 'Balm'}, {'Product': ''}],
+            'message': 'Patch test first',
+        })
+
+    def test_message_is_optional(self):
+        result = {'condition': 'Acne', 'confidence': 0.5, 'recommendation_type': 'refer', 'recommendations': []}
+        decoded = decode_result(encode_result(result))
+        self.assertNotIn('message', decoded)
+        self.assertEqual(decoded, result)
+
+    def test_unicode_strings(self):
+        result = dict(RESULT, condition='Rosácea', recommendations=[{'name': 'Crème apaisante'}])
+        decoded = decode_result(encode_result(result))
+        self.assertEqual(decoded['condition'], 'Rosácea')
+        self.assertEqual(decoded['recommendations'], [{'Product': 'Crème apaisante'}])
+
+
+class FramingTests(unittest.TestCase):
+    def setUp(self):
+        self.left, self.right = socket.socketpair()
+        self.addCleanup(self.left.close)
+        self.addCleanup(self.right.close)
+
+    def test_frame_round_trip(self):
+        payload = encode_result(RESULT)
+        _send_frame(self.left, KIND_PATH, payload)
+        _send_frame(self.left, 7, b'')
+        self.assertEqual(_read_frame(self.right), (KIND_PATH, payload))
+        self.assertEqual(_read_frame(self.right), (7, b''))
+
+    def test_bad_magic_is_rejected(self):
+        self.left.sendall(inference_ipc._HEADER.pack(b'NOPE', KIND_PATH, 0))
+        with self.assertRaises(ValueError):
+            _read_frame(self.right)
+
+    def test_oversized_payload_is_rejected(self):
+        self.left.sendall(inference_ipc._HEADER.pack(MAGIC, KIND_PATH, inference_ipc._MAX_PAYLOAD + 1))
+        with self.assertRaises(ValueError):
+            _read_frame(self.right)
+
+    def test_closed_connection(self):
+        self.left.sendall(inference_ipc._HEADER.pack(MAGIC, KIND_PATH, 10) + b'short')
+        self.left.close()
+        with self.assertRaises(ConnectionError):
+            _read_frame(self.right)
+
+
+class ServerClientTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = os.path.join(tmp.name, 'uploads')
+        os.mkdir(self.root)
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(request)
+            if request.data == b'corrupt':
+                raise ValueError("cannot identify image file")
+            return dict(RESULT, condition=os.path.basename(request.path))
+
+        self.server = InferenceIPCServer(os.path.join(tmp.name, 'vit.sock'), handler, allowed_roots=[self.root])
+        self.addCleanup(self.server.close)
+        self.server.start()
+        self.client = InferenceIPCClient(self.server.socket_path, timeout=5)
+        self.addCleanup(self.client._drop_connection)
+
+    def write(self, name, data):
+        path = os.path.join(self.root, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_path_request(self):
+        path = self.write('face.jpg', b'image bytes')
+        self.assertEqual(self.client.analyze_path(path)['condition'], 'face.jpg')
+        # The connection is reused for the next request
+        self.assertEqual(self.client.analyze_path(path)['condition'], 'face.jpg')
+        self.assertEqual([request.data for request in self.requests], [b'image bytes'] * 2)
+
+    def test_inference_error_is_not_a_transport_failure(self):
+        with self.assertRaises(InferenceServerError) as raised:
+            self.client.analyze_path(self.write('bad.jpg', b'corrupt'))
+        self.assertNotIsInstance(raised.exception, InferenceIPCError)
+        self.assertIn("cannot identify image file", str(raised.exception))
+        # The connection stays usable
+        self.assertEqual(self.client.analyze_path(self.write('ok.jpg', b'ok'))['condition'], 'ok.jpg')
+
+    def test_unreadable_file_is_a_transport_failure(self):
+        with self.assertRaises(InferenceIPCError):
+            self.client.analyze_path(os.path.join(self.root, 'missing.jpg'))
+        self.assertEqual(self.requests, [])
+
+    def test_path_outside_allowed_roots(self):
+        with self.assertRaises(InferenceIPCError) as raised:
+            self.client.analyze_path(os.path.join(self.root, '..', 'secret.jpg'))
+        self.assertIn("outside the allowed directories", str(raised.exception))
+        self.assertEqual(self.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
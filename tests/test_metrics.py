@@ -0,0 +1,70 @@
+import unittest
+
+from metrics import Histogram, Registry
+
+
+class HistogramTests(unittest.TestCase):
+    def test_buckets_are_cumulative_with_sum_and_count(self):
+        registry = Registry()
+        histogram = registry.histogram("vit_stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1.0, 0.5))
+        for value in (0.05, 0.1, 0.3, 0.7, 2.0):
+            histogram.observe(value, "forward")
+
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP vit_stage_seconds Stage time',
+            '# TYPE vit_stage_seconds histogram',
+            'vit_stage_seconds_bucket{stage="forward",le="0.1"} 2',
+            'vit_stage_seconds_bucket{stage="forward",le="0.5"} 3',
+            'vit_stage_seconds_bucket{stage="forward",le="1.0"} 4',
+            'vit_stage_seconds_bucket{stage="forward",le="+Inf"} 5',
+            'vit_stage_seconds_sum{stage="forward"} 3.15',
+            'vit_stage_seconds_count{stage="forward"} 5',
+        ])
+
+    def test_label_combinations_render_separately_and_sorted(self):
+        histogram = Histogram("batch", "Batch size", ("endpoint",), buckets=(1, 4))
+        histogram.observe(4, "predict_batch")
+        histogram.observe(1, "predict")
+        samples = list(histogram.samples())
+        self.assertEqual([labels for _, labels, _ in samples[:3]], [
+            '{endpoint="predict",le="1"}', '{endpoint="predict",le="4"}', '{endpoint="predict",le="+Inf"}',
+        ])
+        self.assertEqual(samples[-1], ('batch_count', '{endpoint="predict_batch"}', 1))
+
+    def test_timer_observes_once(self):
+        histogram = Histogram("t", "Timer")
+        with histogram.time():
+            pass
+        with self.assertRaises(RuntimeError):
+            with histogram.time():
+                raise RuntimeError("stage failed")
+        count = [value for name, _, value in histogram.samples() if name == 't_count']
+        self.assertEqual(count, [2])
+
+    def test_unobserved_histogram_renders_only_headers(self):
+        registry = Registry()
+        registry.histogram("empty", "Nothing yet")
+        self.assertEqual(registry.render(), '# HELP empty Nothing yet\n# TYPE empty histogram\n')
+
+
+class RegistryTests(unittest.TestCase):
+    def test_counters_gauges_and_escaping(self):
+        registry = Registry()
+        errors = registry.counter("vit_errors_total", "Errors", ("endpoint", "error"))
+        errors.inc("predict", 'Bad "quote"\nline')
+        errors.inc("predict", "ValueError", amount=2)
+        registry.gauge("vit_queue_depth", "Queue depth", lambda: 3)
+
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP vit_errors_total Errors',
+            '# TYPE vit_errors_total counter',
+            'vit_errors_total{endpoint="predict",error="Bad \\"quote\\"\\nline"} 1',
+            'vit_errors_total{endpoint="predict",error="ValueError"} 2',
+            '# HELP vit_queue_depth Queue depth',
+            '# TYPE vit_queue_depth gauge',
+            'vit_queue_depth 3',
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
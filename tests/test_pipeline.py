@@ -0,0 +1,119 @@
+import queue
+import threading
+import unittest
+
+from batching import MicroBatcher
+from pipeline import DecodePipeline
+
+
+class Slots:
+    """Stand-in for buffer_pool.SlotPool: decode takes a slot, the model worker gives it back."""
+
+    def __init__(self, count):
+        self.count = count
+        self._free = queue.Queue()
+        for index in range(count):
+            self._free.put(index)
+
+    def acquire(self):
+        return self._free.get(timeout=5)
+
+    def release(self, index):
+        self._free.put(index)
+
+    def free(self):
+        return self._free.qsize()
+
+
+class DecodePipelineTests(unittest.TestCase):
+    def make_pipeline(self, run_batch=None, decode=None, slots=None, **kwargs):
+        self.slots = slots or Slots(4)
+
+        def default_decode(image_bytes):
+            if image_bytes == b'corrupt':
+                raise ValueError("cannot identify image file")
+            return self.slots.acquire(), image_bytes.decode()
+
+        def default_run_batch(items):
+            try:
+                return [text.upper() for _, text in items]
+            finally:
+                for index, _ in items:
+                    self.slots.release(index)
+
+        self.batcher = MicroBatcher(run_batch or default_run_batch, max_batch_size=4, max_wait_ms=5)
+        return DecodePipeline(decode or default_decode, self.batcher, workers=2, max_pending=8,
+                              discard=lambda item: self.slots.release(item[0]), **kwargs)
+
+    def submit_all(self, pipeline, payloads):
+        results = [None] * len(payloads)
+
+        def call(index, payload):
+            try:
+                results[index] = pipeline.submit(payload, timeout=5)
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=call, args=pair) for pair in enumerate(payloads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_results_come_back_to_their_submitters(self):
+        pipeline = self.make_pipeline()
+        payloads = [f"image {i}".encode() for i in range(12)]
+        self.assertEqual(self.submit_all(pipeline, payloads), [f"IMAGE {i}" for i in range(12)])
+        # More images than slots went through, and every slot was released
+        self.assertEqual(self.slots.free(), self.slots.count)
+        stats = pipeline.stats()
+        self.assertEqual((stats["decode"]["decoded"], stats["decode"]["errors"]), (12, 0))
+        self.assertEqual(stats["model"]["items"], 12)
+
+    def test_decode_error_reaches_only_its_submitter(self):
+        pipeline = self.make_pipeline()
+        results = self.submit_all(pipeline, [b'ok', b'corrupt', b'fine'])
+        self.assertEqual(results[0], 'OK')
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], 'FINE')
+        self.assertEqual(pipeline.stats()["decode"]["errors"], 1)
+        self.assertEqual(self.slots.free(), self.slots.count)
+
+    def test_forward_error_fails_the_batch_and_frees_the_slots(self):
+        def run_batch(items):
+            for index, _ in items:
+                self.slots.release(index)
+            raise RuntimeError("forward pass failed")
+
+        pipeline = self.make_pipeline(run_batch=run_batch)
+        results = self.submit_all(pipeline, [b'a', b'b', b'c'])
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(self.slots.free(), self.slots.count)
+
+    def test_rejected_hand_off_discards_the_decoded_item(self):
+        pipeline = self.make_pipeline()
+
+        def full(item, callback, timeout=None):
+            raise TimeoutError("Timed out waiting for space in the batch queue")
+
+        self.batcher.submit_async = full
+        with self.assertRaises(TimeoutError):
+            pipeline.submit(b'image', timeout=5)
+        self.assertEqual(self.slots.free(), self.slots.count)
+
+    def test_workers_start_lazily(self):
+        pipeline = self.make_pipeline()
+        self.assertEqual(pipeline._threads, [])
+        self.assertTrue(pipeline.is_healthy(max_queue_depth=0))
+        pipeline.submit(b'x', timeout=5)
+        self.assertEqual(len(pipeline._threads), 2)
+        self.assertTrue(pipeline.is_healthy(max_queue_depth=0))
+
+    def test_invalid_worker_count(self):
+        with self.assertRaises(ValueError):
+            DecodePipeline(lambda data: data, MicroBatcher(lambda items: items), workers=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
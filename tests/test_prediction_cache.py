@@ -0,0 +1,172 @@
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+
+from prediction_cache import PredictionCache, image_key
+
+
+class PredictionCacheTests(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = PredictionCache(max_entries=2)
+        for key in ('a', 'b'):
+            cache.get_or_compute(key, lambda key=key: {'key': key})
+        cache.get('a')  # 'b' is now least recently used
+        cache.get_or_compute('c', lambda: {'key': 'c'})
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats()['entries'], 2)
+
+    def test_hits_return_copies(self):
+        cache = PredictionCache()
+        first = cache.get_or_compute('k', lambda: {'condition': 'Dry'})
+        first['recommendations'] = ['added by caller']
+        self.assertEqual(cache.get_or_compute('k', lambda: self.fail("recomputed")), {'condition': 'Dry'})
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_concurrent_requests_are_coalesced(self):
+        cache = PredictionCache()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return {'condition': 'Oily'}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while cache.stats()['coalesced'] < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'condition': 'Oily'}] * 5)
+        stats = cache.stats()
+        self.assertEqual((stats['misses'], stats['coalesced'], stats['in_flight']), (1, 4, 0))
+
+    def test_errors_reach_every_waiter_and_are_not_cached(self):
+        cache = PredictionCache()
+        release = threading.Event()
+
+        def failing():
+            release.wait(5)
+            raise RuntimeError("model failed")
+
+        errors = []
+
+        def call():
+            try:
+                cache.get_or_compute('k', failing)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while cache.stats()['coalesced'] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(cache.get_or_compute('k', lambda: {'ok': True}), {'ok': True})
+
+    def test_disk_tier_is_namespaced(self):
+        key = image_key(b'image bytes')
+        with tempfile.TemporaryDirectory() as disk_dir:
+            PredictionCache(disk_dir=disk_dir, namespace='model-a').get_or_compute(key, lambda: {'model': 'a'})
+
+            restarted = PredictionCache(disk_dir=disk_dir, namespace='model-a')
+            self.assertEqual(restarted.get_or_compute(key, lambda: self.fail("recomputed")), {'model': 'a'})
+            self.assertEqual(restarted.stats()['disk_hits'], 1)
+
+            other_model = PredictionCache(disk_dir=disk_dir, namespace='model-b')
+            self.assertEqual(other_model.get_or_compute(key, lambda: {'model': 'b'}), {'model': 'b'})
+
+
+class AsyncCoalescingTests(unittest.IsolatedAsyncioTestCase):
+    async def test_only_the_first_caller_computes(self):
+        cache = PredictionCache()
+        release = asyncio.Event()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return {'condition': 'Dry'}
+
+        tasks = [asyncio.ensure_future(cache.get_or_compute_async('k', compute)) for _ in range(5)]
+        await asyncio.sleep(0)
+        self.assertEqual(cache.stats()['coalesced'], 4)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'condition': 'Dry'}] * 5)
+        results[0]['recommendations'] = []
+        self.assertEqual(results[1], {'condition': 'Dry'})
+        self.assertEqual(cache.stats()['in_flight'], 0)
+
+    async def test_cancelled_leader_does_not_fail_the_others(self):
+        cache = PredictionCache()
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return {'condition': 'Oily'}
+
+        leader = asyncio.ensure_future(cache.get_or_compute_async('k', compute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_compute_async('k', compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        release.set()
+
+        self.assertEqual(await follower, {'condition': 'Oily'})
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+
+    async def test_error_reaches_every_caller_and_is_retried(self):
+        cache = PredictionCache()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("model failed")
+
+        results = await asyncio.gather(
+            *(cache.get_or_compute_async('k', failing) for _ in range(3)), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+        async def succeeding():
+            return {'ok': True}
+
+        self.assertEqual(await cache.get_or_compute_async('k', succeeding), {'ok': True})
+
+    async def test_leader_runs_the_sync_path_off_the_loop(self):
+        cache = PredictionCache()
+
+        async def compute():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, cache.get_or_compute, 'k', lambda: {'condition': 'Normal'})
+
+        self.assertEqual(await cache.get_or_compute_async('k', compute), {'condition': 'Normal'})
+        self.assertEqual(await cache.get_or_compute_async('k', compute), {'condition': 'Normal'})
+        stats = cache.stats()
+        self.assertEqual((stats['misses'], stats['hits']), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import gzip
+import json
+import unittest
+
+from product_catalog import ProductStore, SerializedCatalog, SerializedCatalogCache, parse_accept_encoding
+
+
+def make_store():
+    return ProductStore([
+        {'id': 1, 'name': 'Gentle Cleanser', 'targets': 'Dull skin, Excess oil'},
+        {'id': '2', 'name': 'Night Serum', 'targets': 'Wrinkles'},
+        {'id': '3', 'name': 'Toner', 'targets': 'excess oil'},
+    ])
+
+
+class ProductStoreTests(unittest.TestCase):
+    def test_snapshot_is_isolated_from_later_writes(self):
+        store = make_store()
+        before = store.snapshot()
+        store.add({'id': '4', 'name': 'Sunscreen', 'targets': 'Uneven skin tone'})
+        store.update('1', {'name': 'Renamed'})
+
+        self.assertEqual(len(before), 3)
+        self.assertIsNone(before.get('4'))
+        self.assertEqual(before.get('1')['name'], 'Gentle Cleanser')
+        after = store.snapshot()
+        self.assertEqual(after.version, before.version + 2)
+        self.assertEqual(after.get('4')['name'], 'Sunscreen')
+        self.assertEqual(after.get('1')['name'], 'Renamed')
+
+    def test_add_copies_the_product(self):
+        store = make_store()
+        product = {'id': '4', 'name': 'Sunscreen'}
+        store.add(product)
+        product['name'] = 'Changed by caller'
+        self.assertEqual(store.snapshot().get('4')['name'], 'Sunscreen')
+
+    def test_duplicate_id_is_rejected(self):
+        store = make_store()
+        version = store.snapshot().version
+        with self.assertRaises(ValueError):
+            store.add({'id': 1, 'name': 'Duplicate'})  # ids compare as strings
+        self.assertEqual(store.snapshot().version, version)
+        self.assertEqual(len(store.snapshot()), 3)
+
+    def test_lookup_targets_is_normalized_and_in_catalog_order(self):
+        snapshot = make_store().snapshot()
+        names = [p['name'] for p in snapshot.lookup_targets(['EXCESS OIL ', 'wrinkles'])]
+        self.assertEqual(names, ['Gentle Cleanser', 'Night Serum', 'Toner'])
+        self.assertEqual([p['name'] for p in snapshot.lookup_targets(['excess oil'], limit=1)], ['Gentle Cleanser'])
+
+    def test_update_reindexes_targets(self):
+        store = make_store()
+        store.update('1', {'targets': 'Wrinkles'})
+        snapshot = store.snapshot()
+        self.assertEqual([p['id'] for p in snapshot.lookup_targets(['excess oil'])], ['3'])
+        self.assertEqual([p['id'] for p in snapshot.lookup_targets(['dull skin'])], [])
+        self.assertEqual([p['id'] for p in snapshot.lookup_targets(['wrinkles'])], [1, '2'])
+
+    def test_update_of_unknown_id_returns_none(self):
+        store = make_store()
+        self.assertIsNone(store.update('99', {'name': 'Nope'}))
+        self.assertEqual(store.snapshot().version, 0)
+
+
+class SerializedCatalogTests(unittest.TestCase):
+    def test_bodies_and_etags(self):
+        catalog = SerializedCatalog(make_store().snapshot())
+        self.assertEqual(json.loads(gzip.decompress(catalog.bodies['gzip'])), json.loads(catalog.bodies['identity']))
+        self.assertEqual(catalog.etag_for('identity'), catalog.etag)
+        self.assertNotEqual(catalog.etag_for('gzip'), catalog.etag_for('identity'))
+
+    def test_pick_encoding_honours_q_values(self):
+        catalog = SerializedCatalog(make_store().snapshot())
+        catalog.bodies.pop('br', None)
+        cases = {
+            None: 'identity',
+            'gzip': 'gzip',
+            'gzip; q=0': 'identity',
+            'gzip;q=0.0': 'identity',
+            'GZIP ; Q=0.5': 'gzip',
+            '*': 'gzip',
+            '*;q=0, identity': 'identity',
+            'br': 'identity',
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(catalog.pick_encoding(header), expected)
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(parse_accept_encoding('gzip;q=0.5, br, x;q=bad'), {'gzip': 0.5, 'br': 1.0, 'x': 0.0})
+
+    def test_cache_rebuilds_only_on_new_version(self):
+        store = make_store()
+        cache = SerializedCatalogCache(store)
+        first = cache.get()
+        self.assertIs(cache.get(), first)
+        store.add({'id': '4', 'name': 'Sunscreen'})
+        second = cache.get()
+        self.assertIsNot(second, first)
+        self.assertNotEqual(second.etag, first.etag)
+
+
+if __name__ == '__main__':
+    unittest.main()